@@ -0,0 +1,176 @@
+#
+# benchmarkDumpers.py
+#
+# Runs the dumpers against a synthetic MGI database (see fixtureMgi.py) and reports, for
+# each dumper, the number of items, wall time, throughput, peak memory and CPU time.
+# The fixture is generated if the target datasource doesn't already have one with the
+# same scale and seed (or always, with --reload). Runs at the same scale and seed see
+# the same data, so their reports can be compared, e.g., before and after a change.
+#
+# Each dumper runs in its own process (see DumperScheduler, with one job), one at a time,
+# so its peak RSS is its own, and its wall time isn't shared with other dumpers.
+#
+# Usage:
+#       % python benchmarkDumpers.py -t mgi-bench [-f SCALE] [--seed N] [-o report.json]
+#               [-d DIR] [--reload] [-c Allele ...]
+#
+# The report (JSON) has the scale, seed, fixture row counts, and per dumper (and in total):
+#   items, wall_s, items_per_s, peak_rss_mb, cpu_s
+# The output files are written to DIR (default: a temporary directory, removed afterwards).
+#
+
+import sys
+import os
+import json
+import time
+import shutil
+import getopt
+import tempfile
+from libdump import DumperContext, DumperScheduler
+from libdump import mgidbconnect as db
+import fixtureMgi
+import dumpMgiItemXml
+
+def log(s):
+    sys.stderr.write('%s :: %s\n' % (time.asctime(), s))
+    sys.stderr.flush()
+
+# Returns the fixture description (mgi_snapshot.source) in the target, or None.
+def fixtureIn(target):
+    con = db.connect(**db.getConnectionParamsFromPropertiesFile(target))
+    cur = con.cursor()
+    try:
+        cur.execute('SELECT source FROM %s' % db.SNAPSHOT_INFO_TABLE)
+        rows = cur.fetchall()
+    except db.psycopg2.ProgrammingError:
+        rows = []
+    con.close()
+    return rows[0][0] if len(rows) == 1 else None
+
+# Returns the number of rows in each fixture table.
+def fixtureCounts(target):
+    con = db.connect(**db.getConnectionParamsFromPropertiesFile(target))
+    cur = con.cursor()
+    counts = {}
+    for t in fixtureMgi.TABLES:
+        cur.execute('SELECT count(*) FROM %s' % t)
+        counts[t] = cur.fetchone()[0]
+    con.close()
+    return counts
+
+# Returns the names of the dumpers to run: those named (and their dependencies), in order.
+def dumperNames(names):
+    deps = dumpMgiItemXml.dependencies
+    if not names:
+        return [n for n, d in dumpMgiItemXml.allDumpers]
+    final = []
+    def _add(n):
+        if n in final:
+            return
+        for d in deps[n]:
+            _add(d)
+        final.append(n)
+    for n in names:
+        if n + 'Dumper' not in deps:
+            raise RuntimeError('No such dumper: %s' % n)
+        _add(n + 'Dumper')
+    return final
+
+def benchmark(target, scale, seed, dir, names, reload=False):
+    fixture = fixtureMgi.Fixture(scale, seed)
+    report = {'scale': scale, 'seed': seed, 'fixture': {}, 'dumpers': {}}
+    if reload or fixtureIn(target) != fixture.description():
+        t0 = time.time()
+        fixture.load(target)
+        report['fixture']['load_s'] = round(time.time() - t0, 1)
+    else:
+        log('Using existing fixture: %s' % fixture.description())
+    report['fixture']['rows'] = fixtureCounts(target)
+    #
+    os.environ[db.SNAPSHOT_ENV] = target
+    dcx = DumperContext(dir=dir, logfile=os.path.join(dir, 'benchmark.log'), logconsole=False)
+    dcx.log('Benchmark: %s' % fixture.description())
+    def dumpOne(cls):
+        dcx.setIdBlock(dumpMgiItemXml.dumperIndex[cls.__name__])
+        return cls(dcx).dump(fname=cls.__name__[:-6] + '.xml')
+    results = {}
+    def onFinish(cls, n, result):
+        results[cls] = (n, result['rusage'])
+        log('%s: %d items' % (cls.__name__, n))
+    clcs, deps = dumpMgiItemXml.dumperClasses(dumperNames(names))
+    sched = DumperScheduler(dcx, deps, 1)
+    sched.run(clcs, dumpOne, (), onFinish)
+    dcx.closeOutputs()
+    dcx.closeConnections()
+    #
+    total = {'items': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0}
+    for cls in clcs:
+        n, ru = results[cls]
+        wall = sched.duration(cls)
+        cpu = ru['utime'] + ru['stime']
+        report['dumpers'][cls.__name__] = {
+            'items'       : n,
+            'wall_s'      : round(wall, 3),
+            'items_per_s' : round(n / wall) if wall else None,
+            'peak_rss_mb' : round(ru['maxrss_mb'], 1),
+            'cpu_s'       : round(cpu, 3),
+            }
+        total['items'] += n
+        total['wall_s'] += wall
+        total['cpu_s'] += cpu
+        total['peak_rss_mb'] = max(total['peak_rss_mb'], ru['maxrss_mb'])
+    total['items_per_s'] = round(total['items'] / total['wall_s']) if total['wall_s'] else None
+    for k in ('wall_s', 'cpu_s'):
+        total[k] = round(total[k], 3)
+    total['peak_rss_mb'] = round(total['peak_rss_mb'], 1)
+    report['total'] = total
+    return report
+
+def main(argv):
+    opts, args = getopt.getopt(argv, 't:f:o:d:c:', ['target=', 'scale=', 'seed=', 'output=', 'dir=', 'reload', 'class='])
+    target = None
+    scale = 0.01
+    seed = 1
+    output = None
+    dir = None
+    reload = False
+    names = []
+    for o, v in opts:
+        if o in ('-t', '--target'):
+            target = v
+        elif o in ('-f', '--scale'):
+            scale = float(v)
+        elif o == '--seed':
+            seed = int(v)
+        elif o in ('-o', '--output'):
+            output = v
+        elif o in ('-d', '--dir'):
+            dir = v
+        elif o == '--reload':
+            reload = True
+        elif o in ('-c', '--class'):
+            names.append(v)
+    if target is None:
+        raise RuntimeError('No target datasource (-t).')
+    tmpdir = None
+    if dir is None:
+        dir = tmpdir = tempfile.mkdtemp(prefix='mgibench.')
+    elif not os.path.exists(dir):
+        os.makedirs(dir)
+    try:
+        report = benchmark(target, scale, seed, dir, names, reload)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir)
+    s = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as fd:
+            fd.write(s + '\n')
+    else:
+        print(s)
+    t = report['total']
+    log('Total: %d items, %.1f s, %s items/s, peak RSS %.0f MB' % \
+        (t['items'], t['wall_s'], t['items_per_s'], t['peak_rss_mb']))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
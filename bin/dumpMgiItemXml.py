@@ -8,10 +8,11 @@
 
 import sys
 import getopt
-from libdump import *
+from libdump import DumperContext, DumperScheduler, Fingerprints, installMethods, dumperClass
 import types
 import os
 from libdump import mgidbconnect as db
+from libdump.OutputWriter import DEFAULT_BUFSIZE
 
 ##########################################
 VERSION = "0.1"
@@ -23,38 +24,60 @@ VERSION = "0.1"
 # The following lists all dumper classes and their dependencies.
 # To run any dumper, you have to first run the dumpers in
 # its dependency list. This is recursive.
+# With --jobs, independent dumpers run in parallel (see DumperScheduler),
+# so every dependency must be listed here, not just implied by the order.
+# Dumpers are listed by name; only those that run are imported (see dumperClasses).
 allDumpers = [
-    (PublicationDumper,         []),
-    (DataSourceDumper,          []),
-    (OrganismDumper,            []),
-    (ChromosomeDumper,          [OrganismDumper]),
-    (StrainDumper,              [OrganismDumper,PublicationDumper]),
-    (FeatureDumper,             [ChromosomeDumper,DataSourceDumper,PublicationDumper]),
-    (ProteinDumper,             [FeatureDumper]),
-    (LocationDumper,            [FeatureDumper]),
-    (HomologyDumper,            [FeatureDumper]),
-    (SyntenyDumper,             [FeatureDumper]),
-    (AlleleDumper,              [FeatureDumper,StrainDumper]),
-    (CellLineDumper,            [AlleleDumper]),
-    (GenotypeDumper,            [CellLineDumper]),
-    (ExpressionDumper,          [GenotypeDumper,FeatureDumper]),
-    (HTIndexDumper,             [ExpressionDumper]),
-    (AnnotationCommentDumper,   []),
-    (AnnotationDumper,          [GenotypeDumper,AlleleDumper,FeatureDumper]),
-    (RelationshipDumper,        [AlleleDumper,FeatureDumper]),
-    (SynonymDumper,             [AlleleDumper]),
-    (CrossReferenceDumper,      [AlleleDumper]),
+    ('PublicationDumper',       []),
+    ('DataSourceDumper',        []),
+    ('OrganismDumper',          []),
+    ('ChromosomeDumper',        ['OrganismDumper']),
+    ('StrainDumper',            ['OrganismDumper','PublicationDumper']),
+    ('FeatureDumper',           ['ChromosomeDumper','DataSourceDumper','PublicationDumper']),
+    ('ProteinDumper',           ['FeatureDumper']),
+    ('LocationDumper',          ['FeatureDumper']),
+    ('HomologyDumper',          ['FeatureDumper']),
+    ('SyntenyDumper',           ['FeatureDumper']),
+    ('AlleleDumper',            ['FeatureDumper','StrainDumper']),
+    ('CellLineDumper',          ['AlleleDumper']),
+    ('GenotypeDumper',          ['CellLineDumper']),
+    ('ExpressionDumper',        ['GenotypeDumper','FeatureDumper']),
+    ('HTIndexDumper',           ['ExpressionDumper']),
+    ('AnnotationCommentDumper', []),
+    ('AnnotationDumper',        ['GenotypeDumper','AlleleDumper','FeatureDumper','AnnotationCommentDumper']),
+    ('RelationshipDumper',      ['AlleleDumper','FeatureDumper']),
+    ('SynonymDumper',           ['AlleleDumper']),
+    ('CrossReferenceDumper',    ['AlleleDumper']),
     ]
 
-# create map from each class to its dependencies
+# create map from each dumper name to its dependencies
 dependencies = dict(allDumpers)
 
+# create map from each dumper name to its position in allDumpers.
+# (Don't reorder allDumpers if stable ids matter; add new dumpers at the end.
+# There are id blocks for up to IdRegistry.DUMPER_BLOCKS dumpers.)
+dumperIndex = dict((t[0], i) for i,t in enumerate(allDumpers))
+
+# Returns the classes of the named dumpers, importing their modules, and a map from each
+# of them, and each of their dependencies (recursively), to its dependencies' classes.
+def dumperClasses(names):
+    deps = {}
+    def _resolve(n):
+        cls = dumperClass(n)
+        if cls not in deps:
+            deps[cls] = []
+            deps[cls] = [_resolve(d) for d in dependencies[n]]
+        return cls
+    return [_resolve(n) for n in names], deps
+
 ##########################################
 ##########################################
 def parseArgs(argv):
     opts,args = getopt.getopt(argv, 
-        'c:d:D:l:vL:p:', 
-        ['class=', 'dir=','define','debug', 'limit=','version','logfile=','norefcheck','install=','properties='])
+        'c:d:D:l:vL:p:j:', 
+        ['class=', 'dir=','define','debug', 'limit=','version','logfile=','norefcheck','defer-refcheck','install=','properties=',
+         'compress=','bufsize=','writerthread','shard-items=','shard-bytes=','jobs=','stable-ids','checkpoint','resume','reuse','delta',
+         'profile','cprofile','memory','memory-limit=','tracemalloc=','partition-jobs='])
     return opts,args
 
 def main(argv):
@@ -66,6 +89,24 @@ def main(argv):
     defs = {}
     logfile=None
     checkRefs = True
+    deferRefs = False
+    compression = None
+    bufsize = DEFAULT_BUFSIZE
+    writerThread = False
+    shardItems = None
+    shardBytes = None
+    jobs = None
+    stableIds = False
+    checkpoint = False
+    resume = False
+    reuse = False
+    itemDelta = False
+    profile = False
+    cprofile = False
+    memory = False
+    memoryLimit = None
+    tracemallocTop = 0
+    partitionJobs = None
     for o,v in opts:
         if o == '--debug':
             debug=True
@@ -81,6 +122,43 @@ def main(argv):
             sys.exit(0)
         elif o == '--norefcheck':
             checkRefs = False
+        elif o == '--defer-refcheck':
+            deferRefs = True
+        elif o == '--compress':
+            compression = v
+        elif o == '--bufsize':
+            bufsize = int(v)
+        elif o == '--writerthread':
+            writerThread = True
+        elif o == '--shard-items':
+            shardItems = int(v)
+        elif o == '--shard-bytes':
+            shardBytes = int(v)
+        elif o in ('-j', '--jobs'):
+            jobs = int(v)
+        elif o == '--stable-ids':
+            stableIds = True
+        elif o == '--checkpoint':
+            checkpoint = True
+        elif o == '--resume':
+            checkpoint = resume = True
+        elif o == '--reuse':
+            reuse = True
+        elif o == '--delta':
+            itemDelta = True
+        elif o == '--profile':
+            profile = True
+        elif o == '--cprofile':
+            profile = cprofile = True
+        elif o == '--memory':
+            memory = True
+        elif o == '--memory-limit':
+            memoryLimit = float(v)
+        elif o == '--tracemalloc':
+            memory = True
+            tracemallocTop = int(v)
+        elif o == '--partition-jobs':
+            partitionJobs = int(v)
         elif o in ('-L','--logfile'):
             logfile = v
         elif o in ('-p','--properties'):
@@ -89,10 +167,11 @@ def main(argv):
             m = __import__(v)
             installMethods(m)
         elif o in ('-c', '--class'):
-            cls=eval(v+"Dumper")
-            clcs.append( cls )
+            if v+"Dumper" not in dependencies:
+                raise RuntimeError("No such dumper: %s" % v)
+            clcs.append( v+"Dumper" )
     if len(clcs) == 0:
-        clcs = map(lambda t: t[0], allDumpers)
+        clcs = [t[0] for t in allDumpers]
 
     if checkRefs:
         # Expand class list to include dependencies.
@@ -107,28 +186,105 @@ def main(argv):
         for c in clcs:
             _add(c)
         clcs = final
+    clcs, classDependencies = dumperClasses(clcs)
 
+    # With --stable-ids, an item with an MGI key gets the same id in every run. Items without
+    # a key (e.g., Expression results, synonyms, data sets) are still numbered in the order
+    # they are dumped, so adding or removing one shifts the ids of those after it (see IdRegistry).
+    # With --defer-refcheck, references are checked in bulk when each dumper finishes, rather
+    # than as they are made; the items with dangling references are then dropped from its
+    # output (see DumperContext.checkDeferredRefs).
+    # With --partition-jobs, dumpers that support it split their work between that many
+    # worker processes: ExpressionDumper, its largest queries into key ranges;
+    # RelationshipDumper, its categories, each into its own output file (instead of
+    # Relationship.xml; see RelationshipDumper.categoryFileName).
     dcx = DumperContext(
         debug=debug, 
         dir=dir, 
         limit=limit, 
         defs = defs, 
         logfile=logfile, 
-        checkRefs=checkRefs)
+        checkRefs=checkRefs,
+        bufsize=bufsize,
+        compression=compression,
+        writerThread=writerThread,
+        shardItems=shardItems,
+        shardBytes=shardBytes,
+        stableIds=stableIds,
+        deferRefs=deferRefs,
+        partitionJobs=partitionJobs)
     dcx.log("\n============================================================")
     dcx.log("Starting MGI item dump...")
     dcx.log("Command line parameters = %s" % str(argv))
-    db.setConnectionFromPropertiesFile()
     dcx.log("Database connection:" + str(db.getConnection()))
     #
-    total = 0
-    for cls in clcs:
-        total += cls(dcx).dump(fname=cls.__name__[:-6]+".xml")
+    def dumpOne(cls):
+        # with --stable-ids, each dumper's keyless ids come from its own block
+        dcx.setIdBlock(dumperIndex[cls.__name__])
+        return cls(dcx).dump(fname=cls.__name__[:-6]+".xml")
+    # With --checkpoint, after each dumper, the context is saved to a checkpoint in the
+    # output directory. With --resume, a run that failed picks up after the last finished
+    # dumper (and goes on checkpointing).
+    plan = [cls.__name__ for cls in clcs]
+    # With --delta (requires --stable-ids), the items added, changed and deleted since
+    # the previous run into the same directory are also written to its delta subdirectory.
+    if itemDelta:
+        dcx.enableItemDelta(resume)
+    # With --profile, each dumper's phases, queries and per-record times are written to
+    # the profile subdirectory (see Profiler); with --cprofile, also a cProfile dump.
+    if profile:
+        dcx.enableProfiling(cprofile, resume)
+    # With --memory, the memory used by the context and each dumper's structures is logged
+    # after every phase; with --memory-limit (MB), the dump fails, with that report, as soon
+    # as the RSS exceeds it (see MemoryMonitor).
+    if memory or memoryLimit:
+        dcx.enableMemoryMonitor(memory, memoryLimit, tracemallocTop)
+    finished = dcx.loadCheckpoint(plan) if resume else []
+    # With --reuse, dumpers whose inputs haven't changed since the previous run into
+    # the same directory are not run; their previous output is kept (see Fingerprints).
+    fingerprints = Fingerprints(dcx, classDependencies, clcs, [n for n,c in finished]) if reuse else None
+    def reuseOne(cls):
+        if fingerprints and fingerprints.canReuse(cls):
+            return fingerprints.reuse(cls)
+        return None
+    def onFinish(cls, n, delta=None):
+        if fingerprints and delta is not None:
+            fingerprints.record(cls, n, delta)
+        finished.append((cls.__name__, n))
+        if checkpoint:
+            dcx.saveCheckpoint(finished, plan)
+        if dcx.memory:
+            dcx.memory.afterDumper(cls.__name__)
+    done = set(n for n,c in finished)
+    if jobs:
+        done = [cls for cls in clcs if cls.__name__ in done]
+        DumperScheduler(dcx, classDependencies, jobs).run(clcs, dumpOne, done, onFinish, reuseOne)
+    else:
+        for cls in clcs:
+            if cls.__name__ in done:
+                continue
+            n = reuseOne(cls)
+            if n is not None:
+                onFinish(cls, n)
+                continue
+            if fingerprints:
+                dcx.beginDelta()
+            n = dumpOne(cls)
+            onFinish(cls, n, dcx.takeDelta() if fingerprints else None)
+    total = sum(c for n,c in finished)
     #
     dcx.closeOutputs()
+    if itemDelta:
+        dcx.finishItemDelta()
+    dcx.logIdRegistry()
+    if profile:
+        dcx.profiler.writeSummary()
+    dcx.closeConnections()
+    dcx.removeCheckpoint()
     dcx.log("Finished MGI item dump.")
     dcx.log("Grand total: %d items written."%total)
     dcx.log("============================================================")
 
 ##########################################
-main(sys.argv[1:])
+if __name__ == "__main__":
+    main(sys.argv[1:])
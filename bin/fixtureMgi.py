@@ -0,0 +1,1138 @@
+#
+# fixtureMgi.py
+#
+# Generates a synthetic MGI database, so the dumpers can be run (and timed, see
+# benchmarkDumpers.py) without access to MGI.
+#
+# The database has the tables and columns the dumpers query, filled with made-up but
+# consistent data: mouse, human and other markers with locations, MCV types, notes,
+# references and ids; strains, alleles, cell lines and genotypes; GXD assays with gel
+# lanes and bands, and in situ specimens and results; HT experiments and samples;
+# annotations with evidence and properties; feature relationships; homology clusters;
+# and the vocabularies they use. The number of rows scales with the scale factor
+# (0.01 to 1), where 1 is roughly the size of MGI (see COUNTS). The same scale and
+# seed always give the same data.
+#
+# The fixture is written to a datasource in the properties file (a local Postgres
+# database; the dumpers' queries are Postgres SQL, so SQLite won't do), replacing any
+# tables with the same names. Like a snapshot (see snapshotMgi.py), it ends with the
+# mgi_snapshot table, so it is used by setting MGI_SNAPSHOT to the datasource name.
+#
+# Usage:
+#       % python fixtureMgi.py -t mgi-bench [-f SCALE] [--seed N]
+#       % MGI_SNAPSHOT=mgi-bench python dumpMgiItemXml.py ...
+#
+
+import sys
+import io
+import re
+import time
+import random
+import getopt
+import datetime
+from libdump import mgidbconnect as db
+
+MIN_SCALE = 0.01
+MAX_SCALE = 1.0
+
+# Approximate numbers of objects at scale 1. (Other rows, e.g., accession ids, notes,
+# evidence, gel bands, follow from these.)
+COUNTS = {
+    'references'      : 280000,
+    'strains'         : 60000,
+    'mouseMarkers'    : 600000,
+    'humanMarkers'    : 60000,
+    'otherMarkers'    : 150000,
+    'alleles'         : 1000000,
+    'genotypes'       : 130000,
+    'assays'          : 110000,
+    'probes'          : 40000,
+    'antibodies'      : 4000,
+    'images'          : 30000,
+    'htExperiments'   : 4000,
+    'annotations'     : 3500000,
+    'relationships'   : 4600000,
+    'clusters'        : 20000,
+    'goTerms'         : 45000,
+    'mpTerms'         : 14000,
+    'doTerms'         : 12000,
+    'emapaTerms'      : 8000,
+    'clTerms'         : 3000,
+    'parentCellLines' : 300,
+    'derivations'     : 2000,
+    }
+# Smallest number of objects of each kind, at any scale.
+MIN_COUNT = 20
+
+# Tables: name -> columns. Only the columns the dumpers (and DumperContext) use, plus a
+# few for realism.
+TABLES = {
+    'ACC_MGIType'       : '_mgitype_key int, name text',
+    'ACC_LogicalDB'     : '_logicaldb_key int, name text, description text, _organism_key int',
+    'ACC_ActualDB'      : '_actualdb_key int, _logicaldb_key int, name text, url text',
+    'ACC_Accession'     : '_accession_key int, accid text, prefixpart text, numericpart int, '
+                          '_logicaldb_key int, _object_key int, _mgitype_key int, private smallint, preferred smallint',
+    'MGI_dbinfo'        : 'public_version text, product_name text, schema_version text, lastdump_date timestamp',
+    'MGI_Organism'      : '_organism_key int, commonname text, latinname text',
+    'MGI_Note'          : '_note_key int, _object_key int, _mgitype_key int, _notetype_key int, note text',
+    'MGI_RefAssocType'  : '_refassoctype_key int, _mgitype_key int, assoctype text',
+    'MGI_Reference_Assoc' : '_assoc_key int, _refs_key int, _object_key int, _mgitype_key int, _refassoctype_key int',
+    'MGI_SynonymType'   : '_synonymtype_key int, _mgitype_key int, synonymtype text',
+    'MGI_Synonym'       : '_synonym_key int, _object_key int, _mgitype_key int, _synonymtype_key int, _refs_key int, synonym text',
+    'MGI_Property'      : '_property_key int, _propertytype_key int, _propertyterm_key int, _object_key int, '
+                          '_mgitype_key int, value text, sequencenum int',
+    'MGI_Relationship_Category' : '_category_key int, name text, _relationshipvocab_key int, '
+                          '_mgitype_key_1 int, _mgitype_key_2 int',
+    'MGI_Relationship'  : '_relationship_key int, _category_key int, _object_key_1 int, _object_key_2 int, '
+                          '_relationshipterm_key int, _qualifier_key int, _evidence_key int, _refs_key int',
+    'MGI_Relationship_Property' : '_relationshipproperty_key int, _relationship_key int, _propertyname_key int, '
+                          'value text, sequencenum int',
+    'BIB_Refs'          : '_refs_key int, _referencetype_key int, authors text, title text, journal text, '
+                          'vol text, issue text, date text, year int, pgs text, abstract text',
+    'MRK_Types'         : '_marker_type_key int, name text',
+    'MRK_Chromosome'    : '_chromosome_key int, _organism_key int, chromosome text, sequencenum int',
+    'MRK_Marker'        : '_marker_key int, _organism_key int, _marker_status_key int, _marker_type_key int, '
+                          'symbol text, name text, chromosome text',
+    'MRK_Location_Cache': '_marker_key int, _organism_key int, chromosome text, genomicchromosome text, '
+                          'startcoordinate numeric, endcoordinate numeric, strand text, version text, provider text',
+    'MRK_MCV_Cache'     : '_marker_key int, _mcvterm_key int, term text, qualifier text',
+    'MRK_Notes'         : '_marker_key int, note text',
+    'MRK_Reference'     : '_marker_key int, _refs_key int, jnumid text, jnum int',
+    'MRK_Label'         : '_label_key int, _marker_key int, _organism_key int, _orthologorganism_key int, '
+                          'labeltype text, labeltypename text, label text',
+    'MRK_Cluster'       : '_cluster_key int, _clustertype_key int, _clustersource_key int, clusterid text',
+    'MRK_ClusterMember' : '_clustermember_key int, _cluster_key int, _marker_key int, sequencenum int',
+    'SEQ_Marker_Cache'  : '_marker_key int, _organism_key int, _marker_type_key int, _logicaldb_key int, accid text',
+    'PRB_Strain'        : '_strain_key int, _straintype_key int, strain text, standard smallint, private smallint',
+    'PRB_Strain_Marker' : '_strainmarker_key int, _strain_key int, _marker_key int, _allele_key int',
+    # (a view in MGI)
+    'PRB_Strain_Reference_View' : '_strain_key int, _refs_key int',
+    'VOC_Vocab'         : '_vocab_key int, _logicaldb_key int, name text',
+    'VOC_Term'          : '_term_key int, _vocab_key int, term text, abbreviation text, sequencenum int',
+    'VOC_Term_EMAPA'    : '_term_key int, startstage int, endstage int',
+    'VOC_AnnotType'     : '_annottype_key int, _mgitype_key int, _vocab_key int, _evidencevocab_key int, name text',
+    'VOC_Annot'         : '_annot_key int, _annottype_key int, _object_key int, _term_key int, _qualifier_key int',
+    'VOC_Evidence'      : '_annotevidence_key int, _annot_key int, _evidenceterm_key int, _refs_key int, '
+                          'inferredfrom text, creation_date timestamp',
+    'VOC_Evidence_Property' : '_evidenceproperty_key int, _annotevidence_key int, _propertyterm_key int, '
+                          'stanza int, sequencenum int, value text',
+    'ALL_Allele'        : '_allele_key int, _marker_key int, _strain_key int, _mode_key int, _allele_type_key int, '
+                          '_transmission_key int, _collection_key int, symbol text, name text, '
+                          'iswildtype smallint, isextinct smallint, ismixed smallint',
+    'ALL_Allele_Mutation' : '_assoc_key int, _allele_key int, _mutation_key int',
+    'ALL_Label'         : '_allele_key int, labeltype text, labeltypename text, label text',
+    'ALL_CellLine'      : '_cellline_key int, cellline text, _cellline_type_key int, _strain_key int, '
+                          '_derivation_key int, ismutant smallint',
+    'ALL_CellLine_Derivation' : '_derivation_key int, name text, _vector_key int, _vectortype_key int, '
+                          '_parentcellline_key int, _derivationtype_key int, _creator_key int, _refs_key int',
+    'ALL_Allele_CellLine' : '_assoc_key int, _allele_key int, _mutantcellline_key int',
+    'GXD_Genotype'      : '_genotype_key int, _strain_key int, isconditional smallint, note text, _existsas_key int',
+    'GXD_AllelePair'    : '_allelepair_key int, _genotype_key int, _allele_key_1 int, _allele_key_2 int, '
+                          '_marker_key int, _mutantcellline_key_1 int, _mutantcellline_key_2 int, '
+                          '_pairstate_key int, _compound_key int, sequencenum int',
+    'GXD_AlleleGenotype': '_genotype_key int, _marker_key int, _allele_key int, sequencenum int',
+    'GXD_AssayType'     : '_assaytype_key int, assaytype text, isrnaassay smallint, isgelassay smallint',
+    'GXD_Assay'         : '_assay_key int, _assaytype_key int, _refs_key int, _marker_key int, _probeprep_key int, '
+                          '_antibodyprep_key int, _imagepane_key int, creation_date timestamp',
+    'GXD_ProbePrep'     : '_probeprep_key int, _probe_key int',
+    'GXD_AntibodyPrep'  : '_antibodyprep_key int, _antibody_key int',
+    'GXD_GelLane'       : '_gellane_key int, _assay_key int, _genotype_key int, _gelcontrol_key int, '
+                          'sequencenum int, lanelabel text, sex text, age text',
+    'GXD_GelLaneStructure' : '_gellanestructure_key int, _gellane_key int, _emapa_term_key int, _stage_key int',
+    'GXD_GelBand'       : '_gelband_key int, _gellane_key int, _gelrow_key int, _strength_key int',
+    'GXD_Specimen'      : '_specimen_key int, _assay_key int, _genotype_key int, sequencenum int, '
+                          'specimenlabel text, sex text, age text',
+    'GXD_InSituResult'  : '_result_key int, _specimen_key int, _strength_key int, _pattern_key int, '
+                          'sequencenum int, resultnote text',
+    'GXD_ISResultStructure' : '_resultstructure_key int, _result_key int, _emapa_term_key int, _stage_key int',
+    'GXD_ISResultCellType'  : '_resultcelltype_key int, _result_key int, _celltype_term_key int',
+    'GXD_InSituResultImage' : '_resultimage_key int, _result_key int, _imagepane_key int',
+    'GXD_TheilerStage'  : '_stage_key int, stage int, description text',
+    'IMG_Image'         : '_image_key int, _refs_key int, xdim int, ydim int, figurelabel text',
+    'IMG_ImagePane'     : '_imagepane_key int, _image_key int, panelabel text',
+    'GXD_HTExperiment'  : '_experiment_key int, name text, description text, release_date date, '
+                          'last_curated_date date, evaluated_date date, _evaluationstate_key int, '
+                          '_curationstate_key int, _studytype_key int, _experimenttype_key int, _source_key int',
+    'GXD_HTExperimentVariable' : '_experimentvariable_key int, _experiment_key int, _term_key int',
+    'GXD_HTSample'      : '_sample_key int, _experiment_key int, name text, age text, agemin numeric, '
+                          'agemax numeric, _relevance_key int, _organism_key int, _sex_key int, _emapa_key int, '
+                          '_stage_key int, _celltype_term_key int, _genotype_key int',
+    }
+
+# Indexes, besides one on the first column of each table.
+INDEXES = [
+    ('ACC_Accession', '_object_key, _mgitype_key'),
+    ('ACC_Accession', '_logicaldb_key, _mgitype_key'),
+    ('MGI_Note', '_notetype_key'),
+    ('MGI_Reference_Assoc', '_object_key'),
+    ('MGI_Relationship', '_category_key'),
+    ('MGI_Relationship_Property', '_relationship_key'),
+    ('VOC_Term', '_vocab_key'),
+    ('VOC_Annot', '_annottype_key'),
+    ('VOC_Evidence', '_annot_key'),
+    ('VOC_Evidence_Property', '_annotevidence_key'),
+    ('MRK_Reference', '_refs_key'),
+    ('MRK_ClusterMember', '_cluster_key'),
+    ('ALL_Allele', '_marker_key'),
+    ('GXD_AllelePair', '_genotype_key'),
+    ('GXD_GelLane', '_assay_key'),
+    ('GXD_GelLaneStructure', '_gellane_key'),
+    ('GXD_GelBand', '_gellane_key'),
+    ('GXD_Specimen', '_assay_key'),
+    ('GXD_InSituResult', '_specimen_key'),
+    ('GXD_ISResultStructure', '_result_key'),
+    ('GXD_ISResultCellType', '_result_key'),
+    ('GXD_InSituResultImage', '_result_key'),
+    ('GXD_HTSample', '_experiment_key'),
+    ]
+
+# Rows are sent to the database in chunks of this many.
+CHUNK = 20000
+
+# MGI type keys
+REF, MARKER, PROBE, ANTIBODY, ASSAY, IMAGE, STRAIN, ALLELE, GENOTYPE, TERM = 1, 2, 3, 6, 8, 9, 10, 11, 12, 13
+EVIDENCE, HTEXPT, HTSAMPLE = 25, 42, 43
+MGI_TYPES = [
+    (1, 'Reference'), (2, 'Marker'), (3, 'Segment'), (6, 'Antibody'), (8, 'Assay'), (9, 'Image'),
+    (10, 'Strain'), (11, 'Allele'), (12, 'Genotype'), (13, 'Vocabulary Term'), (19, 'Sequence'),
+    (20, 'Organism'), (25, 'Annotation Evidence'), (27, 'Chromosome'), (28, 'Cell Line'),
+    (42, 'GXD HT Experiment'), (43, 'GXD HT Sample'),
+    ]
+
+# Logical dbs
+MGI_LDB, PUBMED_LDB, DOI_LDB, ENTREZ_LDB, SP_LDB, TR_LDB = 1, 29, 65, 55, 13, 41
+GENBANK_LDB, ENSEMBL_LDB, REFSEQ_LDB, HGNC_LDB = 9, 60, 27, 64
+GO_LDB, MP_LDB, DO_LDB, EMAPA_LDB, CL_LDB = 31, 34, 191, 169, 173
+ARRAYEXPRESS_LDB, GEO_LDB = 189, 190
+LOGICAL_DBS = [
+    # key, name, description, actual dbs (name, url)
+    (MGI_LDB, 'MGI', 'Mouse Genome Informatics', [('MGI', 'http://www.informatics.jax.org/accession/@@@@')]),
+    (GENBANK_LDB, 'Sequence DB', 'GenBank/EMBL/DDBJ',
+        [('GenBank', 'http://www.ncbi.nlm.nih.gov/nuccore/@@@@'), ('EMBL', 'http://www.ebi.ac.uk/ena/data/view/@@@@')]),
+    (SP_LDB, 'SWISS-PROT', 'UniProt/Swiss-Prot', [('UniProt', 'http://www.uniprot.org/uniprot/@@@@')]),
+    (REFSEQ_LDB, 'RefSeq', 'NCBI Reference Sequences', [('RefSeq', 'http://www.ncbi.nlm.nih.gov/nuccore/@@@@')]),
+    (PUBMED_LDB, 'PubMed', 'PubMed', [('PubMed', 'http://www.ncbi.nlm.nih.gov/pubmed/@@@@')]),
+    (GO_LDB, 'GO', 'Gene Ontology', [('GO', 'http://amigo.geneontology.org/amigo/term/@@@@')]),
+    (MP_LDB, 'Mammalian Phenotype', 'Mammalian Phenotype Ontology', []),
+    (TR_LDB, 'TrEMBL', 'UniProt/TrEMBL', [('UniProt', 'http://www.uniprot.org/uniprot/@@@@')]),
+    (ENTREZ_LDB, 'Entrez Gene', 'NCBI Gene', [('Entrez Gene', 'http://www.ncbi.nlm.nih.gov/gene/@@@@')]),
+    (ENSEMBL_LDB, 'Ensembl Gene Model', 'Ensembl', [('Ensembl', 'http://www.ensembl.org/id/@@@@')]),
+    (HGNC_LDB, 'HGNC', 'HUGO Gene Nomenclature Committee', [('HGNC', 'http://www.genenames.org/data/@@@@')]),
+    (DOI_LDB, 'DOI', 'Digital Object Identifier', [('DOI', 'http://dx.doi.org/@@@@')]),
+    (EMAPA_LDB, 'EMAPA', 'Mouse Developmental Anatomy', []),
+    (CL_LDB, 'Cell Ontology', 'Cell Ontology', []),
+    (ARRAYEXPRESS_LDB, 'ArrayExpress', 'ArrayExpress', [('ArrayExpress', 'http://www.ebi.ac.uk/arrayexpress/experiments/@@@@')]),
+    (GEO_LDB, 'GEO Series', 'Gene Expression Omnibus', [('GEO', 'http://www.ncbi.nlm.nih.gov/geo/query/acc.cgi?acc=@@@@')]),
+    (DO_LDB, 'Disease Ontology', 'Disease Ontology', [('DO', 'http://www.disease-ontology.org/?id=@@@@')]),
+    ]
+
+ORGANISMS = [
+    (1, 'mouse, laboratory', 'Mus musculus/domesticus'), (2, 'human', 'Homo sapiens'),
+    (40, 'rat', 'Rattus norvegicus'), (84, 'zebrafish', 'Danio rerio'), (64, 'fruit fly', 'Drosophila melanogaster'),
+    (97, 'mouse, M. caroli', 'Mus caroli'), (98, 'mouse, M. spretus', 'Mus spretus'),
+    (130, 'mouse, M. pahari', 'Mus pahari'), (76, 'Not Specified', 'Not Specified'),
+    (74, 'Not Applicable', 'Not Applicable'),
+    ]
+OTHER_ORGANISMS = [40, 84, 64]
+
+CHROMOSOMES = {
+    1  : [str(i) for i in range(1, 20)] + ['X', 'Y', 'MT', 'UN'],
+    2  : [str(i) for i in range(1, 23)] + ['X', 'Y', 'MT', 'UN'],
+    40 : [str(i) for i in range(1, 21)] + ['X', 'Y'],
+    84 : [str(i) for i in range(1, 26)],
+    64 : ['2L', '2R', '3L', '3R', '4', 'X', 'Y'],
+    }
+
+MARKER_TYPES = [
+    (1, 'Gene'), (2, 'DNA Segment'), (3, 'Cytogenetic Marker'), (6, 'QTL'), (7, 'Pseudogene'),
+    (8, 'BAC/YAC end'), (9, 'Other Genome Feature'), (10, 'Complex/Cluster/Region'), (12, 'Transgene'),
+    ]
+# Mouse markers: (marker type, share, [(MCV term, share)])
+MOUSE_MARKER_TYPES = [
+    (1, .62, [('protein coding gene', .45), ('lncRNA gene', .15), ('unclassified gene', .12),
+              ('miRNA gene', .05), ('antisense lncRNA gene', .05), ('lincRNA gene', .05), ('snoRNA gene', .03),
+              ('snRNA gene', .03), ('tRNA gene', .03), ('rRNA gene', .01), ('ribozyme gene', .01),
+              ('non-coding RNA gene', .02)]),
+    (9, .14, [('other genome feature', .3), ('CpG island', .2), ('enhancer', .15), ('promoter', .1),
+              ('CTCF binding site', .1), ('open chromatin region', .1), ('unclassified other genome feature', .05)]),
+    (6, .09, [('QTL', 1)]),
+    (7, .07, [('pseudogene', .85), ('polymorphic pseudogene', .05), ('pseudogenic gene segment', .05),
+              ('pseudogenic region', .05)]),
+    (2, .05, [('DNA segment', 1)]),
+    (12, .01, [('transgene', 1)]),
+    (8, .01, [('BAC end', .5), ('YAC end', .5)]),
+    (3, .006, [('chromosomal deletion', .4), ('chromosomal inversion', .2), ('chromosomal translocation', .2),
+               ('Robertsonian fusion', .2)]),
+    (10, .004, [('complex/cluster/region', 1)]),
+    ]
+
+# Vocabulary keys (those in DumperContext.QUERYPARAMS, and others)
+V_MP_EVIDENCE, V_GO_EVIDENCE, V_GO, V_MP, V_DO = 2, 3, 4, 5, 125
+V_STRAIN_ATTRIBUTE, V_ALLELE_MUTATION, V_ALLELE_COLLECTION, V_ALLELE_ATTRIBUTE = 27, 36, 92, 93
+V_EMAPA, V_CL, V_HT_VARIABLES = 90, 102, 122
+V_INHERITANCE, V_ALLELE_TYPE, V_PAIRSTATE, V_EXISTSAS, V_COMPOUND = 35, 38, 39, 60, 42
+V_GO_QUALIFIER, V_MP_QUALIFIER, V_STRAIN_TYPE, V_TRANSMISSION, V_CREATOR = 52, 53, 55, 61, 62
+V_CELLLINE_TYPE, V_VECTOR_TYPE, V_DERIVATION_TYPE, V_VECTOR, V_SEX, V_MCV = 63, 64, 65, 72, 74, 79
+V_EVIDENCE_PROPERTY, V_CLUSTER_SOURCE, V_RELATIONSHIP_QUALIFIER, V_RELATIONSHIP_EVIDENCE = 86, 89, 94, 95
+V_RELATIONSHIP, V_RELATIONSHIP_PROPERTY, V_HT_EVALUATION, V_HT_CURATION, V_HT_SOURCE = 96, 97, 116, 117, 119
+V_HT_RELEVANCE, V_HT_EXPTYPE, V_HT_PROPERTY, V_HT_STUDYTYPE, V_REFERENCE_TYPE = 120, 121, 123, 124, 131
+V_PATTERN, V_GELCONTROL, V_STRENGTH = 153, 154, 163
+
+# Term keys the dumpers depend on (see DumperContext and the dumpers). Other
+# terms are numbered from FIRST_TERM_KEY.
+PEER_REVIEWED_KEY = 31576687
+HOMOZYGOUS_KEY, HETEROZYGOUS_KEY, COMPOUND_NA_KEY = 847138, 847137, 847167
+TRANSGENIC_KEYS = [847127, 847128, 847129, 2327160]
+HYBRID_HOMOL_KEY = 75885740
+CURATIONSTATE_DONE_KEY = 20475421
+GELCONTROL_NO_KEY = 107080580
+FIRST_TERM_KEY = 1000
+
+# Annotation types: (key, name, object type, vocab, evidence vocab, share of annotations,
+# objects annotated, base annotation type (of derived annotations))
+ANNOTATION_TYPES = [
+    (1000, 'GO/Marker', MARKER, V_GO, V_GO_EVIDENCE, .45, 'mouseGenes', None),
+    (1002, 'Mammalian Phenotype/Genotype', GENOTYPE, V_MP, V_MP_EVIDENCE, .10, 'genotypes', None),
+    (1020, 'DO/Genotype', GENOTYPE, V_DO, V_MP_EVIDENCE, .005, 'genotypes', None),
+    (1022, 'DO/Human Marker', MARKER, V_DO, V_MP_EVIDENCE, .04, 'humanMarkers', None),
+    (1021, 'DO/Allele', ALLELE, V_DO, V_MP_EVIDENCE, .001, 'alleles', None),
+    (1015, 'Mammalian Phenotype/Marker (Derived)', MARKER, V_MP, V_MP_EVIDENCE, .14, 'mouseGenes', 1002),
+    (1023, 'DO/Marker (Derived)', MARKER, V_DO, V_MP_EVIDENCE, .005, 'mouseGenes', 1020),
+    (1028, 'Mammalian Phenotype/Allele (Derived)', ALLELE, V_MP, V_MP_EVIDENCE, .25, 'alleles', 1002),
+    (1029, 'DO/Allele (Derived)', ALLELE, V_DO, V_MP_EVIDENCE, .009, 'alleles', 1020),
+    ]
+ALLELE_ATTRIBUTE_AKEY = 1014
+STRAIN_ATTRIBUTE_AKEY = 1009
+
+# Feature relationship categories: (key, name, subject type, object type, share of
+# relationships, relationship term, property names)
+RELATIONSHIP_CATEGORIES = [
+    (1001, 'interacts_with', MARKER, MARKER, .975, 'interacts_with',
+        ['score', 'data_source', 'validation', 'interaction_type', 'algorithm', 'regulator_hit',
+         'target_hit', 'confidence', 'mature_transcript']),
+    (1002, 'cluster_has_member', MARKER, MARKER, .003, 'cluster_has_member', []),
+    (1003, 'mutation_involves', ALLELE, MARKER, .002, 'mutation_involves', []),
+    (1004, 'expresses_component', ALLELE, MARKER, .012, 'expresses',
+        ['Non-mouse_Organism', 'Non-mouse_Gene_Symbol', 'Non-mouse_NCBI_Gene_ID']),
+    (1006, 'has_driver', ALLELE, MARKER, .008, 'has_driver', ['Driver_note']),
+    (1012, 'marker_has_PAR_partner', MARKER, MARKER, 0, 'has_PAR_partner', []),
+    ]
+
+# GXD assay types: (key, name, is gel assay, share of assays)
+ASSAY_TYPES = [
+    (1, 'RNA in situ', 0, .25), (2, 'Northern blot', 1, .08), (3, 'Nuclease S1', 1, .01),
+    (4, 'RNase protection', 1, .01), (5, 'RT-PCR', 1, .30), (6, 'Immunohistochemistry', 0, .22),
+    (8, 'Western blot', 1, .05), (9, 'In situ reporter (knock in)', 0, .05),
+    (10, 'In situ reporter (transgenic)', 0, .02), (11, 'Recombinase reporter', 0, .01),
+    ]
+
+WORDS = '''
+    mouse gene expression protein cell tissue development embryo brain heart liver kidney lung
+    muscle bone skin blood immune receptor kinase factor signaling pathway regulation mutant
+    phenotype allele knockout transgenic targeted deletion insertion mutation function role
+    analysis study model disease abnormal increased decreased normal early late stage adult
+    postnatal neural neuron synapse membrane nuclear mitochondrial transcription binding
+    domain complex activity response stress metabolism glucose lipid insulin growth
+    differentiation proliferation apoptosis migration adhesion morphology structure formation
+    '''.split()
+SURNAMES = '''
+    Smith Jones Chen Wang Li Zhang Kim Lee Nguyen Garcia Mueller Schmidt Rossi Tanaka Suzuki
+    Sato Brown Davis Miller Wilson Moore Taylor Anderson Thomas Jackson White Harris Martin
+    Thompson Young King Wright Lopez Hill Scott Green Adams Baker Nelson Carter Mitchell Perez
+    Roberts Turner Phillips Campbell Parker Evans Edwards Collins Stewart Morris Murphy Cook
+    '''.split()
+JOURNALS = ['Nature', 'Science', 'Cell', 'Dev Biol', 'Development', 'J Biol Chem', 'Genesis',
+    'PLoS Genet', 'Mol Cell Biol', 'J Neurosci', 'Genes Dev', 'Mamm Genome', 'Nat Genet', 'Elife']
+SEXES = ['Male', 'Female', 'Pooled', 'Not Specified']
+AGES = ['embryonic day 9.5', 'embryonic day 10.5', 'embryonic day 12.5', 'embryonic day 14.5',
+    'embryonic day 16.5', 'embryonic day 18.5', 'postnatal day 1', 'postnatal day 7',
+    'postnatal week 8', 'postnatal adult', 'Not Specified']
+STRENGTHS = ['Absent', 'Present', 'Trace', 'Weak', 'Moderate', 'Strong', 'Very strong', 'Ambiguous',
+    'Not Specified', 'Not Applicable']
+PATTERNS = ['Homogeneous', 'Regionally restricted', 'Scattered', 'Single cells', 'Ubiquitous',
+    'Not Specified', 'Not Applicable']
+
+ACCID_RE = re.compile(r'^(.*?)(\d+)$')
+
+def log(s):
+    sys.stderr.write('%s :: %s\n' % (time.asctime(), s))
+    sys.stderr.flush()
+
+# Returns a value in COPY text format.
+def copyValue(v):
+    if v is None:
+        return '\\N'
+    if type(v) is str:
+        if '\\' in v or '\t' in v or '\n' in v or '\r' in v:
+            v = v.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        return v
+    return str(v)
+
+# Loads rows into one table, with COPY, in chunks.
+class TableWriter:
+    def __init__(self, cursor, table):
+        self.cursor = cursor
+        self.table = table
+        self.columns = [c.split()[0] for c in TABLES[table].split(',')]
+        self.lines = []
+        self.count = 0
+
+    def add(self, *row):
+        self.lines.append('\t'.join(map(copyValue, row)))
+        if len(self.lines) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        self.lines.append('')
+        buf = io.StringIO('\n'.join(self.lines))
+        self.cursor.copy_expert('COPY %s (%s) FROM STDIN' % (self.table, ', '.join(self.columns)), buf)
+        self.count += len(self.lines) - 1
+        self.lines = []
+
+class Fixture:
+    def __init__(self, scale=0.01, seed=1):
+        if not MIN_SCALE <= scale <= MAX_SCALE:
+            raise RuntimeError('Scale must be between %s and %s: %s' % (MIN_SCALE, MAX_SCALE, scale))
+        self.scale = scale
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # counters for generated keys: name -> last key
+        self.keys = {'VOC_Term': FIRST_TERM_KEY - 1}
+        self.writers = {}
+        self.lastdump = datetime.datetime(2026, 1, 5, 8, 0, 0)
+
+    # Describes the fixture (in the mgi_snapshot table).
+    def description(self):
+        return 'synthetic (scale %s, seed %d)' % (self.scale, self.seed)
+
+    def count(self, name):
+        return max(MIN_COUNT, int(round(COUNTS[name] * self.scale)))
+
+    def key(self, name):
+        k = self.keys.get(name, 0) + 1
+        self.keys[name] = k
+        return k
+
+    def add(self, table, *row):
+        self.writers[table].add(*row)
+
+    # Writes the fixture to the datasource target. Returns the number of rows in each table.
+    def load(self, target):
+        params = db.getConnectionParamsFromPropertiesFile(target)
+        con = db.connect(**params)
+        cur = con.cursor()
+        cur.execute('DROP TABLE IF EXISTS %s' % db.SNAPSHOT_INFO_TABLE)
+        con.commit()
+        log('Generating MGI fixture (%s) in %s (%s)' % (self.description(), params['database'], params['host']))
+        for t, cols in TABLES.items():
+            cur.execute('DROP TABLE IF EXISTS %s CASCADE' % t)
+            cur.execute('CREATE TABLE %s (%s)' % (t, cols))
+            self.writers[t] = TableWriter(cur, t)
+        t0 = time.time()
+        for step in (self.loadTypes, self.loadVocabularies, self.loadReferences, self.loadStrains,
+                self.loadMarkers, self.loadAlleles, self.loadGenotypes, self.loadExpression,
+                self.loadHTExperiments, self.loadAnnotations, self.loadRelationships, self.loadHomology):
+            t1 = time.time()
+            step()
+            log('%s: %.1f s' % (step.__name__, time.time() - t1))
+        counts = {}
+        for t, w in self.writers.items():
+            w.flush()
+            counts[t] = w.count
+        log('Indexing')
+        for t in TABLES:
+            cur.execute('CREATE INDEX ON %s (%s)' % (t, self.writers[t].columns[0]))
+        for t, cols in INDEXES:
+            cur.execute('CREATE INDEX ON %s (%s)' % (t, cols))
+        for t in TABLES:
+            cur.execute('ANALYZE %s' % t)
+        cur.execute('''
+            CREATE TABLE %s (
+                source text,
+                created timestamp,
+                lastdump_date timestamp,
+                tables text)
+            ''' % db.SNAPSHOT_INFO_TABLE)
+        cur.execute('INSERT INTO %s VALUES (%%s, now(), %%s, %%s)' % db.SNAPSHOT_INFO_TABLE,
+            (self.description(), self.lastdump, ','.join(sorted(TABLES, key=str.lower))))
+        cur.close()
+        con.commit()
+        con.close()
+        log('Fixture complete: %d rows, %.1f s' % (sum(counts.values()), time.time() - t0))
+        return counts
+
+    ##########################################
+    # Helpers
+
+    def text(self, nmin, nmax):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(nmin, nmax)))
+
+    # Returns a choice from [(x, weight)].
+    def weighted(self, choices):
+        return self.rng.choices([c[0] for c in choices], [c[1] for c in choices])[0]
+
+    # Returns a count with the given mean (at least lo).
+    def howMany(self, mean, lo=0):
+        return lo + int(self.rng.expovariate(1.0 / max(mean - lo, 0.01)))
+
+    def accession(self, accid, ldb, objectKey, mgitype, preferred=1, private=0):
+        m = ACCID_RE.match(accid)
+        prefix, numeric = (m.group(1), int(m.group(2))) if m else (accid, None)
+        self.add('ACC_Accession', self.key('ACC_Accession'), accid, prefix, numeric,
+            ldb, objectKey, mgitype, private, preferred)
+
+    def mgiId(self, objectKey, mgitype, preferred=1):
+        accid = 'MGI:%d' % self.key('MGI:')
+        self.accession(accid, MGI_LDB, objectKey, mgitype, preferred)
+        return accid
+
+    def note(self, notetype, mgitype, objectKey, note):
+        self.add('MGI_Note', self.key('MGI_Note'), objectKey, mgitype, notetype, note)
+
+    def vocab(self, vkey, name, ldb=None):
+        self.add('VOC_Vocab', vkey, ldb, name)
+
+    def term(self, vkey, term, key=None, abbreviation=None):
+        if key is None:
+            key = self.key('VOC_Term')
+        self.add('VOC_Term', key, vkey, term, abbreviation, None)
+        return key
+
+    # Adds a vocabulary with the given terms. Returns {term: key}.
+    def terms(self, vkey, name, terms, keys={}):
+        self.vocab(vkey, name)
+        return dict((t, self.term(vkey, t, keys.get(t))) for t in terms)
+
+    # Adds an ontology of n terms, each with an accession id. Returns the term keys.
+    def ontology(self, vkey, name, ldb, prefix, n, fmt='%07d'):
+        self.vocab(vkey, name, ldb)
+        tks = []
+        for i in range(n):
+            tk = self.term(vkey, self.text(1, 4))
+            self.accession(prefix + fmt % (i + 1), ldb, tk, TERM)
+            tks.append(tk)
+        return tks
+
+    def refs(self):
+        return self.rng.randint(1, self.nrefs)
+
+    ##########################################
+
+    def loadTypes(self):
+        for row in MGI_TYPES:
+            self.add('ACC_MGIType', *row)
+        for k, name, desc, adbs in LOGICAL_DBS:
+            self.add('ACC_LogicalDB', k, name, desc, None)
+            for aname, url in adbs:
+                self.add('ACC_ActualDB', self.key('ACC_ActualDB'), k, aname, url)
+        for row in ORGANISMS:
+            self.add('MGI_Organism', *row)
+        for row in MARKER_TYPES:
+            self.add('MRK_Types', *row)
+        for ok, chrs in CHROMOSOMES.items():
+            for i, c in enumerate(chrs):
+                self.add('MRK_Chromosome', self.key('MRK_Chromosome'), ok, c, i + 1)
+        for s in range(1, 29):
+            self.add('GXD_TheilerStage', s, s, 'Theiler stage %d' % s)
+        for k, name, isgel, share in ASSAY_TYPES:
+            self.add('GXD_AssayType', k, name, 1 if k in (1, 2, 3, 4, 5) else 0, isgel)
+        self.add('MGI_dbinfo', 'MGI 6.24 (%s)' % self.description(), 'MGI', 'synthetic', self.lastdump)
+        self.assocTypes = {}
+        for mgitype, types in ((ALLELE, ['Original', 'Transmission', 'Indexed', 'Used-FC', 'Molecular', 'Treatment']),
+                               (STRAIN, ['Selected', 'Nomenclature', 'Original'])):
+            keys = {'Selected': 1009, 'Nomenclature': 1010} if mgitype == STRAIN else {}
+            for t in types:
+                k = keys.get(t) or (1031 if mgitype == STRAIN else 1010 + self.key('MGI_RefAssocType'))
+                self.add('MGI_RefAssocType', k, mgitype, t)
+                self.assocTypes.setdefault(mgitype, []).append(k)
+        for k, mgitype, t in ((1004, STRAIN, 'synonym'), (1008, ALLELE, 'exact'), (1011, ALLELE, 'related')):
+            self.add('MGI_SynonymType', k, mgitype, t)
+
+    def loadVocabularies(self):
+        rng = self.rng
+        self.go = self.ontology(V_GO, 'GO', GO_LDB, 'GO:', self.count('goTerms'))
+        self.mp = self.ontology(V_MP, 'Mammalian Phenotype', MP_LDB, 'MP:', self.count('mpTerms'))
+        self.do = self.ontology(V_DO, 'Disease Ontology', DO_LDB, 'DOID:', self.count('doTerms'), '%d')
+        self.cl = self.ontology(V_CL, 'Cell Ontology', CL_LDB, 'CL:', self.count('clTerms'))
+        # EMAPA terms, with their stage ranges
+        self.vocab(V_EMAPA, 'EMAPA', EMAPA_LDB)
+        self.emapa = []
+        for i in range(self.count('emapaTerms')):
+            tk = self.term(V_EMAPA, self.text(1, 3))
+            self.accession('EMAPA:%d' % (16000 + i), EMAPA_LDB, tk, TERM)
+            start = rng.randint(1, 28)
+            end = rng.randint(start, 28)
+            self.add('VOC_Term_EMAPA', tk, start, end)
+            self.emapa.append((tk, start, end))
+        #
+        self.vocab(V_GO_EVIDENCE, 'GO Evidence Codes')
+        self.goEvidence = [self.term(V_GO_EVIDENCE, self.text(2, 4), abbreviation=c) for c in
+            ['EXP', 'IDA', 'IPI', 'IMP', 'IGI', 'IEP', 'ISS', 'ISO', 'ISA', 'ISM', 'IBA', 'IEA', 'IC',
+             'TAS', 'NAS', 'ND', 'IKR', 'HDA', 'HMP']]
+        self.vocab(V_MP_EVIDENCE, 'Mammalian Phenotype Evidence Codes')
+        self.mpEvidence = [self.term(V_MP_EVIDENCE, self.text(2, 4), abbreviation=c) for c in ['TAS', 'IEA', 'IC']]
+        self.goQualifiers = self.terms(V_GO_QUALIFIER, 'GO Qualifier', [None, 'NOT', 'contributes_to', 'colocalizes_with'])
+        self.mpQualifiers = self.terms(V_MP_QUALIFIER, 'Mammalian Phenotype Qualifier', [None, 'norm', 'NOT'])
+        self.evidenceProperties = self.terms(V_EVIDENCE_PROPERTY, 'Evidence Property',
+            ['_SourceAnnot_key', 'MP-Sex-Specificity', 'occurs_in', 'evidence'])
+        #
+        self.strainAttributes = list(self.terms(V_STRAIN_ATTRIBUTE, 'Strain Attribute',
+            ['inbred strain', 'mutant strain', 'congenic', 'coisogenic', 'recombinant inbred', 'consomic',
+             'wild-derived', 'closed colony', 'segregating inbred', 'transgenic', 'targeted mutation',
+             'chemically induced mutation', 'spontaneous mutation', 'major histocompatibility congenic',
+             'conplastic', 'mixed']).values())
+        self.strainTypes = list(self.terms(V_STRAIN_TYPE, 'Strain Type',
+            ['inbred strain', 'mutant stock', 'Not Specified', 'hybrid', 'wild']).values())
+        self.mutations = list(self.terms(V_ALLELE_MUTATION, 'Allele Molecular Mutation',
+            ['Insertion', 'Intragenic deletion', 'Single point mutation', 'Nucleotide substitutions',
+             'Intergenic deletion', 'Inversion', 'Duplication', 'Translocation', 'Transgenic insertion',
+             'Disruption caused by insertion of vector', 'Not Specified', 'Other']).values())
+        self.collections = self.terms(V_ALLELE_COLLECTION, 'Allele Collection',
+            ['Not Specified', 'KOMP-CSD', 'KOMP-Regeneron', 'EUCOMM', 'NorCOMM', 'IMPC', 'GENSAT',
+             'Lexicon', 'Deltagen', 'Sanger Gene Trap', 'ENU mutagenesis', 'Cre Portal'])
+        self.alleleAttributes = self.terms(V_ALLELE_ATTRIBUTE, 'Allele Attribute',
+            ['Null/knockout', 'Reporter', 'Recombinase', 'Conditional ready', 'Hypomorph',
+             'Inserted expressed sequence', 'Humanized sequence', 'Modified regulatory region',
+             'No functional change', 'Transactivator', 'Dominant negative', 'Constitutively active',
+             'Inducible', 'Epitope tag', 'RNAi effect', 'Not Specified'])
+        self.alleleTypes = self.terms(V_ALLELE_TYPE, 'Allele Type',
+            ['Targeted', 'Gene trapped', 'Endonuclease-mediated', 'Chemically induced (ENU)', 'Spontaneous',
+             'Transgenic (Cre/Flp)', 'Transgenic (Reporter)', 'Transgenic (Transactivator)', 'Transgenic',
+             'Radiation induced', 'QTL', 'Not Applicable'],
+            dict(zip(['Transgenic (Cre/Flp)', 'Transgenic (Reporter)', 'Transgenic (Transactivator)', 'Transgenic'],
+                TRANSGENIC_KEYS)))
+        self.inheritance = list(self.terms(V_INHERITANCE, 'Allele Inheritance Mode',
+            ['Recessive', 'Dominant', 'Semidominant', 'Codominant', 'Not Applicable', 'Not Specified']).values())
+        self.transmission = list(self.terms(V_TRANSMISSION, 'Allele Transmission',
+            ['Germline', 'Chimeric', 'Cell Line', 'Not Applicable', 'Not Specified']).values())
+        self.existsAs = list(self.terms(V_EXISTSAS, 'Genotype Exists As',
+            ['Mouse Line', 'Cell Line', 'Chimeric', 'Not Specified', 'Not Applicable']).values())
+        self.pairStates = self.terms(V_PAIRSTATE, 'Allele Pair State',
+            ['Homozygous', 'Heterozygous', 'Hemizygous X-linked', 'Hemizygous Y-linked', 'Indeterminate'],
+            {'Homozygous': HOMOZYGOUS_KEY, 'Heterozygous': HETEROZYGOUS_KEY})
+        self.compounds = self.terms(V_COMPOUND, 'Allele Compound',
+            ['Not Applicable', 'Top', 'Bottom'], {'Not Applicable': COMPOUND_NA_KEY})
+        self.cellLineTypes = list(self.terms(V_CELLLINE_TYPE, 'Cell Line Type',
+            ['Embryonic Stem Cell', 'Embryonic Germ Cell', 'Trophoblast Stem Cell', 'Not Specified']).values())
+        self.vectors = list(self.terms(V_VECTOR, 'Cell Line Vector Name',
+            ['L1L2_Bact_P', 'L1L2_gt0', 'pGT0lxf', 'pGT1lxf', 'Not Specified', 'VICTR24', 'ROSAbetageo']).values())
+        self.vectorTypes = list(self.terms(V_VECTOR_TYPE, 'Cell Line Vector Type',
+            ['Targeting', 'Gene Trapping', 'Not Applicable', 'Not Specified']).values())
+        self.derivationTypes = list(self.terms(V_DERIVATION_TYPE, 'Cell Line Derivation Type',
+            ['Targeted', 'Gene trapped', 'Not Specified']).values())
+        self.creators = list(self.terms(V_CREATOR, 'Cell Line Creator',
+            ['EUCOMM', 'KOMP', 'Lexicon', 'Sanger', 'Regeneron', 'Not Specified']).values())
+        self.strengths = self.terms(V_STRENGTH, 'GXD Strength', STRENGTHS)
+        self.patterns = list(self.terms(V_PATTERN, 'GXD Pattern', PATTERNS).values())
+        self.gelControls = self.terms(V_GELCONTROL, 'GXD Gel Control',
+            ['No', 'Yes - RNA', 'Yes - Protein', 'Not Applicable'], {'No': GELCONTROL_NO_KEY})
+        self.referenceTypes = self.terms(V_REFERENCE_TYPE, 'Reference Type',
+            ['Peer Reviewed Article', 'Book', 'Personal Communication', 'Unreviewed Article', 'MGI Curation Record'],
+            {'Peer Reviewed Article': PEER_REVIEWED_KEY})
+        self.terms(V_MCV, 'Marker Category Vocab', [])
+        self.mcvTerms = {}
+        for mtype, share, terms in MOUSE_MARKER_TYPES:
+            for t, s in terms:
+                if t not in self.mcvTerms:
+                    self.mcvTerms[t] = self.term(V_MCV, t)
+        self.mcvTerms['gene'] = self.term(V_MCV, 'gene')
+        self.clusterSources = self.terms(V_CLUSTER_SOURCE, 'Marker Cluster Source',
+            ['HomoloGene and HGNC', 'Alliance Direct', 'Alliance Clustered'],
+            {'HomoloGene and HGNC': HYBRID_HOMOL_KEY})
+        self.htVariables = list(self.terms(V_HT_VARIABLES, 'GXD HT Variables',
+            ['age', 'anatomy', 'cell type', 'developmental stage', 'genotype', 'sex', 'strain',
+             'treatment', 'disease state', 'time', 'diet', 'growth conditions', 'other', 'None']).values())
+        self.htEvaluation = list(self.terms(V_HT_EVALUATION, 'GXD HT Evaluation State',
+            ['Yes', 'No', 'Maybe', 'Not Evaluated']).values())
+        self.htCuration = self.terms(V_HT_CURATION, 'GXD HT Curation State',
+            ['Done', 'Not Done', 'Not Applicable'], {'Done': CURATIONSTATE_DONE_KEY})
+        self.htStudyTypes = list(self.terms(V_HT_STUDYTYPE, 'GXD HT Study Type',
+            ['Baseline', 'WT vs. Mutant', 'Treatment vs. Control', 'Other', 'Not Specified']).values())
+        self.htExpTypes = list(self.terms(V_HT_EXPTYPE, 'GXD HT Experiment Type',
+            ['transcription profiling by array', 'RNA-Seq', 'single cell RNA-Seq', 'ChIP-Seq']).values())
+        self.htSources = list(self.terms(V_HT_SOURCE, 'GXD HT Source', ['ArrayExpress', 'GEO']).values())
+        self.htRelevance = self.terms(V_HT_RELEVANCE, 'GXD HT Relevance', ['Yes', 'No', 'Not Specified'])
+        self.sexTerms = list(self.terms(V_SEX, 'Sex', ['Male', 'Female', 'Pooled', 'Not Specified']).values())
+        self.htProperties = self.terms(V_HT_PROPERTY, 'GXD HT Experiment Property',
+            ['PubMed ID', 'Contact Name', 'Submitter Institution'])
+        self.relationshipTerms = self.terms(V_RELATIONSHIP, 'Feature Relationship',
+            [c[5] for c in RELATIONSHIP_CATEGORIES])
+        self.relationshipQualifiers = list(self.terms(V_RELATIONSHIP_QUALIFIER, 'Feature Relationship Qualifier',
+            ['Not Specified', 'conditional', 'inferred']).values())
+        self.vocab(V_RELATIONSHIP_EVIDENCE, 'Feature Relationship Evidence')
+        self.relationshipEvidence = [self.term(V_RELATIONSHIP_EVIDENCE, self.text(2, 3), abbreviation=c)
+            for c in ['IDA', 'IC', 'TAS', 'IEA', 'IMP']]
+        self.relationshipProperties = self.terms(V_RELATIONSHIP_PROPERTY, 'Feature Relationship Property',
+            sorted(set(p for c in RELATIONSHIP_CATEGORIES for p in c[6])))
+
+    def loadReferences(self):
+        rng = self.rng
+        self.nrefs = n = self.count('references')
+        # ref key -> PubMed id (or None)
+        self.pmids = [None] * (n + 1)
+        rtypes = [(k, .9 if t == 'Peer Reviewed Article' else .025) for t, k in self.referenceTypes.items()]
+        for rk in range(1, n + 1):
+            authors = '; '.join('%s %s' % (rng.choice(SURNAMES), rng.choice('ABCDEFGHJKLMNPRSTW'))
+                for i in range(self.howMany(5, 1)))
+            year = rng.randint(1950, 2025)
+            self.add('BIB_Refs', rk, self.weighted(rtypes), authors, self.text(6, 16).capitalize(),
+                rng.choice(JOURNALS), str(rng.randint(1, 500)), str(rng.randint(1, 24)), str(year), year,
+                '%d-%d' % (rng.randint(1, 900), rng.randint(901, 999)),
+                self.text(100, 250) if rng.random() < .7 else None)
+            self.mgiId(rk, REF)
+            self.accession('J:%d' % rk, MGI_LDB, rk, REF)
+            if rng.random() < .8:
+                # (a few PubMed ids are shared by two references)
+                pmid = str(1000000 + (rk if rng.random() < .998 else rk - 1))
+                self.pmids[rk] = pmid
+                self.accession(pmid, PUBMED_LDB, rk, REF)
+                if rng.random() < .5:
+                    self.accession('10.1000/j.%d' % rk, DOI_LDB, rk, REF)
+
+    def loadStrains(self):
+        rng = self.rng
+        self.nstrains = n = self.count('strains')
+        special = ['C57BL/6J', 'CAROLI/EiJ', 'PAHARI/EiJ', 'SPRET/EiJ', 'Not Specified']
+        for sk in range(1, n + 1):
+            name = special[sk - 1] if sk <= len(special) else '%s-%s<%d>/J' % (
+                rng.choice(['C57BL/6', 'B6', '129S', 'BALB/c', 'FVB/N', 'STOCK']), rng.choice(SURNAMES)[:3], sk)
+            self.add('PRB_Strain', sk, rng.choice(self.strainTypes), name, 1 if rng.random() < .1 else 0, 0)
+            self.mgiId(sk, STRAIN)
+            for tk in rng.sample(self.strainAttributes, rng.randint(1, 2)):
+                self.add('VOC_Annot', self.key('VOC_Annot'), STRAIN_ATTRIBUTE_AKEY, sk, tk, None)
+            for i in range(self.howMany(1.5)):
+                if rng.random() < .5:
+                    self.add('PRB_Strain_Reference_View', sk, self.refs())
+                else:
+                    self.add('MGI_Reference_Assoc', self.key('MGI_Reference_Assoc'), self.refs(), sk, STRAIN,
+                        rng.choice(self.assocTypes[STRAIN]))
+            if rng.random() < .1:
+                self.add('MGI_Synonym', self.key('MGI_Synonym'), sk, STRAIN, 1004, None, name + '-syn')
+
+    def location(self, mk, ok, chrom, coords, strand):
+        if coords:
+            start = self.rng.randint(3000000, 180000000)
+            end = start + self.howMany(20000, 50)
+            self.add('MRK_Location_Cache', mk, ok, chrom, chrom, start, end, strand, 'GRCm39' if ok == 1 else 'GRCh38', 'NCBI')
+        else:
+            self.add('MRK_Location_Cache', mk, ok, chrom, None, None, None, None, None, None)
+
+    def loadMarkers(self):
+        rng = self.rng
+        nm, nh, no = self.count('mouseMarkers'), self.count('humanMarkers'), self.count('otherMarkers')
+        self.mouseOfficial = []
+        self.mouseGenes = []
+        # official genes with coordinates and strand: [(key, chromosome)]
+        self.mouseLocated = []
+        self.humanLocated = []
+        self.humanMarkers = []
+        self.symbols = [None] * (nm + 1)
+        mchrs = CHROMOSOMES[1]
+        mweights = [1] * 19 + [.8, .1, .02, .1]
+        mtypes = [(t, s) for t, s, terms in MOUSE_MARKER_TYPES]
+        mterms = dict((t, terms) for t, s, terms in MOUSE_MARKER_TYPES)
+        for mk in range(1, nm + 1):
+            mtype = self.weighted(mtypes)
+            withdrawn = rng.random() < .03
+            symbol = '%s%s%d' % (rng.choice(SURNAMES)[:3], rng.choice('abcdefgh'), mk)
+            chrom = rng.choices(mchrs, mweights)[0]
+            self.symbols[mk] = symbol
+            self.add('MRK_Marker', mk, 1, 2 if withdrawn else 1, mtype, symbol, self.text(2, 6), chrom)
+            self.mgiId(mk, MARKER)
+            if rng.random() < .05:
+                self.mgiId(mk, MARKER, preferred=0)
+            coords = chrom != 'UN' and mtype not in (6, 3) and rng.random() < .95
+            strand = rng.choice('+-') if rng.random() < .97 else None
+            self.location(mk, 1, chrom, coords, strand)
+            term = self.weighted(mterms[mtype])
+            self.add('MRK_MCV_Cache', mk, self.mcvTerms[term], term, 'D')
+            if mtype == 1:
+                self.add('MRK_MCV_Cache', mk, self.mcvTerms['gene'], 'gene', 'I')
+            nrefs = self.howMany(8 if mtype == 1 else 1.5)
+            for rk in set(self.refs() for i in range(nrefs)):
+                self.add('MRK_Reference', mk, rk, 'J:%d' % rk, rk)
+            if withdrawn:
+                continue
+            self.mouseOfficial.append(mk)
+            if mtype == 1:
+                self.mouseGenes.append(mk)
+                if coords and strand:
+                    self.mouseLocated.append((mk, chrom))
+                if rng.random() < .9:
+                    self.accession(str(10000 + mk), ENTREZ_LDB, mk, MARKER)
+                self.accession('ENSMUSG%011d' % mk, ENSEMBL_LDB, mk, MARKER)
+                for i in range(self.howMany(2)):
+                    self.accession('AK%06d' % self.key('GenBank'), GENBANK_LDB, mk, MARKER)
+                if rng.random() < .7:
+                    ldb = SP_LDB if rng.random() < .4 else TR_LDB
+                    for i in range(self.howMany(1.3, 1)):
+                        # (some proteins belong to two genes)
+                        pk = self.keys.get('Protein', 0) if rng.random() < .02 else self.key('Protein')
+                        accid = ('P%05d' if ldb == SP_LDB else 'Q%07d') % pk
+                        self.accession(accid, ldb, mk, MARKER)
+                        self.add('SEQ_Marker_Cache', mk, 1, 1, ldb, accid)
+                if rng.random() < .3:
+                    self.note(1014, MARKER, mk, self.text(40, 200))
+                if rng.random() < .1:
+                    self.add('MRK_Notes', mk, self.text(20, 80))
+                if rng.random() < .01:
+                    self.note(1035, MARKER, mk, self.text(10, 30))
+            for i in range(self.howMany(.8)):
+                self.add('MRK_Label', self.key('MRK_Label'), mk, 1, None, rng.choice(['MS', 'MN', 'MY']),
+                    'synonym', '%s-%d' % (symbol, i))
+            if rng.random() < .1:
+                self.add('MRK_Label', self.key('MRK_Label'), mk, 1, 2, 'OS', 'human synonym', symbol.upper())
+            if rng.random() < .01:
+                self.add('MGI_Synonym', self.key('MGI_Synonym'), mk, MARKER, 1008, None, symbol + '-s')
+        #
+        hchrs = CHROMOSOMES[2][:-1]
+        for mk in range(nm + 1, nm + nh + 1):
+            # (human and other markers are all genes: type Pseudogene has no MCV term)
+            mtype = 1
+            chrom = rng.choice(hchrs)
+            symbol = '%s%d' % (rng.choice(SURNAMES)[:4].upper(), mk)
+            self.add('MRK_Marker', mk, 2, 1, mtype, symbol, self.text(2, 6), chrom)
+            self.accession(str(100000 + mk), ENTREZ_LDB, mk, MARKER)
+            if rng.random() < .8:
+                self.accession('HGNC:%d' % mk, HGNC_LDB, mk, MARKER)
+            coords = rng.random() < .95
+            strand = rng.choice('+-')
+            self.location(mk, 2, chrom, coords, strand)
+            self.humanMarkers.append(mk)
+            if coords:
+                self.humanLocated.append((mk, chrom))
+            if rng.random() < .3:
+                self.add('MRK_Label', self.key('MRK_Label'), mk, 2, None, 'MS', 'synonym', symbol + '-h')
+        #
+        for mk in range(nm + nh + 1, nm + nh + no + 1):
+            ok = rng.choice(OTHER_ORGANISMS)
+            self.add('MRK_Marker', mk, ok, 1, 1,
+                '%s%d' % (rng.choice(SURNAMES)[:4].lower(), mk), self.text(2, 5), rng.choice(CHROMOSOMES[ok]))
+            if rng.random() < .7:
+                self.accession(str(200000 + mk), ENTREZ_LDB, mk, MARKER)
+        # pseudoautosomal partners
+        xs = [k for k, c in self.mouseLocated if c == 'X']
+        ys = [k for k, c in self.mouseLocated if c == 'Y']
+        for x, y in list(zip(xs, ys))[:max(2, int(40 * self.scale))]:
+            self.relationship(1012, x, y)
+            self.relationship(1012, y, x)
+
+    def loadAlleles(self):
+        rng = self.rng
+        n = self.count('alleles')
+        # allele -> marker key (or None), mutant cell line keys
+        self.alleleMarkers = [None] * (n + 1)
+        self.alleleCellLines = {}
+        self.nalleles = n
+        self.alleleWithMarkers = []
+        types = [('Targeted', .58), ('Gene trapped', .22), ('Endonuclease-mediated', .07),
+            ('Chemically induced (ENU)', .04), ('Spontaneous', .03), ('Radiation induced', .005),
+            ('Transgenic (Cre/Flp)', .02), ('Transgenic (Reporter)', .015), ('Transgenic (Transactivator)', .005),
+            ('Transgenic', .015)]
+        collections = [(k, .6 if t == 'Not Specified' else .04) for t, k in self.collections.items()]
+        attributes = list(self.alleleAttributes.values())
+        # cell lines: parents and derivations first
+        nparents = self.count('parentCellLines')
+        for ck in range(1, nparents + 1):
+            self.add('ALL_CellLine', ck, 'ES-%d' % ck, self.cellLineTypes[0] if rng.random() < .95 else
+                rng.choice(self.cellLineTypes), rng.randint(1, self.nstrains), None, 0)
+        self.keys['ALL_CellLine'] = nparents
+        derivations = []
+        for dk in range(1, self.count('derivations') + 1):
+            self.add('ALL_CellLine_Derivation', dk, 'derivation %d' % dk, rng.choice(self.vectors),
+                rng.choice(self.vectorTypes), rng.randint(1, nparents), rng.choice(self.derivationTypes),
+                rng.choice(self.creators), self.refs() if rng.random() < .5 else None)
+            derivations.append(dk)
+        for ak in range(1, n + 1):
+            atype = self.weighted(types)
+            mk = None if atype == 'Transgenic' or rng.random() < .03 else rng.choice(self.mouseOfficial)
+            self.alleleMarkers[ak] = mk
+            wildtype = 1 if rng.random() < .02 else 0
+            symbol = '%s<%s%d%s>' % (self.symbols[mk] if mk else 'Tg', 'tm' if atype == 'Targeted' else 'Gt',
+                ak, rng.choice(['Lex', 'Wtsi', 'Vlcg', 'Mbp', 'Jae']))
+            self.add('ALL_Allele', ak, mk, rng.randint(1, self.nstrains), rng.choice(self.inheritance),
+                self.alleleTypes[atype], rng.choice(self.transmission), self.weighted(collections), symbol,
+                self.text(2, 6), wildtype, 1 if rng.random() < .01 else 0, 1 if rng.random() < .02 else 0)
+            if mk:
+                self.alleleWithMarkers.append(ak)
+            self.mgiId(ak, ALLELE)
+            if rng.random() < .03:
+                self.mgiId(ak, ALLELE, preferred=0)
+            for tk in rng.sample(self.mutations, rng.randint(1, 2)):
+                self.add('ALL_Allele_Mutation', self.key('ALL_Allele_Mutation'), ak, tk)
+            for tk in rng.sample(attributes, rng.randint(0, 2)):
+                self.add('VOC_Annot', self.key('VOC_Annot'), ALLELE_ATTRIBUTE_AKEY, ak, tk, None)
+            if rng.random() < .2:
+                self.note(1020, ALLELE, ak, self.text(10, 60))
+            if rng.random() < .4:
+                self.note(1021, ALLELE, ak, self.text(10, 40))
+            if rng.random() < .02:
+                self.note(1032, ALLELE, ak, 'induced by ' + rng.choice(['tamoxifen', 'doxycycline', 'tetracycline']))
+            for i in range(self.howMany(1.6, 1)):
+                self.add('MGI_Reference_Assoc', self.key('MGI_Reference_Assoc'), self.refs(), ak, ALLELE,
+                    self.assocTypes[ALLELE][0] if i == 0 else rng.choice(self.assocTypes[ALLELE]))
+            self.add('ALL_Label', ak, 'AS', 'symbol', symbol)
+            if rng.random() < .1:
+                self.add('ALL_Label', ak, 'AY', 'synonym', '%s-%d' % (symbol, ak))
+            if rng.random() < .05:
+                self.add('MGI_Synonym', self.key('MGI_Synonym'), ak, ALLELE, 1008, None, symbol + '-s')
+            if rng.random() < .3:
+                self.add('PRB_Strain_Marker', self.key('PRB_Strain_Marker'), rng.randint(1, self.nstrains), mk, ak)
+            # mutant ES cell lines
+            if atype in ('Targeted', 'Gene trapped') and rng.random() < .85:
+                cks = []
+                for i in range(self.howMany(1.3, 1)):
+                    ck = self.key('ALL_CellLine')
+                    self.add('ALL_CellLine', ck, 'EPD%07d' % ck, self.cellLineTypes[0], rng.randint(1, self.nstrains),
+                        rng.choice(derivations), 1)
+                    self.add('ALL_Allele_CellLine', self.key('ALL_Allele_CellLine'), ak, ck)
+                    cks.append(ck)
+                self.alleleCellLines[ak] = cks
+
+    def loadGenotypes(self):
+        rng = self.rng
+        self.ngenotypes = n = self.count('genotypes')
+        states = [(HOMOZYGOUS_KEY, .4), (HETEROZYGOUS_KEY, .45), (self.pairStates['Hemizygous X-linked'], .05),
+            (self.pairStates['Indeterminate'], .1)]
+        for gk in range(1, n + 1):
+            self.add('GXD_Genotype', gk, rng.randint(1, self.nstrains), 1 if rng.random() < .05 else 0,
+                self.text(5, 15) if rng.random() < .03 else None, rng.choice(self.existsAs))
+            self.mgiId(gk, GENOTYPE)
+            npairs = 1 if rng.random() < .8 else rng.randint(2, 4)
+            for i in range(npairs):
+                ak1 = rng.choice(self.alleleWithMarkers)
+                mk = self.alleleMarkers[ak1]
+                state = self.weighted(states)
+                ak2 = ak1 if state == HOMOZYGOUS_KEY else None
+                if state == HETEROZYGOUS_KEY and rng.random() < .3:
+                    ak2 = rng.choice(self.alleleWithMarkers)
+                ck1 = rng.choice(self.alleleCellLines[ak1]) if ak1 in self.alleleCellLines and rng.random() < .2 else None
+                ck2 = ck1 if ak2 == ak1 else None
+                self.add('GXD_AllelePair', self.key('GXD_AllelePair'), gk, ak1, ak2, mk, ck1, ck2, state,
+                    COMPOUND_NA_KEY if npairs == 1 or rng.random() < .8 else self.compounds['Top'], i + 1)
+                self.add('GXD_AlleleGenotype', gk, mk, ak1, 2 * i + 1)
+                if ak2 and ak2 != ak1:
+                    self.add('GXD_AlleleGenotype', gk, self.alleleMarkers[ak2], ak2, 2 * i + 2)
+
+    def loadExpression(self):
+        rng = self.rng
+        nprobes, nantibodies, nimages = self.count('probes'), self.count('antibodies'), self.count('images')
+        for pk in range(1, nprobes + 1):
+            self.mgiId(pk, PROBE)
+            self.add('GXD_ProbePrep', pk, pk)
+        for ak in range(1, nantibodies + 1):
+            self.mgiId(ak, ANTIBODY)
+            self.add('GXD_AntibodyPrep', ak, ak)
+        panes = []
+        for ik in range(1, nimages + 1):
+            released = rng.random() < .7
+            self.add('IMG_Image', ik, self.refs(), rng.randint(200, 1600) if released else None,
+                rng.randint(200, 1600) if released else None, 'Fig. %d' % rng.randint(1, 9) if rng.random() < .95 else None)
+            for i in range(self.howMany(2.5, 1)):
+                pk = self.key('IMG_ImagePane')
+                self.add('IMG_ImagePane', pk, ik, 'ABCDEFGH'[i % 8])
+                panes.append(pk)
+        strengths = [(self.strengths[s], w) for s, w in
+            [('Absent', .2), ('Present', .35), ('Trace', .03), ('Weak', .05), ('Moderate', .05), ('Strong', .1),
+             ('Very strong', .02), ('Ambiguous', .05), ('Not Specified', .1), ('Not Applicable', .05)]]
+        gelControls = [(GELCONTROL_NO_KEY, .85)] + [(k, .05) for t, k in self.gelControls.items() if k != GELCONTROL_NO_KEY]
+        assayTypes = [(t, t[3]) for t in ASSAY_TYPES]
+        for ak in range(1, self.count('assays') + 1):
+            atk, aname, isgel, share = self.weighted(assayTypes)
+            protein = atk in (6, 8)
+            self.add('GXD_Assay', ak, atk, self.refs(), rng.choice(self.mouseGenes),
+                None if protein else rng.randint(1, nprobes), rng.randint(1, nantibodies) if protein else None,
+                rng.choice(panes) if rng.random() < .4 else None,
+                datetime.datetime(2000, 1, 1) + datetime.timedelta(days=rng.randint(0, 9000)))
+            self.mgiId(ak, ASSAY)
+            if isgel:
+                for i in range(self.howMany(9, 1)):
+                    lk = self.key('GXD_GelLane')
+                    self.add('GXD_GelLane', lk, ak, rng.randint(1, self.ngenotypes), self.weighted(gelControls),
+                        i + 1, 'lane %d' % (i + 1), rng.choice(SEXES), rng.choice(AGES))
+                    for j in range(1 if rng.random() < .85 else 2):
+                        tk, start, end = rng.choice(self.emapa)
+                        self.add('GXD_GelLaneStructure', self.key('GXD_GelLaneStructure'), lk, tk, rng.randint(start, end))
+                    for j in range(self.howMany(2.5, 1)):
+                        self.add('GXD_GelBand', self.key('GXD_GelBand'), lk, j + 1, self.weighted(strengths))
+            else:
+                for i in range(self.howMany(5, 1)):
+                    sk = self.key('GXD_Specimen')
+                    self.add('GXD_Specimen', sk, ak, rng.randint(1, self.ngenotypes), i + 1,
+                        'specimen %d' % (i + 1), rng.choice(SEXES), rng.choice(AGES))
+                    for j in range(self.howMany(7, 1)):
+                        rk = self.key('GXD_InSituResult')
+                        self.add('GXD_InSituResult', rk, sk, self.weighted(strengths), rng.choice(self.patterns),
+                            j + 1, self.text(3, 12) if rng.random() < .1 else None)
+                        for m in range(1 if rng.random() < .9 else 2):
+                            tk, start, end = rng.choice(self.emapa)
+                            self.add('GXD_ISResultStructure', self.key('GXD_ISResultStructure'), rk, tk, rng.randint(start, end))
+                        if rng.random() < .1:
+                            self.add('GXD_ISResultCellType', self.key('GXD_ISResultCellType'), rk, rng.choice(self.cl))
+                        if rng.random() < .5:
+                            self.add('GXD_InSituResultImage', self.key('GXD_InSituResultImage'), rk, rng.choice(panes))
+
+    def loadHTExperiments(self):
+        rng = self.rng
+        pmids = [p for p in self.pmids if p]
+        curation = [(CURATIONSTATE_DONE_KEY, .7), (self.htCuration['Not Done'], .2), (self.htCuration['Not Applicable'], .1)]
+        relevance = [(self.htRelevance['Yes'], .7), (self.htRelevance['No'], .2), (self.htRelevance['Not Specified'], .1)]
+        for ek in range(1, self.count('htExperiments') + 1):
+            d = datetime.date(2010, 1, 1) + datetime.timedelta(days=rng.randint(0, 5000))
+            self.add('GXD_HTExperiment', ek, self.text(4, 10), self.text(20, 80), d, d, d,
+                rng.choice(self.htEvaluation), self.weighted(curation), rng.choice(self.htStudyTypes),
+                rng.choice(self.htExpTypes), rng.choice(self.htSources))
+            self.accession('E-GEOD-%d' % ek, ARRAYEXPRESS_LDB, ek, HTEXPT)
+            if rng.random() < .8:
+                self.accession('GSE%d' % ek, GEO_LDB, ek, HTEXPT, preferred=0)
+            for i in range(rng.randint(0, 2)):
+                # (some PubMed ids are not those of MGI references)
+                pmid = rng.choice(pmids) if rng.random() < .8 else str(9000000 + ek)
+                self.add('MGI_Property', self.key('MGI_Property'), 1002, self.htProperties['PubMed ID'], ek,
+                    HTEXPT, pmid, i + 1)
+            self.add('MGI_Property', self.key('MGI_Property'), 1002, self.htProperties['Contact Name'], ek,
+                HTEXPT, rng.choice(SURNAMES), 1)
+            if rng.random() < .3:
+                self.note(1047, HTEXPT, ek, self.text(5, 30))
+            for tk in rng.sample(self.htVariables, rng.randint(0, 3)):
+                self.add('GXD_HTExperimentVariable', self.key('GXD_HTExperimentVariable'), ek, tk)
+            for i in range(self.howMany(22, 1)):
+                sk = self.key('GXD_HTSample')
+                tk, start, end = rng.choice(self.emapa)
+                amin = rng.choice([None, 0.5, 10.5, 14.5, 21.0, 56.0])
+                self.add('GXD_HTSample', sk, ek, 'sample %d' % sk, rng.choice(AGES), amin,
+                    None if amin is None else amin + rng.choice([0, 1, 7]), self.weighted(relevance),
+                    1 if rng.random() < .97 else 2, rng.choice(self.sexTerms), tk, rng.randint(start, end),
+                    rng.choice(self.cl) if rng.random() < .05 else None, rng.randint(1, self.ngenotypes))
+                if rng.random() < .05:
+                    self.note(1048, HTSAMPLE, sk, self.text(5, 20))
+
+    def loadAnnotations(self):
+        rng = self.rng
+        n = self.count('annotations')
+        objects = {
+            'mouseGenes'   : lambda: rng.choice(self.mouseGenes),
+            'humanMarkers' : lambda: rng.choice(self.humanMarkers),
+            'genotypes'    : lambda: rng.randint(1, self.ngenotypes),
+            'alleles'      : lambda: rng.randint(1, self.nalleles),
+            }
+        vocabs = {V_GO: self.go, V_MP: self.mp, V_DO: self.do}
+        # annotations to withdrawn markers (excluded by AnnotationDumper)
+        withdrawn = list(set(range(1, len(self.symbols))) - set(self.mouseOfficial))
+        # annotation type -> keys (of base annotations)
+        annots = {}
+        for atk, name, mgitype, vkey, evkey, share, objs, base in ANNOTATION_TYPES:
+            self.add('VOC_AnnotType', atk, mgitype, vkey, evkey, name)
+            evidence = self.goEvidence if vkey == V_GO else self.mpEvidence
+            qualifiers = self.goQualifiers if vkey == V_GO else self.mpQualifiers
+            qualifiers = [(k, .9 if q is None else .1 / (len(qualifiers) - 1)) for q, k in qualifiers.items()]
+            terms = vocabs[vkey]
+            getObject = objects[objs]
+            keys = annots[atk] = []
+            for i in range(max(MIN_COUNT, int(n * share))):
+                ok = getObject()
+                if atk == 1000 and withdrawn and rng.random() < .002:
+                    ok = rng.choice(withdrawn)
+                annk = self.key('VOC_Annot')
+                self.add('VOC_Annot', annk, atk, ok, rng.choice(terms), self.weighted(qualifiers))
+                keys.append(annk)
+                for j in range(self.howMany(1.3, 1)):
+                    ek = self.key('VOC_Evidence')
+                    self.add('VOC_Evidence', ek, annk, rng.choice(evidence), self.refs(),
+                        'UniProtKB:P%05d' % rng.randint(1, 99999) if vkey == V_GO and rng.random() < .4 else None,
+                        datetime.datetime(2000, 1, 1) + datetime.timedelta(days=rng.randint(0, 9000)))
+                    if atk == 1002:
+                        if rng.random() < .5:
+                            self.add('VOC_Evidence_Property', self.key('VOC_Evidence_Property'), ek,
+                                self.evidenceProperties['MP-Sex-Specificity'], 1, 1, rng.choice(['M', 'F', 'NA']))
+                        if rng.random() < .01:
+                            self.note(rng.choice([1008, 1015, 1031]), EVIDENCE, ek, self.text(5, 25))
+                    elif base:
+                        for m in range(self.howMany(1.5, 1)):
+                            self.add('VOC_Evidence_Property', self.key('VOC_Evidence_Property'), ek,
+                                self.evidenceProperties['_SourceAnnot_key'], 1, m + 1, str(rng.choice(annots[base])))
+                    elif atk == 1000 and rng.random() < .2:
+                        self.add('VOC_Evidence_Property', self.key('VOC_Evidence_Property'), ek,
+                            self.evidenceProperties['occurs_in'], 1, 1, 'EMAPA:%d' % rng.randint(16000, 17000))
+        for atk, name, mgitype in ((STRAIN_ATTRIBUTE_AKEY, 'Strain/Attributes', STRAIN),
+                                   (ALLELE_ATTRIBUTE_AKEY, 'Allele/Attributes', ALLELE)):
+            self.add('VOC_AnnotType', atk, mgitype, None, None, name)
+
+    def relationship(self, category, key1, key2, props=()):
+        rk = self.key('MGI_Relationship')
+        self.add('MGI_Relationship', rk, category, key1, key2, self.relationshipTerms[self.categories[category]],
+            self.relationshipQualifiers[0] if self.rng.random() < .9 else self.rng.choice(self.relationshipQualifiers),
+            self.rng.choice(self.relationshipEvidence), self.refs())
+        for i, (name, value) in enumerate(props):
+            self.add('MGI_Relationship_Property', self.key('MGI_Relationship_Property'), rk,
+                self.relationshipProperties[name], value, i + 1)
+
+    def loadRelationships(self):
+        rng = self.rng
+        n = self.count('relationships')
+        for ck, name, t1, t2, share, rterm, props in RELATIONSHIP_CATEGORIES:
+            if share == 0:
+                continue
+            for i in range(max(MIN_COUNT, int(n * share))):
+                if t1 == ALLELE:
+                    ak = rng.choice(self.alleleWithMarkers)
+                    k1, k2 = ak, self.alleleMarkers[ak] if ck == 1003 else rng.choice(self.mouseOfficial)
+                else:
+                    k1, k2 = rng.choice(self.mouseGenes), rng.choice(self.mouseGenes)
+                values = []
+                for p in props:
+                    if p == 'score':
+                        values.append((p, '%.3f' % rng.random()))
+                    elif ck == 1004 and p == 'Non-mouse_Organism':
+                        values.append((p, rng.choice(['human', 'rat', 'jellyfish', 'E. coli'])))
+                    elif rng.random() < .8:
+                        values.append((p, self.text(1, 2)))
+                self.relationship(ck, k1, k2, values)
+
+    # MGI_Relationship_Category is written first: loadMarkers adds relationships.
+    @property
+    def categories(self):
+        if not hasattr(self, '_categories'):
+            self._categories = {}
+            for ck, name, t1, t2, share, rterm, props in RELATIONSHIP_CATEGORIES:
+                self.add('MGI_Relationship_Category', ck, name, V_RELATIONSHIP, t1, t2)
+                self._categories[ck] = rterm
+        return self._categories
+
+    def loadHomology(self):
+        rng = self.rng
+        mouse = list(self.mouseLocated)
+        human = list(self.humanLocated)
+        rng.shuffle(mouse)
+        rng.shuffle(human)
+        for i in range(min(self.count('clusters'), len(mouse), len(human))):
+            ck = self.key('MRK_Cluster')
+            source = HYBRID_HOMOL_KEY if rng.random() < .8 else self.clusterSources['Alliance Direct']
+            self.add('MRK_Cluster', ck, None, source, str(ck))
+            members = [mouse[i][0], human[i][0]]
+            if rng.random() < .1:
+                # one-to-many
+                members.append(rng.choice(human)[0] if rng.random() < .5 else rng.choice(mouse)[0])
+            for j, mk in enumerate(members):
+                self.add('MRK_ClusterMember', self.key('MRK_ClusterMember'), ck, mk, j + 1)
+
+def main(argv):
+    opts, args = getopt.getopt(argv, 't:f:', ['target=', 'scale=', 'seed='])
+    target = None
+    scale = 0.01
+    seed = 1
+    for o, v in opts:
+        if o in ('-t', '--target'):
+            target = v
+        elif o in ('-f', '--scale'):
+            scale = float(v)
+        elif o == '--seed':
+            seed = int(v)
+    if target is None:
+        raise RuntimeError('No target datasource (-t).')
+    Fixture(scale, seed).load(target)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -13,7 +13,10 @@
 #       2. There are no dangling references.
 #
 # Inputs to the script may comprise any combination of file names and/or directory names;
-# directories are expanded to the list of its files (nonrecursive, single level). 
+# directories are expanded to the list of its files (nonrecursive, single level), skipping
+# the dumper's bookkeeping files: *.json (e.g., manifest.json) and hidden files (e.g., its checkpoint),
+# and subdirectories (e.g., delta).
+# Files compressed by the dumper (.gz or .zst) are decompressed on the fly (see OutputWriter.openInput).
 # If no inputs are specified, the script reads from standard input.
 # The universe of objects to be checked is defined by the union of the contents of all the inputs.
 # 
@@ -26,6 +29,7 @@
 import sys
 import os
 import re
+from libdump.OutputWriter import openInput
 
 # regex that looks for patterns like 'ref_id="xxxx"' and 'id="xxxx"'.
 # Captures the id as group 2, the 'ref_' part (or '') as group 1.
@@ -42,13 +46,14 @@ errors = False
 def log(m):
     sys.stderr.write(m)
 
-def process( ifd ):
+def process( ifd, name=None ):
     global errors, idx, refidx
+    name = name or ifd.name
     lineNum = 0
-    log("Reading from file: %s\n"%ifd.name)
+    log("Reading from file: %s\n"%name)
     for line in ifd:
         lineNum += 1
-        val = (ifd.name, lineNum)
+        val = (name, lineNum)
         for m in id_re.finditer(line):
             id = m.group(2)
             if m.group(1):
@@ -83,6 +88,8 @@ def main():
     for a in sys.argv[1:]:
         if os.path.isdir(a):
             for f in os.listdir(a):
+                if f.endswith('.json') or f.startswith('.') or os.path.isdir(os.path.join(a, f)):
+                    continue
                 files.append(os.path.abspath(os.path.join(a, f)))
         else:
             files.append(a)
@@ -94,8 +101,8 @@ def main():
         process(sys.stdin)
     else:
         for f in files:
-            fd = open(f,'r')
-            process(fd)
+            fd = openInput(f)
+            process(fd, f)
             fd.close()
 
     # final check
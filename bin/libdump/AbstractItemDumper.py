@@ -1,11 +1,13 @@
 from .common import *
 from .DumperContext import DumperContext
+from . import mgidbconnect as db
+from . import ItemTemplate
 import re
 
 class AbstractItemDumper:
     SUPER_RE = re.compile(r'<([^>]+)>')
-    NA_RE = re.compile(r'<attribute\s+name=".*"\s+value="Not Applicable"\s+/>', re.M|re.I)
-    NV_RE = re.compile(r'^ *<(attribute|reference).* (value|ref_id)=""\s*/> *$', re.M|re.I)
+    NA_RE = ItemTemplate.NA_RE
+    NV_RE = ItemTemplate.NV_RE
     BAD_XML_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1F\uD800-\uDFFF\uFFFE\uFFFF]')
 
     def __init__(self, context, parentDumper = None):
@@ -69,24 +71,33 @@ class AbstractItemDumper:
             params = self.context.QUERYPARAMS
         return qtmplt % params
 
-    def writeItem(self, r, tmplt=None, i=None):
+    # Returns the item for record r, rendered with tmplt (see writeItem).
+    def renderItem(self, r, tmplt=None, i=None):
         if tmplt is None:
             tmplt=self.ITMPLT
-        if type(tmplt) is str:
-             s = tmplt % r
-        else:
-            s = tmplt[i] % r
+        if type(tmplt) is not str:
+            tmplt = tmplt[i]
+        # Templates are compiled once (and cached). Rendering drops "Not Applicable" 
+        # attributes (if suppressNA) and empty attributes/references (if suppressNV).
+        return ItemTemplate.compileTemplate(tmplt, self.suppressNA, self.suppressNV).render(r)
+
+    def writeItem(self, r, tmplt=None, i=None):
+        s = self.renderItem(r, tmplt, i)
         if self.filter(r, s) is not False:
-            if self.suppressNA:
-                s = self.NA_RE.sub('',s)
-            if self.suppressNV:
-                s = self.NV_RE.sub('',s)
-            self.context.writeOutput(r['id'],s)
-            self.writeCount += 1
-            if self.dotEvery > 0 and self.writeCount % self.dotEvery == 0:
-                self.context.log('.',timestamp=False,newline=False)
-                if (self.writeCount % (self.dotEvery*self.dotsPerLine) == 0):
-                    self.context.log(' %d'% self.writeCount,timestamp=False,newline=True)
+            self.writeRendered(r['id'], s)
+
+    # Writes item s, already rendered (and filtered), whose id is id.
+    def writeRendered(self, id, s):
+        self.context.writeOutput(id,s)
+        self.writeCount += 1
+        if self.dotEvery > 0 and self.writeCount % self.dotEvery == 0:
+            self.context.log('.',timestamp=False,newline=False)
+            if self.context.memory:
+                self.context.memory.check(self)
+            if self.context.deferredRefs is not None:
+                self.context.deferredRefs.compact()
+            if (self.writeCount % (self.dotEvery*self.dotsPerLine) == 0):
+                self.context.log(' %d'% self.writeCount,timestamp=False,newline=True)
 
     def _processRecord(self, r, qIndex=None):
         try:
@@ -101,8 +112,9 @@ class AbstractItemDumper:
             # the database, or the referenced object was filtered out by an upstream 
             # dumper (e.g., withdrawn markers). In either case, we'll simply 
             # suppress the current object.
+            # (They're counted, and summarized when the dumper finishes.)
             # 
-            self.context.log('DRE detected. (%s) Skipping record...\n%s\n' % (str(e), str(r)))
+            self.context.noteDanglingReference(self, e, r)
             return
         else:
             if rr is not None:
@@ -113,26 +125,71 @@ class AbstractItemDumper:
             self.recordCount = 0
             q = self.constructQuery()
             if len(q.strip()) > 0:
-                self.context.sql(q, self._processRecord)
+                self.runQuery(q)
         else:
             for i,qt in enumerate(self.QTMPLT):
                 self.recordCount = 0
                 q = self.constructQuery(qt)
                 if len(q.strip()) > 0:
-                    self.context.sql(q, self._processRecord, args={'qIndex':i})
+                    self.runQuery(q, i)
+
+    # Runs one query, passing each result row to _processRecord.
+    def runQuery(self, q, qIndex=None):
+        args = {} if qIndex is None else {'qIndex':qIndex}
+        if self.COPY:
+            for r in self.context.copyiter(q.strip().rstrip(';'), rowtype=self.ROWTYPE):
+                self._processRecord(r, **args)
+        else:
+            self.context.sql(q, self._processRecord, args=args, stream=self.STREAM, itersize=self.STREAM_ITERSIZE, rowtype=self.ROWTYPE)
+
+    # Runs one phase of the dump (with profiling, timed; see Profiler). With memory
+    # accounting, then reports memory use (see MemoryMonitor).
+    def runPhase(self, name, fn):
+        memory = self.context.memory
+        if memory:
+            outer = memory.enter(self)
+        try:
+            if self.context.profiler:
+                result = self.context.profiler.phase(self, name, fn)
+            else:
+                result = fn()
+        finally:
+            if memory:
+                memory.leave(outer)
+        if memory:
+            memory.afterPhase(self, name)
+        return result
 
     def dump(self, **kwargs):
         self.context.log('%s: Starting dump. args=%s' %(self.__class__.__name__, str(kwargs)))
         self.dumpArgs = kwargs
         self.fname = kwargs.get('fname',None)
         self.writeCount = 0
-        if self.fname:
-            self.context.openOutput(self.fname)
-        if self.preDump() == False:
-            return
-        self.mainDump()
-        self.postDump()
+        # (with deferred reference checking, the items with dangling references are
+        # dropped when the outermost dumper finishes)
+        self.context.beginDeferredRefs()
+        ok = False
+        try:
+            if self.fname:
+                self.context.openOutput(self.fname)
+            prof = self.context.profiler
+            if prof:
+                prof.begin(self)
+            try:
+                if self.runPhase('preDump', self.preDump) == False:
+                    return
+                self.runPhase('mainDump', self.mainDump)
+                self.runPhase('postDump', self.postDump)
+                ok = True
+            finally:
+                if prof:
+                    prof.end(self)
+        finally:
+            refs = self.context.endDeferredRefs(ok)
         self.context.log('', timestamp=False)
+        if refs is not None:
+            self.writeCount -= self.context.checkDeferredRefs(self, refs)
+        self.context.logDanglingReferences(self)
         self.context.log('%s: Finished dump. Total items written: %d' % (self.__class__.__name__, self.writeCount))
         return self.writeCount
 
@@ -163,8 +220,42 @@ class AbstractItemDumper:
     #
     ITMPLT = ''
 
+    # Controls how the query results are delivered to processRecord. By default (None), rows
+    # are streamed from a server-side cursor, mgidbconnect.STREAM_ITERSIZE rows at a time.
+    # Set STREAM to False to load each query's full result before processing, or 
+    # STREAM_ITERSIZE to change the number of rows per fetch.
+    #
+    # OVERRIDE ME (optional).
+    #
+    STREAM = None
+    STREAM_ITERSIZE = None
+
+    # The type of row objects passed to processRecord. By default, rows are dicts.
+    # Set to db.RECORD to get lightweight Record rows instead. These behave like dicts
+    # (fields can be read, set and added, and used to instantiate ITMPLT), but only
+    # the fields added or changed by processRecord are stored in a dict.
+    #
+    # OVERRIDE ME (optional).
+    #
+    ROWTYPE = db.DICT
+
+    # If True, queries are run using COPY (see mgidbconnect.copyiter) rather than 
+    # a cursor. Worthwhile for large table scans. (STREAM and STREAM_ITERSIZE are ignored.)
+    #
+    # OVERRIDE ME (optional).
+    #
+    COPY = False
+
+    # The MGI tables read by the dumper (including its sub-dumpers). If the tables haven't
+    # changed since the previous run, the previous output may be reused (see Fingerprints).
+    # If empty, the dumper always runs.
+    #
+    # OVERRIDE ME (optional).
+    #
+    TABLES = []
+
     # Process/modify a record, r, returned by the query.
-    # Returns a dict (e.g. r), or None. The dict is used to
+    # Returns a dict or Record (e.g. r), or None. The dict is used to
     # instantiate the ITMPLT to write to the output.
     # If None is returned, no output is written for the record.
     # When QTMPLT is a list, then the qIndex parameter will be set
@@ -185,7 +276,7 @@ class AbstractItemDumper:
     def postDump(self):
         pass
 
-    # Called just before outputting an item.
+    # Called just before outputting an item. Args are the record and the rendered item.
     # Return False to cancel outputting that item.
     # OVERRIDE ME.
     #
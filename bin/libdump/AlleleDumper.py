@@ -4,6 +4,10 @@ from .NoteUtils import iterNotes
 import re
 
 class AlleleDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'ALL_Allele', 'ALL_Allele_Mutation', 'ALL_Label',
+        'BIB_Refs','MGI_Note', 'MGI_RefAssocType', 'MGI_Reference_Assoc', 'MRK_Marker',
+        'PRB_Strain_Marker','VOC_Annot', 'VOC_Term']
+
     QTMPLT = '''
     SELECT 
         a._allele_key, 
@@ -239,7 +243,8 @@ class AlleleDumper(AbstractItemDumper):
 
 
     def postDump(self):
-        self.writeCount += AlleleSynonymDumper(self.context).dump(fname="Synonym.xml")
+        # Own file: each output file must belong to a single top-level dumper (see DumperScheduler).
+        self.writeCount += AlleleSynonymDumper(self.context).dump(fname="AlleleSynonym.xml")
         self.ak2generalnotes = None
         self.ak2mk = None
 
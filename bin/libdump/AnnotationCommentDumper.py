@@ -3,6 +3,8 @@ from libdump import NoteUtils
 
 
 class AnnotationCommentDumper(AbstractItemDumper):
+  TABLES = ['MGI_Note']
+
   ITMPLT = '''
      <item class="Comment" id="%(id)s">
        <attribute name="type" value="%(type)s" />
@@ -28,5 +30,5 @@ class AnnotationCommentDumper(AbstractItemDumper):
   def preProcess(self, n):
           n['id'] = self.context.makeItemId('Comment',n['_note_key'])
           n['note'] = self.quote(n['note'])
-          self.context.annotationComments.setdefault(n['_object_key'],[]).append('<reference ref_id="%s"/>'%n['id'])
+          self.context.appendShared('annotationComments', n['_object_key'], '<reference ref_id="%s"/>'%n['id'])
           self._processRecord(n)
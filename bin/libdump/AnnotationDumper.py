@@ -7,6 +7,9 @@ import os
 import re
 
 class AnnotationDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'MRK_Marker', 'VOC_Annot', 'VOC_AnnotType', 'VOC_Evidence',
+        'VOC_Evidence_Property','VOC_Term', 'VOC_Vocab']
+
     QTMPLT = [
         #
         # Get data for each annotation.
@@ -119,6 +122,9 @@ class AnnotationDumper(AbstractItemDumper):
         ''',
         ]
 
+    # The evidence query returns millions of rows
+    ROWTYPE = db.RECORD
+
     def __init__(self, ctx):
         AbstractItemDumper.__init__(self,ctx)
         self.atk2classes = { 
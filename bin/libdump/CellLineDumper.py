@@ -1,6 +1,9 @@
 from .AbstractItemDumper import *
 
 class CellLineDumper(AbstractItemDumper):
+    TABLES = ['ALL_Allele_CellLine', 'ALL_CellLine', 'ALL_CellLine_Derivation',
+        'VOC_Term']
+
     QTMPLT = '''
     SELECT 
         cl._cellline_key,
@@ -34,10 +37,11 @@ class CellLineDumper(AbstractItemDumper):
             ck = r['_mutantcellline_key']
             ak = r['_allele_key']
             try:
-                ar = '<reference ref_id="%s" />'%self.context.makeItemRef('Allele', ak)
+                # (a dangling reference only leaves the allele out, so check it now)
+                ar = '<reference ref_id="%s" />'%self.context.makeItemRef('Allele', ak, defer=False)
                 self.ck2ars[ck] = self.ck2ars.get(ck,'')+ar
-            except DumperContext.DanglingReferenceError:
-                pass
+            except DumperContext.DanglingReferenceError as e:
+                self.context.noteDanglingReference(self, e, r)
 
     def processRecord(self, r):
         r['id'] = self.context.makeItemId('CellLine', r['_cellline_key'])
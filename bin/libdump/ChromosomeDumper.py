@@ -1,6 +1,8 @@
 from .AbstractItemDumper import *
 
 class ChromosomeDumper(AbstractItemDumper):
+    TABLES = ['MGI_Organism', 'MRK_Chromosome', 'MRK_Location_Cache']
+
     QTMPLT = '''
     SELECT c._organism_key, c.chromosome, o.commonname, mc._chromosome_key, max(c.endcoordinate) AS length
     FROM mrk_location_cache c, mgi_organism o, mrk_chromosome mc
@@ -3,6 +3,8 @@ from .AbstractItemDumper import *
 
 
 class CrossReferenceDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession']
+
     QTMPLT = '''
     SELECT a._accession_key, a.accid, a._logicaldb_key, a._object_key, a._mgitype_key
     FROM ACC_Accession a
@@ -16,6 +18,9 @@ class CrossReferenceDumper(AbstractItemDumper):
       <reference name="source" ref_id="%(source)s" />
       </item>
     '''
+    # full scan of ACC_Accession
+    COPY = True
+
     def __init__(self, context, mgiTypeKeys=[1,2,10,11], ldbKeys=None, notLdbKeys=[1], emptyAccid="\'\'"):
         AbstractItemDumper.__init__(self, context)
 
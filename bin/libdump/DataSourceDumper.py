@@ -2,6 +2,8 @@
 from .AbstractItemDumper import *
 
 class DataSourceDumper(AbstractItemDumper):
+    TABLES = ['ACC_LogicalDB', 'ACC_ActualDB', 'MGI_dbinfo']
+
     QTMPLT = '''
     SELECT db._logicaldb_key, db.name, db.description, ab.name AS aname, ab.url
     FROM ACC_LogicalDB db
@@ -20,7 +22,6 @@ class DataSourceDumper(AbstractItemDumper):
     '''
 
     def preDump(self):
-        self.context.dataSourceByName = {}
         q = '''
         SELECT _logicaldb_key
         FROM ACC_ActualDB
@@ -46,7 +47,7 @@ class DataSourceDumper(AbstractItemDumper):
         else:
             r['url'] = '<attribute name="url" value="%s" />' % self.quote(r['url'])
         r['url'] = r['url'].replace('@@@@','&lt;&lt;attributeValue&gt;&gt;')
-        self.context.dataSourceByName[r['name']] = r['id']
+        self.context.setShared('dataSourceByName', r['name'], r['id'])
         r['name'] = self.quote(r['name'])
         r['description'] = self.quote(r['description'])
         if r['_logicaldb_key'] == self.context.QUERYPARAMS['MGI_LDBKEY']:
@@ -62,8 +63,6 @@ class DataSetDumper(AbstractItemDumper):
         </item>
     '''
     def dataSet(self, **rec):
-        if not hasattr(self.context, 'dataSetByName'):
-            self.context.dataSetByName = {}
         n = rec['name']
         id = self.context.dataSetByName.get(n, None)
         if id:
@@ -74,7 +73,7 @@ class DataSetDumper(AbstractItemDumper):
             # if not specified, assume source is MGI
             rec['dataSource'] = self.context.makeItemRef('DataSource',1)
         self.writeItem(rec)
-        self.context.dataSetByName[n] = id
+        self.context.setShared('dataSetByName', n, id)
         return id
 
 
@@ -1,9 +1,50 @@
 from .common import *
 from . import mgidbconnect as db
+from .IdRegistry import IdRegistry, DeferredRefs
+from .OutputWriter import ItemFile, DEFAULT_BUFSIZE, MANIFEST_NAME
+from .ItemDelta import ItemDelta
+from .Profiler import Profiler
+from .MemoryMonitor import MemoryMonitor
+import re
 import time
+import json
+import pickle
 
 class DumperContext:
 
+    # Context attributes that dumpers build up for use by later dumpers. Dumpers change them
+    # only through setShared, appendShared and addShared, which journal the changes; in a
+    # parallel dump, workers send their journals back to the parent (see takeDelta/applyDelta).
+    SHARED_STATE = ('dataSourceByName', 'dataSetByName', 'soIds', 'annotationComments')
+
+    # Name of the checkpoint file, in the output directory (see saveCheckpoint).
+    CHECKPOINT_NAME = '.checkpoint'
+
+    # The log file is written through a buffer of this size, and flushed at most every
+    # LOG_FLUSH_INTERVAL seconds (and by flushLog).
+    LOG_BUFSIZE = 1 << 16
+    LOG_FLUSH_INTERVAL = 2.0
+
+    # Number of example records kept for each kind of dangling reference (see noteDanglingReference).
+    DRE_SAMPLES = 3
+    # Example records are logged up to this length.
+    DRE_SAMPLE_LEN = 300
+
+    # Deferred reference checking (see checkDeferredRefs): the ids of an item, and of the
+    # items it refers to.
+    ITEM_ID_RE = re.compile(r'<item\b[^>]*\bid="([^"]+)"')
+    REF_ID_RE = re.compile(r'\bref_id="([^"]+)"')
+
+    # Context tables loaded from MGI when a dumper first uses them (see __getattr__), rather
+    # than by __init__, so that small runs (-c Organism) and tools only load what they need.
+    # Maps each attribute to the method that sets it.
+    LAZY = {
+        'TYPE_KEYS'      : 'loadMgiTypeKeys',
+        'TK2TNAME'       : 'loadMgiTypeKeys',
+        'mgi_dbinfo'     : 'loadMgiDbinfo',
+        'unciteablePubs' : 'loadUnciteablePubs',
+        }
+
     class ItemError(RuntimeError):
         pass
 
@@ -13,23 +54,58 @@ class DumperContext:
     class DanglingReferenceError(ItemError):
         pass
 
-    def __init__(self, debug=False, dir=".", limit=None, defs={}, logfile=None, logconsole=True, checkRefs=True):
+    def __init__(self, debug=False, dir=".", limit=None, defs={}, logfile=None, logconsole=True, checkRefs=True,
+            bufsize=DEFAULT_BUFSIZE, compression=None, writerThread=False, shardItems=None, shardBytes=None, stableIds=False,
+            deferRefs=False, partitionJobs=None):
         self.debug=debug
         self.dir = dir
         self.limit=limit
         self.fname = None
         self.checkRefs = checkRefs
+        # With checkRefs and deferRefs, references are checked in bulk when each (top level)
+        # dumper finishes, rather than as they are made (see makeGlobalKey, checkDeferredRefs).
+        # While a dumper runs: the references it has made, how deeply dumpers are nested,
+        # and the output files opened.
+        self.deferRefs = deferRefs
+        self.deferredRefs = None
+        self.deferDepth = 0
+        # filename -> ItemFile
+        self.deferFiles = {}
+        # output file options (see OutputWriter)
+        self.bufsize = bufsize
+        self.compression = compression
+        self.writerThread = writerThread
+        # If either is set, output files are split into shards of at most shardItems items
+        # and/or shardBytes characters each (see OutputWriter.ItemFile).
+        self.shardItems = shardItems
+        self.shardBytes = shardBytes
+        # Dumpers that can split their largest queries into key ranges (e.g., ExpressionDumper)
+        # process the ranges in this many worker processes. (None: in one query, as usual.)
+        self.partitionJobs = partitionJobs
+        # With profiling (see enableProfiling), the Profiler.
+        self.profiler = None
+        # With memory accounting (see enableMemoryMonitor), the MemoryMonitor.
+        self.memory = None
         db.setConnectionFromPropertiesFile()
+        # All queries made during the run share a pool of connections.
+        self.pool = db.ConnectionPool()
+        db.setPool(self.pool)
         self.fd = sys.stdout
+        # follows the timestamp in log messages (set in worker processes)
+        self.logPrefix = ''
         if logfile:
             self.logfile = os.path.abspath(os.path.join(os.getcwd(), logfile))
-            self.logfd = open(self.logfile, 'a')
+            self.logfd = open(self.logfile, 'a', self.LOG_BUFSIZE)
         else:
             self.logfile = "<stderr>"
             self.logfd = sys.stderr
         self.consolefd = None
         if logconsole and self.logfd is not sys.stderr:
             self.consolefd = sys.stderr
+        self.logFlushed = time.time()
+        # Dangling references tolerated by dumpers, not yet reported (see noteDanglingReference):
+        # (dumper name, referenced type) -> [count, example records]
+        self.danglingRefs = {}
         self.QUERYPARAMS = {
             # MGItype keys
             'REF_TYPEKEY'        : 1,
@@ -157,63 +233,13 @@ class DumperContext:
 
             }
 
-        # Keys from ACC_MGIType.
-        # Maps type name to type key
-        self.TYPE_KEYS = self.loadMgiTypeKeys()
-        # Add other types that we need to output
-        self.TYPE_KEYS.update({
-            'Homologue'                 : 10001,
-            'OrthologueEvidence'        : 10002,
-            'OrthologueEvidenceCode'    : 10003,
-            'Location'                  : 10004,
-            'GenotypeAllelePair'        : 10005,
-            'OntologyAnnotation'        : 10006,
-            'OntologyAnnotationEvidence': 10007,
-            'OntologyAnnotationEvidenceCode': 10008,
-            'Synonym'                   : 10009,
-            'DataSource'                : 10010,
-            'DataSet'                   : 10011,
-            'CrossReference'            : 10012,
-            'Author'                    : 10013,
-            'SOTerm'                    : 10014,
-            'SyntenicRegion'            : 10015,
-            'AlleleMolecularMutation'   : 10016,
-            'CellLine'                  : 10017,
-            'CellLineDerivation'        : 10018,
-            'Expression'                : 10019,
-            'EMAPATerm'                 : 10020,
-            'AlleleAttribute'           : 10021,
-            'DirectedRelationship'      : 10022,
-            'DirectedRelationshipProperty' : 10023,
-            'Protein'                   : 10024,
-            'Comment'                   : 10025,
-            'SyntenyBlock'              : 10026,
-            'StrainAttribute'           : 10027,
-            'AllelePublication'         : 10028,
-            'HTExperiment'              : 10029,
-            'HTVariable'                : 10030,
-            'HTSample'                  : 10031,
-            'CLTerm'                    : 10032,
-            })
-
-        # load MGI datadump timestamp from the database
-        self.loadMgiDbinfo()
-
-        # map integer type ids to type names
-        self.TK2TNAME = dict([(x[1],x[0]) for x in list(self.TYPE_KEYS.items())])
-
-        # Maps type name to next-id for allocating IDs.
+        # Registry of allocated item ids. For each type, holds the next-id counter,
+        # the mapping from MGI keys to ids, and which ids have been written out.
         # Generally, for a given type, either all IDs are generated
         # or all IDs are constructed from existing MGI keys.
-        self.NEXT_ID = { }
-
-        # Two-level map { type -> { mgi-key -> mapped-key }}
-        self.KEY_MAP = {}
-
-        #
-        # Keep track of item ids that have been written out.
-        #
-        self.idsWritten = set()
+        # With stableIds, ids are derived from MGI keys, and don't depend on dump order
+        # (see IdRegistry).
+        self.idRegistry = IdRegistry(stable=stableIds)
 
         # apply command-line definitions to the context
         for n,v in defs.items():
@@ -225,18 +251,38 @@ class DumperContext:
         # dict : filename -> filedescriptor
         #
         self.outfiles = {}
-
-        # list of non standard publications  
-        # aka private or de-emphasized in MGI
-
-        self.unciteablePubs = {}
-        self.loadUnciteablePubs()
-
+        # manifest entries of closed output files. basename -> ItemFile.manifest()
+        self.manifest = {}
+        # With item deltas (see enableItemDelta), the ItemDelta, and for each open
+        # output file, its FileDelta. filename -> FileDelta
+        self.itemDelta = None
+        self.fdeltas = {}
+        self.fdelta = None
+        # In a worker process, the output files inherited from the parent (see beginWorker).
+        self.parentOutputs = []
+
+        # shared state (see SHARED_STATE)
+        self.dataSourceByName = {}
+        self.dataSetByName = {}
+        self.soIds = set()
         self.annotationComments = {}
-
+        # changes to the shared state since beginDelta: list of (op, name, args)
+        self.stateJournal = None
+
+    # Loads the lazy context tables (see LAZY). Called only for attributes not (yet) set,
+    # so once loaded, they cost nothing more to use.
+    def __getattr__(self, n):
+        loader = DumperContext.LAZY.get(n, None)
+        if loader is None:
+            raise AttributeError(n)
+        getattr(self, loader)()
+        return self.__dict__[n]
+
+    # Loads the list of non standard publications, aka private or de-emphasized in MGI.
     # query based on PrivateRefSet.py in femover
     #   the Reference Type Key 31576687 is 'Peer Reviewed Article' (_vocab_key = 131)
     def loadUnciteablePubs(self):
+       self.unciteablePubs = {}
        q = '''select br._Refs_key as _refs_key
               from BIB_Refs br, ACC_Accession acc
               where br._Refs_key = acc._Object_key
@@ -245,7 +291,7 @@ class DumperContext:
               and acc._LogicalDB_key = 1
               and br._referencetype_key != 31576687
               '''
-       for r in db.sql(q):
+       for r in self.sql(q):
          self.unciteablePubs[r['_refs_key']] = 1;
 
     # returns true if the refKey is not in the list of unciteable reference keys
@@ -265,24 +311,64 @@ class DumperContext:
         self.mgi_dbinfo = self.sql(q)[0]
         self.mgi_dbinfo['lastdump_date_f'] = self.mgi_dbinfo['lastdump_date'].strftime('%Y-%m-%d')
         self.log('MGI database dump date: %s' % self.mgi_dbinfo['lastdump_date_f'])
+        if db.getSnapshotInfo():
+            self.log("Using MGI snapshot: %s" % str(db.getSnapshotInfo()))
 
     # Loads type information from ACC_MGIType.
+    # TYPE_KEYS maps type name to type key: the keys from ACC_MGIType, and the other types
+    # that we need to output. TK2TNAME maps type keys to type names.
     #
     def loadMgiTypeKeys(self):
-        tkeys = {}
+        self.TYPE_KEYS = {}
         q = '''
             SELECT _mgitype_key, name
             FROM ACC_MGIType
             '''
-        for r in db.sql(q):
-            tkeys[r['name']] = r['_mgitype_key']
-        return tkeys
+        for r in self.sql(q):
+            self.TYPE_KEYS[r['name']] = r['_mgitype_key']
+        # Add other types that we need to output
+        self.TYPE_KEYS.update({
+            'Homologue'                 : 10001,
+            'OrthologueEvidence'        : 10002,
+            'OrthologueEvidenceCode'    : 10003,
+            'Location'                  : 10004,
+            'GenotypeAllelePair'        : 10005,
+            'OntologyAnnotation'        : 10006,
+            'OntologyAnnotationEvidence': 10007,
+            'OntologyAnnotationEvidenceCode': 10008,
+            'Synonym'                   : 10009,
+            'DataSource'                : 10010,
+            'DataSet'                   : 10011,
+            'CrossReference'            : 10012,
+            'Author'                    : 10013,
+            'SOTerm'                    : 10014,
+            'SyntenicRegion'            : 10015,
+            'AlleleMolecularMutation'   : 10016,
+            'CellLine'                  : 10017,
+            'CellLineDerivation'        : 10018,
+            'Expression'                : 10019,
+            'EMAPATerm'                 : 10020,
+            'AlleleAttribute'           : 10021,
+            'DirectedRelationship'      : 10022,
+            'DirectedRelationshipProperty' : 10023,
+            'Protein'                   : 10024,
+            'Comment'                   : 10025,
+            'SyntenyBlock'              : 10026,
+            'StrainAttribute'           : 10027,
+            'AllelePublication'         : 10028,
+            'HTExperiment'              : 10029,
+            'HTVariable'                : 10030,
+            'HTSample'                  : 10031,
+            'CLTerm'                    : 10032,
+            })
+        self.TK2TNAME = dict([(x[1],x[0]) for x in list(self.TYPE_KEYS.items())])
 
     # Given a type name and an integer key unique within that 
     # type, creates a globally unique string key of the form
     # "n_m", where:
     #     n is the type, mapped to an integer key
-    #     m is local key, mapped to a 0-based sequence within the type.
+    #     m is local key, mapped to a 1-based sequence within the type
+    #       (or, with stable ids, the local key itself).
     # Args:
     #  itemType (string) The ID space in which to generate the key. Determines the "n" part.
     #  localKey (integer) If provided, also creates a mapping from localKey (which is generally
@@ -291,59 +377,198 @@ class DumperContext:
     #    mapping for type+localKey. (Used to generate the id values for new items.) If True, there must
     #    be an existing mapping for type+localKey. (Use for generating values for reference and collection
     #    attributes. If None, no existence check is made.
+    #  defer (boolean) Only applies if exists is True. If False, the reference is checked
+    #    immediately, even with deferred checking. (Use for a reference the caller leaves out,
+    #    keeping the item, when it dangles; a deferred check would drop the whole item.)
     # Returns:
     #   An identifier string of the form "n_m"
     #
-    def makeGlobalKey(self, itemType, localkey=None, exists=None):
+    def makeGlobalKey(self, itemType, localkey=None, exists=None, defer=True):
         # 
         n = self.TYPE_KEYS[itemType] if type(itemType) is str else itemType
-        kmap = self.KEY_MAP.setdefault(n, {})
-        m = self.NEXT_ID.setdefault(n, 1)
+        treg = self.idRegistry.getType(n)
         if localkey is None:
             # no local key, so no key mapping worries
-            self.NEXT_ID[n] += 1
+            m = treg.allocate()
         elif self.checkRefs and exists is True:
             # Generating a reference.
             # Enforce key mapping already exists, and that the object has was actually written
-            # and use the mapped key
-            m = kmap.get(localkey, None)
-            if not m or ('%d_%d' % (n,m)) not in self.idsWritten:
-                raise DumperContext.DanglingReferenceError('itemType=%d, localkey=%d' % (n, localkey))
+            # and use the mapped key.
+            # (With deferred checking, only record the reference; whether the object was
+            # written is checked when the dumper finishes.)
+            m = treg.ref(localkey)
+            deferred = self.deferredRefs if defer else None
+            if deferred is not None and m:
+                deferred.refs[n].append(m)
+            elif not m or not treg.isWritten(m):
+                e = DumperContext.DanglingReferenceError('itemType=%d, localkey=%d' % (n, localkey))
+                e.itemType = n
+                e.localkey = localkey
+                raise e
         elif self.checkRefs and exists is False:
             # Generating an id. 
             # Enforce we haven't already seen it (no duplicates)
             # Increment the counter
-            if localkey in kmap:
+            if treg.get(localkey) is not None:
                 raise DumperContext.DuplicateIdError('itemType=%d, localkey=%d' % (n, localkey))
-            self.NEXT_ID[n] += 1
-            kmap[localkey] = m
+            m = treg.allocateFor(localkey)
+            treg.put(localkey, m)
         else:
             # Don't care, just do the right thing.
             # If already seen, use the mapped key.
             # Otherwise, increment the counter.
-            if localkey in kmap:
-                m = kmap[localkey]
-            else:
-                kmap[localkey] = m
-                self.NEXT_ID[n] += 1
+            m = treg.get(localkey)
+            if m is None:
+                m = treg.allocateFor(localkey)
+                treg.put(localkey, m)
         id = '%d_%d' % (n,m)
         return id
 
+    # Records a dangling reference error (e) tolerated by a dumper, and the record
+    # skipped because of it. Errors are counted by dumper and referenced type, and a few
+    # example records kept; the counts are logged when the dumper finishes (see
+    # logDanglingReferences), rather than each record.
+    def noteDanglingReference(self, dumper, e, r=None):
+        n = getattr(e, 'itemType', None)
+        k = (dumper.__class__.__name__, self.TK2TNAME.get(n, n))
+        c = self.danglingRefs.get(k, None)
+        if c is None:
+            c = self.danglingRefs[k] = [0, []]
+        c[0] += 1
+        if r is not None and len(c[1]) < self.DRE_SAMPLES:
+            c[1].append('%s: %s' % (str(e), str(r)[:self.DRE_SAMPLE_LEN]))
+
+    # Logs a table of the dangling references noted for a dumper (by referenced type,
+    # with examples), and forgets them.
+    def logDanglingReferences(self, dumper):
+        name = dumper.__class__.__name__
+        keys = sorted(k for k in self.danglingRefs if k[0] == name)
+        if not keys:
+            return
+        counts = [(k[1], self.danglingRefs.pop(k)) for k in keys]
+        lines = ['%s: %d dangling reference(s), records skipped:' % (name, sum(c[0] for t, c in counts))]
+        lines.append('    %-32s %10s' % ('referenced type', 'count'))
+        for t, (n, samples) in sorted(counts, key=lambda x: -x[1][0]):
+            lines.append('    %-32s %10d' % (t, n))
+            for x in samples:
+                lines.append('        e.g. %s' % x)
+        self.log('\n'.join(lines))
+
+    # Called when a dumper starts. With deferred reference checking, starts recording
+    # references (unless the dumper is nested in another).
+    def beginDeferredRefs(self):
+        self.deferDepth += 1
+        if self.deferDepth == 1 and self.checkRefs and self.deferRefs:
+            self.deferredRefs = DeferredRefs(self.idRegistry)
+            self.deferFiles = {}
+
+    # Called when a dumper finishes (ok is False if it failed). If it is the outermost
+    # dumper, stops recording references, and returns them (a DeferredRefs) to be checked
+    # (see checkDeferredRefs). Otherwise returns None.
+    def endDeferredRefs(self, ok=True):
+        self.deferDepth -= 1
+        refs = self.deferredRefs
+        if self.deferDepth > 0 or refs is None:
+            return None
+        self.deferredRefs = None
+        return refs if ok else None
+
+    # With deferred reference checking, records that the items with ids children were
+    # written only for the item with id parent (e.g., its parts, written before it): if
+    # that item is dropped (see checkDeferredRefs), so are they. (With immediate checking,
+    # a record with a dangling reference is skipped before its parts are written.)
+    def ownItems(self, parent, children):
+        if self.deferredRefs is not None:
+            self.deferredRefs.own(parent, children)
+
+    # Checks, in bulk, the references recorded while dumper ran (refs, a DeferredRefs).
+    # The items holding dangling references are dropped from the dumper's output files
+    # (which are closed, then rewritten), and noted (see noteDanglingReference). Items
+    # that refer to dropped items are dropped in turn, as are the items owned by dropped
+    # items (see ownItems). Returns the number of items dropped.
+    def checkDeferredRefs(self, dumper, refs):
+        dangling = refs.check()
+        nd = sum(len(ms) for ms in dangling.values())
+        self.log('%s: checked %d references, %d dangling' % (dumper.__class__.__name__, refs.count, nd))
+        bad = set('%d_%d' % (n, m) for n, ms in dangling.items() for m in ms)
+        owned = set()
+        total = 0
+        while bad or owned:
+            dropped = self.dropItems(dumper, bad, owned)
+            for id in dropped:
+                self.idRegistry.unmarkWritten(id)
+            total += len(dropped)
+            bad = set(dropped)
+            owned = set(c for id in dropped for c in refs.owned.get(id, ()))
+        return total
+
+    # Closes the output files opened by the running dumper, and rewrites them without the
+    # items that refer to any id in bad, and the items whose id is in owned (see ownItems).
+    # Returns the ids of the items dropped.
+    def dropItems(self, dumper, bad, owned=()):
+        dropped = []
+        def drop(item):
+            if owned:
+                m = self.ITEM_ID_RE.search(item)
+                if m and m.group(1) in owned:
+                    dropped.append(m.group(1))
+                    return True
+            for ref in self.REF_ID_RE.findall(item):
+                if ref in bad:
+                    e = DumperContext.DanglingReferenceError('ref_id=%s' % ref)
+                    e.itemType = int(ref.split('_', 1)[0])
+                    self.noteDanglingReference(dumper, e, ' '.join(item.split()))
+                    m = self.ITEM_ID_RE.search(item)
+                    if m:
+                        dropped.append(m.group(1))
+                    return True
+            return False
+        for fname, fd in sorted(self.deferFiles.items()):
+            if self.outfiles.pop(fname, None) is not None:
+                fd.close()
+            if fd.rewrite(drop):
+                self.log('%s: dropped items with dangling references from %s' % (dumper.__class__.__name__, fname))
+            self.manifest[os.path.basename(fname)] = fd.manifest()
+        return dropped
+
     def makeItemId(self, itemType, localKey=None):
         return self.makeGlobalKey(itemType, localKey, False)
 
-    def makeItemRef(self, itemType, localKey):
-        return self.makeGlobalKey(itemType, localKey, True)
+    def makeItemRef(self, itemType, localKey, defer=True):
+        return self.makeGlobalKey(itemType, localKey, True, defer)
 
     # Wrapper that logs sql queries.
     #
-    def sql(self, q, p=None, args={}):
+    # If p is a parser function, rows are streamed to it from a server-side cursor
+    # (see mgidbconnect.sql). Pass stream=False to fetch the whole result first,
+    # or itersize to change the number of rows per fetch.
+    # Pass rowtype=db.RECORD to get lightweight Record rows instead of dicts.
+    # With profiling, all three record timings and row counts (see Profiler).
+    # With a memory limit, all three check it (see MemoryMonitor).
+    def sql(self, q, p=None, args={}, stream=None, itersize=None, rowtype=db.DICT):
         self.log(str(q))
-        return db.sql(q, p, args=args)
-
-    def sqliter(self, q):
+        if self.memory:
+            self.memory.check()
+        if self.profiler:
+            return self.profiler.sql(q, p, lambda p: db.sql(q, p, args=args, stream=stream, itersize=itersize, rowtype=rowtype))
+        return db.sql(q, p, args=args, stream=stream, itersize=itersize, rowtype=rowtype)
+
+    # (sqliter and copyiter use a pooled connection, unless one is passed in.)
+    def sqliter(self, q, itersize=None, rowtype=db.DICT, connection=None):
+        self.log(str(q))
+        if self.memory:
+            self.memory.check()
+        it = db.sqliter(q, connection=connection, itersize=itersize, rowtype=rowtype)
+        return self.profiler.iterate(q, it) if self.profiler else it
+
+    # Iterates over the results of q using COPY (see mgidbconnect.copyiter).
+    # Intended for large table scans.
+    def copyiter(self, q, decoders=None, rowtype=db.DICT, connection=None):
         self.log(str(q))
-        return db.sqliter(q)
+        if self.memory:
+            self.memory.check()
+        it = db.copyiter(q, connection=connection, decoders=decoders, rowtype=rowtype)
+        return self.profiler.iterate(q, it) if self.profiler else it
 
     def openOutput(self, fname):
         if self.fd and not self.fd.closed:
@@ -353,30 +578,263 @@ class DumperContext:
             os.makedirs(self.dir)
         self.fd = self.outfiles.get(self.fname, None)
         if self.fd is None:
+            if os.path.basename(self.fname) in self.manifest:
+                # reopening would overwrite it
+                raise RuntimeError('Output file already written and closed: %s' % self.fname)
             # open a new output file
-            self.fd = open(self.fname, 'w')
+            self.fd = ItemFile(self.fname, self.shardItems, self.shardBytes,
+                self.bufsize, self.compression, self.writerThread)
             self.outfiles[self.fname]=self.fd
-            self.fd.write('<?xml version="1.0"?>\n')
-            self.fd.write('<items>\n')
+            if self.itemDelta:
+                self.fdeltas[self.fname] = self.itemDelta.openFile(os.path.basename(self.fname))
+        self.fdelta = self.fdeltas.get(self.fname, None)
+        if self.deferredRefs is not None:
+            self.deferFiles[self.fname] = self.fd
+
+    # With stable ids, selects the block of ids for items without a key. Each dumper
+    # should use its own block (e.g., its position in the list of all dumpers).
+    def setIdBlock(self, block):
+        self.idRegistry.setBlock(block)
+
+    # Returns True iff an item with the given id has been written.
+    def isWritten(self, id):
+        return self.idRegistry.isWritten(id)
 
     def writeOutput(self, id, s):
-        self.idsWritten.add( id )
+        self.idRegistry.markWritten(id)
         self.fd.write(s)
-
-    def closeOutputs(self):
+        if self.fdelta:
+            self.fdelta.write(id, s)
+
+    # Compares each item written with the previous run into the same directory, and writes
+    # the added, changed and deleted items to the delta subdirectory (see ItemDelta).
+    # Requires stable ids. If resuming, keeps the deltas of the dumpers that have finished.
+    def enableItemDelta(self, resume=False):
+        if not self.idRegistry.stable:
+            raise RuntimeError('Item deltas require stable ids.')
+        if self.deferRefs:
+            # (items dropped after the fact would still be in the delta)
+            raise RuntimeError('Item deltas cannot be used with deferred reference checking.')
+        self.itemDelta = ItemDelta(self.dir, self.mgi_dbinfo['lastdump_date_f'],
+            self.compression, self.bufsize, resume)
+
+    # Records per-dumper, per-phase and per-query timings, written to the profile
+    # subdirectory of the output directory (see Profiler). With cprofile, each dumper
+    # also runs under cProfile.
+    def enableProfiling(self, cprofile=False, resume=False):
+        self.profiler = Profiler(self, cprofile, resume)
+
+    # Logs the memory used by the context and by each dumper's structures after each phase
+    # (if report), and/or fails when the RSS exceeds limitMb (see MemoryMonitor).
+    def enableMemoryMonitor(self, report=True, limitMb=None, tracemallocTop=0):
+        self.memory = MemoryMonitor(self, report, limitMb, tracemallocTop)
+
+    # Writes the summary of item deltas, for all the output files of the run.
+    def finishItemDelta(self):
+        summary = self.itemDelta.finish(list(self.manifest))
+        for fname, c in sorted(summary['files'].items()):
+            if c['base']:
+                self.log('Delta %s: %d added, %d changed, %d deleted, %d unchanged' % \
+                    (fname, c['added'], c['changed'], c['deleted'], c['unchanged']))
+            else:
+                self.log('Delta %s: no previous run, %d items' % (fname, c['items']))
+        t = summary['total']
+        self.log('Delta total (since %s): %d added, %d changed, %d deleted, %d unchanged, of %d items' % \
+            (summary['previous'], t['added'], t['changed'], t['deleted'], t['unchanged'], t['items']))
+
+    # Logs the number of ids and bytes used by the id registry, per type.
+    def logIdRegistry(self):
+        total = 0
+        for n, nkeys, nwritten, nbytes in self.idRegistry.report():
+            self.log('IdRegistry: type=%s keys=%d ids=%d bytes=%d' % (self.TK2TNAME.get(n, n), nkeys, nwritten, nbytes))
+            total += nbytes
+        self.log('IdRegistry: total bytes=%d' % total)
+
+    def closeOutputs(self, manifest=True):
         for fname,fd in list(self.outfiles.items()):
-            fd.write('\n</items>\n')
             fd.close()
+            self.manifest[os.path.basename(fname)] = fd.manifest()
+        for fdelta in self.fdeltas.values():
+            fdelta.close()
+        self.outfiles = {}
+        self.fdeltas = {}
+        self.fdelta = None
+        if manifest and (self.shardItems or self.shardBytes):
+            self.writeManifest()
+
+    # Writes the manifest of output files to the output directory. For each output file,
+    # lists its shards, with the number of items and the size (in bytes, as written) of each.
+    def writeManifest(self):
+        for fname,m in sorted(self.manifest.items()):
+            self.log('%s: %d items in %d shard(s), %d bytes' % (fname, m['items'], len(m['shards']), m['bytes']))
+        mname = os.path.join(self.dir, MANIFEST_NAME)
+        with open(mname, 'w') as mfd:
+            json.dump(self.manifest, mfd, indent=2, sort_keys=True)
+        self.log('Wrote manifest: %s' % mname)
+
+    # Settings that must be the same for a resumed run to produce the same output.
+    def checkpointConfig(self, plan):
+        return {
+            'dumpers'     : list(plan),
+            'lastdump'    : self.mgi_dbinfo['lastdump_date_f'],
+            'limit'       : self.limit,
+            'checkRefs'   : self.checkRefs,
+            'compression' : self.compression,
+            'shardItems'  : self.shardItems,
+            'shardBytes'  : self.shardBytes,
+            'stableIds'   : self.idRegistry.stable,
+            'itemDelta'   : self.itemDelta is not None,
+            }
+
+    # Saves a checkpoint after a dumper has finished: closes the output files, and
+    # writes the id registry and shared state to the checkpoint file in the output
+    # directory. A later run can resume from here (see loadCheckpoint).
+    # Args:
+    #   finished (list) of (dumper name, number of items written), in order of completion
+    #   plan (list) names of all the dumpers to be run
+    def saveCheckpoint(self, finished, plan):
+        self.closeOutputs(manifest=False)
+        state = {
+            'config'     : self.checkpointConfig(plan),
+            'finished'   : list(finished),
+            'idRegistry' : self.idRegistry,
+            'shared'     : dict((n, getattr(self, n)) for n in self.SHARED_STATE if hasattr(self, n)),
+            'manifest'   : self.manifest,
+            }
+        fname = os.path.join(self.dir, self.CHECKPOINT_NAME)
+        with open(fname + '.tmp', 'wb') as fd:
+            pickle.dump(state, fd, pickle.HIGHEST_PROTOCOL)
+        os.replace(fname + '.tmp', fname)
+        self.log('Saved checkpoint after %s' % finished[-1][0])
+
+    # Restores the state saved by saveCheckpoint. Returns the list of finished dumpers
+    # (see saveCheckpoint). Raises RuntimeError if there is no checkpoint, or if it was
+    # made with different settings or from a different MGI dump.
+    def loadCheckpoint(self, plan):
+        fname = os.path.join(self.dir, self.CHECKPOINT_NAME)
+        if not os.path.exists(fname):
+            raise RuntimeError('No checkpoint to resume from: %s' % fname)
+        with open(fname, 'rb') as fd:
+            state = pickle.load(fd)
+        config = self.checkpointConfig(plan)
+        for n, v in state['config'].items():
+            if config.get(n) != v:
+                raise RuntimeError('Cannot resume: %s was %s, is now %s' % (n, v, config.get(n)))
+        self.idRegistry = state['idRegistry']
+        for n, v in state['shared'].items():
+            setattr(self, n, v)
+        self.manifest = state['manifest']
+        self.log('Resuming from checkpoint. Finished: %s' % ', '.join(n for n,c in state['finished']))
+        return state['finished']
+
+    def removeCheckpoint(self):
+        fname = os.path.join(self.dir, self.CHECKPOINT_NAME)
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    # Called in a newly forked worker process (see DumperScheduler), before it runs a dumper.
+    def beginWorker(self, name):
+        self.logPrefix = '[%s] ' % name
+        # don't touch the parent's connections
+        self.pool = db.ConnectionPool()
+        db.setPool(self.pool)
+        # The parent's open output files are kept (unused) rather than dropped: finalized
+        # here, they would write out the parent's buffered items (or compression trailers)
+        # a second time. (Worker processes end with os._exit, without finalizing them.)
+        self.parentOutputs.append((self.outfiles, self.fdeltas))
+        self.outfiles = {}
+        self.manifest = {}
+        self.fdeltas = {}
+        self.fdelta = None
+        self.fd = sys.stdout
+        self.beginDelta()
+
+    # Called in a worker process after its dumper has finished. Closes its outputs
+    # and returns what the parent needs to merge (see applyDelta).
+    def endWorker(self):
+        delta = self.takeDelta()
+        self.closeConnections()
+        return delta
+
+    # Sets key in the shared dict name (see SHARED_STATE) to value. Raises RuntimeError if
+    # key is already set to a different value.
+    def setShared(self, name, key, value):
+        d = getattr(self, name)
+        x = d.get(key, value)
+        if x != value:
+            raise RuntimeError('Conflicting values for %s[%r]: %r, %r' % (name, key, x, value))
+        d[key] = value
+        if self.stateJournal is not None:
+            self.stateJournal.append(('set', name, (key, value)))
+
+    # Appends value to the list at key in the shared dict name.
+    def appendShared(self, name, key, value):
+        getattr(self, name).setdefault(key, []).append(value)
+        if self.stateJournal is not None:
+            self.stateJournal.append(('append', name, (key, value)))
+
+    # Adds member to the shared set name.
+    def addShared(self, name, member):
+        s = getattr(self, name)
+        if member not in s:
+            s.add(member)
+            if self.stateJournal is not None:
+                self.stateJournal.append(('add', name, (member,)))
+
+    # Starts recording the changes a dumper makes to the context (see takeDelta).
+    def beginDelta(self):
+        self.idRegistry.startJournal()
+        self.stateJournal = []
+        self.deltaFiles = set(self.manifest)
+
+    # Closes the output files, and returns the changes since beginDelta: ids allocated
+    # and written, the journal of changes to the shared state, and the manifest entries of
+    # the files written. Recording goes on from here.
+    def takeDelta(self):
+        self.closeOutputs(manifest=False)
+        state = self.stateJournal
+        files = self.deltaFiles
+        self.stateJournal = []
+        self.deltaFiles = set(self.manifest)
+        return {
+            'ids'      : self.idRegistry.takeJournal(),
+            'state'    : state,
+            'manifest' : dict((f, m) for f, m in self.manifest.items() if f not in files),
+            }
+
+    # Merges changes returned by takeDelta (possibly in another process) into this context.
+    # Raises RuntimeError if they set a shared key to a value different from this context's
+    # (e.g., two parallel dumpers each wrote a data set of the same name).
+    APPLY_SHARED = {'set': setShared, 'append': appendShared, 'add': addShared}
+    def applyDelta(self, result):
+        self.idRegistry.applyJournal(result['ids'])
+        for op, name, args in result['state']:
+            self.APPLY_SHARED[op](self, name, *args)
+        self.manifest.update(result['manifest'])
+
+    # Closes pooled database connections and logs connection usage.
+    def closeConnections(self):
+        self.log('Database connections: %s' % str(self.pool.report()))
+        self.pool.closeAll()
+        self.flushLog()
 
     def log(self, s, timestamp=True, newline=True):
         newline = newline and "\n" or ""
-        timestamp = timestamp and ("%s :: "%time.asctime()) or ""
+        timestamp = timestamp and ("%s :: %s"%(time.asctime(), self.logPrefix)) or ""
         msg = "%s%s%s" % (timestamp, s, newline)
         self.logfd.write(msg)
-        self.logfd.flush()
         if self.consolefd:
             self.consolefd.write(msg)
+        if time.time() - self.logFlushed >= self.LOG_FLUSH_INTERVAL:
+            self.flushLog()
+
+    # Writes out buffered log messages. (Must be called before forking, so they aren't
+    # written twice, and before a worker process exits.)
+    def flushLog(self):
+        self.logfd.flush()
+        if self.consolefd:
             self.consolefd.flush()
+        self.logFlushed = time.time()
 
     def installSamplers(self, samplermodule):
         for n in dir(samplermodule):
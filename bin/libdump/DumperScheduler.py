@@ -0,0 +1,187 @@
+#
+# DumperScheduler.py
+#
+# Runs dumpers in parallel worker processes, respecting their dependencies.
+#
+# A dumper is started as soon as all of its dependencies have finished (and a job
+# slot is free). Each dumper runs in its own forked process, so it starts with the
+# parent's context as of that moment: all ids and shared state (DumperContext.SHARED_STATE)
+# produced by its dependencies. Reference checking works as in a sequential run.
+# Each output file must be written by a single (top-level) dumper.
+# When a worker finishes, it sends back the ids it allocated and wrote, and its
+# additions to the shared state, and the parent merges them into its context.
+#
+# Workers allocate ids in blocks from counters shared by all processes (see IdRegistry),
+# so concurrently running dumpers never generate the same id. (The ids are therefore
+# not the same as in a sequential run.) With stable ids, no coordination is needed,
+# and the ids are the same as in a sequential run.
+#
+# Usage:
+#       s = DumperScheduler(context, dependencies, jobs=4)
+#       total = s.run(dumperClasses, task, done, onFinish, reuse)
+# where task(cls) runs dumper class cls (in the worker) and returns the number of items written,
+# done lists dumpers that have already run (e.g., before resuming from a checkpoint),
+# onFinish(cls, n, delta) is called (in the parent) after each dumper's results (delta, see
+# DumperContext.takeDelta) have been merged, and reuse(cls), if given, is called (in the
+# parent) when cls is ready to run. If it returns a number of items instead of None, the
+# dumper's previous output has been reused (see Fingerprints), and the dumper is not run.
+#
+# Each worker's result also includes its resource usage (peak RSS and CPU time, see
+# rusage), logged when it finishes.
+#
+# At the end, the critical path (the chain of dependent dumpers that determines the
+# minimum run time) is logged.
+#
+
+import time
+import resource
+import traceback
+import multiprocessing
+import multiprocessing.connection
+from .IdRegistry import BlockAllocator
+
+# Returns the resource usage of this process: peak RSS (MB), user and system CPU time (s).
+def rusage():
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return {'maxrss_mb': ru.ru_maxrss / 1024.0, 'utime': ru.ru_utime, 'stime': ru.ru_stime}
+
+class DumperScheduler:
+    def __init__(self, context, dependencies, jobs):
+        self.context = context
+        self.dependencies = dependencies
+        self.jobs = max(1, jobs)
+        self.mp = multiprocessing.get_context('fork')
+        # dumper class -> (start, end) times, relative to start of run
+        self.times = {}
+
+    def log(self, s):
+        self.context.log(s)
+
+    # Worker process: run the dumper, send back the result.
+    def _work(self, cls, task, conn):
+        try:
+            self.context.beginWorker(cls.__name__)
+            n = task(cls)
+            result = self.context.endWorker()
+            result['count'] = n
+            result['rusage'] = rusage()
+            conn.send(('ok', result))
+        except BaseException:
+            conn.send(('error', traceback.format_exc()))
+        finally:
+            conn.close()
+            # (the worker exits without flushing its files)
+            self.context.flushLog()
+
+    def _start(self, cls, task):
+        # connections must not be shared with the child, nor buffered log messages
+        self.context.pool.closeAll()
+        self.context.flushLog()
+        rconn, wconn = self.mp.Pipe(duplex=False)
+        proc = self.mp.Process(target=self._work, args=(cls, task, wconn), name=cls.__name__)
+        proc.start()
+        wconn.close()
+        self.log('Started %s (pid %d)' % (cls.__name__, proc.pid))
+        return rconn, proc
+
+    # Runs task(cls) for each of the dumper classes in clcs, except those in done.
+    # Dependencies not in clcs are considered already satisfied.
+    # Returns the total of the counts returned by task.
+    def run(self, clcs, task, done=(), onFinish=None, reuse=None):
+        clcs = list(clcs)
+        selected = set(clcs)
+        self.context.idRegistry.useBlocks(BlockAllocator(self.context.TYPE_KEYS.values()))
+        done = set(done)
+        pending = [c for c in clcs if c not in done]
+        running = {}    # connection -> (cls, process)
+        mustRun = set() # dumpers whose previous output can't be reused
+        total = 0
+        self.t0 = time.time()
+        try:
+            while pending or running:
+                progress = True
+                while progress:
+                    progress = False
+                    for cls in list(pending):
+                        if not all(d in done or d not in selected for d in self.dependencies[cls]):
+                            continue
+                        if reuse and cls not in mustRun:
+                            n = reuse(cls)
+                            if n is not None:
+                                pending.remove(cls)
+                                t = time.time() - self.t0
+                                self.times[cls] = (t, t)
+                                done.add(cls)
+                                total += n
+                                progress = True
+                                if onFinish:
+                                    onFinish(cls, n, None)
+                                continue
+                            mustRun.add(cls)
+                        if len(running) < self.jobs:
+                            pending.remove(cls)
+                            self.times[cls] = (time.time() - self.t0, None)
+                            conn, proc = self._start(cls, task)
+                            running[conn] = (cls, proc)
+                if not running:
+                    if pending:
+                        raise RuntimeError('Cannot schedule dumpers (circular dependencies?): %s' % \
+                            ', '.join(c.__name__ for c in pending))
+                    break
+                for conn in multiprocessing.connection.wait(list(running)):
+                    cls, proc = running.pop(conn)
+                    try:
+                        status, result = conn.recv()
+                    except EOFError:
+                        status, result = 'error', 'Worker exited without a result.'
+                    conn.close()
+                    proc.join()
+                    if status != 'ok':
+                        raise RuntimeError('%s failed (exit code %s):\n%s' % (cls.__name__, proc.exitcode, result))
+                    self.context.applyDelta(result)
+                    self.times[cls] = (self.times[cls][0], time.time() - self.t0)
+                    done.add(cls)
+                    total += result['count']
+                    self.log('Finished %s: %d items, %.1f s, peak RSS %.0f MB' % \
+                        (cls.__name__, result['count'], self.duration(cls), result['rusage']['maxrss_mb']))
+                    if onFinish:
+                        onFinish(cls, result['count'], result)
+        finally:
+            for conn, (cls, proc) in running.items():
+                proc.terminate()
+                proc.join()
+        self.logCriticalPath([c for c in clcs if c in self.times])
+        return total
+
+    def duration(self, cls):
+        start, end = self.times[cls]
+        return end - start
+
+    # Returns (path, length) of the longest chain of dependent dumpers (by run time).
+    def criticalPath(self, clcs):
+        best = {}   # cls -> (length of longest chain ending with cls, previous in chain)
+        for cls in clcs:  # clcs is in dependency order
+            prev = None
+            length = 0.0
+            for d in self.dependencies[cls]:
+                if d in best and best[d][0] > length:
+                    length, prev = best[d][0], d
+            best[cls] = (length + self.duration(cls), prev)
+        if not best:
+            return [], 0.0
+        cls = max(best, key=lambda c: best[c][0])
+        length = best[cls][0]
+        path = []
+        while cls is not None:
+            path.append(cls)
+            cls = best[cls][1]
+        path.reverse()
+        return path, length
+
+    def logCriticalPath(self, clcs):
+        path, length = self.criticalPath(clcs)
+        wall = time.time() - self.t0
+        serial = sum(self.duration(c) for c in clcs)
+        self.log('Critical path: %s' % ' -> '.join('%s (%.1f s)' % (c.__name__, self.duration(c)) for c in path))
+        self.log('Critical path length: %.1f s, wall time: %.1f s, total dumper time: %.1f s, jobs: %d' % \
+            (length, wall, serial, self.jobs))
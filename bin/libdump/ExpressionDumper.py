@@ -1,10 +1,107 @@
 from .AbstractItemDumper import *
-from collections import defaultdict 
 from .OboParser import OboParser
+from .IdRegistry import DeferredRefs
+from .OutputWriter import ENCODING
+import multiprocessing
+
+# Gel lanes and in situ results can be processed in _assay_key ranges, in parallel
+# (see ExpressionDumper.runPartitions). Number of ranges per worker process, so that
+# uneven ranges even out.
+PARTITIONS_PER_JOB = 4
+# Workers write their items to part files, with PART_ID in place of the id (assigned when
+# the parts are merged), separated by PART_SEP (which can't occur in database text).
+PART_ID = '\x01'
+PART_SEP = '\0'
+# Part files are read back this many characters at a time.
+PART_READSIZE = 1 << 20
+
+# The dumper whose ranges the worker processes run (set before they are forked).
+_partitionDumper = None
+
+def _initPartitionWorker():
+    _partitionDumper.beginPartitionWorker()
+
+def _runPartition(task):
+    return _partitionDumper.runPartition(*task)
+
+# The assays, stored column by column (see ExpressionDumper.loadAssay). Each column is a
+# list indexed by the assay's ordinal (the order in which assays were added). Values that
+# repeat across assays (references, assay types, dates) are stored once.
+class AssayTable:
+    def __init__(self):
+        # _assay_key -> ordinal
+        self.ordinal = {}
+        self.feature = []
+        self.publication = []
+        self.assayid = []
+        self.assaytype = []
+        self.annotationdate = []
+        # probe or antibody accid, or None
+        self.probe = []
+        self.values = {}
+
+    def __len__(self):
+        return len(self.ordinal)
+
+    def intern(self, v):
+        return self.values.setdefault(v, v)
+
+    # Adds an assay. Returns its ordinal.
+    def add(self, ak, feature, publication, assayid, assaytype, annotationdate):
+        i = self.ordinal[ak] = len(self.ordinal)
+        self.feature.append(self.intern(feature))
+        self.publication.append(self.intern(publication))
+        self.assayid.append(assayid)
+        self.assaytype.append(self.intern(assaytype))
+        self.annotationdate.append(self.intern(annotationdate))
+        self.probe.append(None)
+        return i
+
+    # Returns the assay with ordinal i, as a dict.
+    def get(self, i):
+        return dict((n, getattr(self, n)[i]) for n in
+            ('feature', 'publication', 'assayid', 'assaytype', 'annotationdate', 'probe'))
 
 class ExpressionDumper(AbstractItemDumper):
-    # Pre-loads assay information.
-    # The assay structure is a dict of dict.
+    TABLES = ['ACC_Accession', 'GXD_AntibodyPrep', 'GXD_Assay', 'GXD_AssayType',
+        'GXD_GelBand','GXD_GelLane', 'GXD_GelLaneStructure', 'GXD_InSituResult',
+        'GXD_InSituResultImage','GXD_ISResultCellType', 'GXD_ISResultStructure',
+        'GXD_ProbePrep','GXD_Specimen', 'IMG_Image', 'IMG_ImagePane', 'VOC_Term',
+        'VOC_Term_EMAPA']
+
+    # Tables whose rows are split by _assay_key range, for each partitioned step (see runPartitions).
+    PARTITION_TABLES = {
+        'processGelLane' : 'gxd_gellane',
+        'processInSitu'  : 'gxd_specimen',
+        }
+
+    # Template for GXDExpression items. (See writeRecord)
+    ETMPLT = '''
+                <item class="GXDExpression" id="%(id)s" >
+                  <reference name="publication" ref_id="%(publication)s" />
+                  <attribute name="assayId" value="%(assayid)s" />
+                  <attribute name="assayType" value="%(assaytype)s" />
+                  <reference name="feature" ref_id="%(feature)s" />
+                  <attribute name="sex" value="%(sex)s" />
+                  <attribute name="age" value="%(age)s" />
+                  <attribute name="strength" value="%(strength)s" />
+                  <reference name="genotype" ref_id="%(genotype)s" />
+                  <attribute name="stage" value="TS%(stage)02d" />
+                  <attribute name="emaps" value="%(emaps)s" />
+                  <reference name="structure" ref_id="%(structure)s" />
+                  %(celltype)s
+                  <attribute name="specimenNum" value="%(specimennum)i" />
+                  <attribute name="specimenLabel" value="%(specimenlabel)s" />
+                  %(probe_wv)s
+                  %(pattern_wv)s
+                  %(image_wv)s
+                  %(detected_wv)s
+                  %(note_wv)s
+                  <attribute name="annotationDate" value="%(annotationdate)s" />
+                 </item>
+                 '''
+
+    # Pre-loads assay information, into self.assays (an AssayTable).
     def loadAssay(self):
         q = self.constructQuery('''
             SELECT a._assay_key, a._marker_key, a._refs_key, acc.accid, at.assaytype, a.creation_date
@@ -20,27 +117,32 @@ class ExpressionDumper(AbstractItemDumper):
             AND NOT a._assaytype_key IN (%(INSITU_REPORTER_TG)d,%(RECOMBINASE_REPORTER)d)
             ''')
 
-        for r in self.context.sql(q):
+        assays = self.assays
+        for r in self.context.sql(q, rowtype=db.RECORD):
             ak = r['_assay_key']
-            if ak in self.assay:
-                raise RuntimeError("Duplicate assay key detected.\n%s\n%s\n" % (str(r), str(self.assay[ak])))
-            self.assay[ak] = {}
-            self.assay[ak]['feature'] = self.context.makeItemRef('Marker', r['_marker_key'])
-            self.assay[ak]['publication'] = self.context.makeItemRef('Reference', r['_refs_key'])
-            self.assay[ak]['assayid'] = r['accid']
-            self.assay[ak]['assaytype'] = r['assaytype']
-            self.assay[ak]['annotationdate'] = str(r['creation_date']).split()[0]
+            if ak in assays.ordinal:
+                raise RuntimeError("Duplicate assay key detected.\n%s\n%s\n" % (str(r), str(assays.get(assays.ordinal[ak]))))
+            assays.add(ak,
+                self.context.makeItemRef('Marker', r['_marker_key']),
+                self.context.makeItemRef('Reference', r['_refs_key']),
+                r['accid'],
+                r['assaytype'],
+                str(r['creation_date']).split()[0])
 
         return
 
 
     # Assay's can only have one probe / antibody
+    # (Assays not loaded by loadAssay are ignored.)
     def loadProbe(self, assay_key, accid):
-        if 'probe' in self.assay[assay_key]:
+        i = self.assays.ordinal.get(assay_key, None)
+        if i is None:
+            return
+        if self.assays.probe[i] is not None:
             self.context.log(("Error - Expression Dumper: AssayKey: ", assay_key, " has two probes: ", 
-                  self.assay[assay_key]['probe'], " and " , accid))
+                  self.assays.probe[i], " and " , accid))
         else:
-            self.assay[assay_key]['probe'] = accid
+            self.assays.probe[i] = accid
         return
 
 
@@ -80,56 +182,52 @@ class ExpressionDumper(AbstractItemDumper):
         return
 
 
-    # Writes the whole record based on r and the key/value pairs in assay[][]
+    # Writes the whole record based on r and its assay's columns in self.assays.
+    # The item is rendered from a new dict of just the template's fields (r is not changed).
     def writeRecord(self, r):
-        attributeList = ("probe", "pattern", "image")
-        noneTypeList = ("detected", "note")
-
-        tmplt = '''
-                <item class="GXDExpression" id="%(id)s" >
-                  <reference name="publication" ref_id="%(publication)s" />
-                  <attribute name="assayId" value="%(assayid)s" />
-                  <attribute name="assayType" value="%(assaytype)s" />
-                  <reference name="feature" ref_id="%(feature)s" />
-                  <attribute name="sex" value="%(sex)s" />
-                  <attribute name="age" value="%(age)s" />
-                  <attribute name="strength" value="%(strength)s" />
-                  <reference name="genotype" ref_id="%(genotype)s" />
-                  <attribute name="stage" value="TS%(stage)02d" />
-                  <attribute name="emaps" value="%(emaps)s" />
-                  <reference name="structure" ref_id="%(structure)s" />
-                  %(celltype)s
-                  <attribute name="specimenNum" value="%(specimennum)i" />
-                  <attribute name="specimenLabel" value="%(specimenlabel)s" />
-                  %(probe_wv)s
-                  %(pattern_wv)s
-                  %(image_wv)s
-                  %(detected_wv)s
-                  %(note_wv)s
-                  <attribute name="annotationDate" value="%(annotationdate)s" />
-                 </item>
-                 '''
-
-        if r['_assay_key'] in self.assay:
-            r['id'] = self.context.makeItemId('Expression')
-            for k, v in list(self.assay[r['_assay_key']].items()):
-                r[k] = v
-
-            for att in attributeList:
-                att_wv = att + "_wv"   # _wv: write value
-                if att in r and len(r[att]) > 0:
-                    r[att_wv] = '<attribute name="{0}" value="{1}" />'.format(att, self.quote(r[att]))
-                else:
-                    r[att_wv] = ''                        
-
-            for nt in noneTypeList:
-                nt_wv = nt + "_wv"
-                if nt in r and r[nt] is not None:
-                    r[nt_wv] = '<attribute name="{0}" value="{1}" />'.format(nt, self.quote(r[nt]))
-                else:
-                    r[nt_wv] = ''
-
-            self.writeItem(r, tmplt)
+        assays = self.assays
+        i = assays.ordinal.get(r['_assay_key'], None)
+        if i is None:
+            return
+
+        # One dict, refilled for every row (every key is reassigned; rendering doesn't keep it).
+        d = self.record
+        # (in a worker process, the id is assigned when the items are merged)
+        d['id'] = self.context.makeItemId('Expression') if self.part is None else PART_ID
+        d['feature'] = assays.feature[i]
+        d['publication'] = assays.publication[i]
+        d['assayid'] = assays.assayid[i]
+        d['assaytype'] = assays.assaytype[i]
+        d['annotationdate'] = assays.annotationdate[i]
+        d['sex'] = r['sex']
+        d['age'] = r['age']
+        d['strength'] = r['strength']
+        d['genotype'] = r['genotype']
+        d['stage'] = r['stage']
+        d['emaps'] = r['emaps']
+        d['structure'] = r['structure']
+        d['celltype'] = r['celltype']
+        d['specimennum'] = r['specimennum']
+        d['specimenlabel'] = r['specimenlabel']
+
+        # _wv: write value
+        probe = assays.probe[i]
+        d['probe_wv'] = '<attribute name="probe" value="%s" />' % self.quote(probe) if probe else ''
+        for att in ("pattern", "image"):
+            v = r.get(att)
+            d[att + "_wv"] = '<attribute name="{0}" value="{1}" />'.format(att, self.quote(v)) if v else ''
+        for nt in ("detected", "note"):
+            v = r.get(nt)
+            d[nt + "_wv"] = '<attribute name="{0}" value="{1}" />'.format(nt, self.quote(v)) if v is not None else ''
+
+        if self.part is None:
+            self.writeItem(d, self.ETMPLT)
+        else:
+            s = self.renderItem(d, self.ETMPLT)
+            if self.filter(d, s) is not False:
+                self.part.write(s)
+                self.part.write(PART_SEP)
+                self.partCount += 1
 
         return
 
@@ -168,59 +266,138 @@ class ExpressionDumper(AbstractItemDumper):
         return assay2imageFigureLabel
 
 
-    # Distill all gel bands strengths from a lane down to one value, based on Connie's rules:
-    #  2,4,5,6,7,8 ==> Present, Present trumps Not Specified, Not Specified trumps Absent, Not Specified replaces Ambiguous
-    def aggregateGelBands(self, gelbandsInLane):
-        lane2strength = {}
-        for (lane, strengths) in list(gelbandsInLane.items()):
-            agg = None
-            sawAbsent = False
-            sawNS = False
-            for strength in strengths:
-                if strength in ['present','trace','weak','moderate','strong','very strong']:
-                    agg = 'Present'
+    # Returns the bounds of n ranges of the _assay_key values in table, with about the same
+    # number of rows each: [None, k1, k2, ..., None]. (None: unbounded)
+    def partitionBounds(self, table, n):
+        fractions = ','.join('%f' % (float(i) / n) for i in range(1, n))
+        q = 'SELECT percentile_disc(ARRAY[%s]) WITHIN GROUP (ORDER BY _assay_key) AS keys FROM %s' % (fractions, table)
+        keys = self.context.sql(q)[0]['keys'] or []
+        return [None] + sorted(set(k for k in keys if k is not None)) + [None]
+
+    # Returns the conditions restricting column to the range [lo, hi) (see partitionBounds),
+    # to append to a query's WHERE clause. In a worker process, also orders the rows, so
+    # that a range's items always come out in the same order.
+    def rangeClause(self, column, lo, hi, order):
+        c = ''
+        if lo is not None:
+            c += '\n            AND %s >= %d' % (column, lo)
+        if hi is not None:
+            c += '\n            AND %s < %d' % (column, hi)
+        if self.part is not None:
+            c += '\n            ORDER BY %s' % order
+        return c
+
+    # Processes the gel lanes and in situ results (steps, methods that take an assay key range
+    # and a connection). With context.partitionJobs, the assay keys are split into ranges
+    # (see partitionBounds), which are processed in parallel by a pool of worker processes,
+    # each querying on its own connection, all in one snapshot of the database. Workers render
+    # the items (without ids) into part files in the output directory, which are merged into
+    # the output in range order, and assigned ids. The items written are the same as in a
+    # sequential run, and come out in the same order every time.
+    def runPartitions(self, steps):
+        jobs = self.context.partitionJobs
+        if jobs and not self.context.checkRefs and not self.context.idRegistry.stable:
+            # (ids the workers allocate for keys not seen before would be lost)
+            self.context.log('%s: not partitioned, as references are not checked' % self.__class__.__name__)
+            jobs = None
+        if not jobs or jobs < 2:
+            for step in steps:
+                getattr(self, step)()
+            return
+        tasks = []
+        for step in steps:
+            bounds = self.partitionBounds(self.PARTITION_TABLES[step], jobs * PARTITIONS_PER_JOB)
+            for lo, hi in zip(bounds, bounds[1:]):
+                tasks.append((len(tasks), step, lo, hi))
+        self.context.log('%s: %d ranges, %d jobs' % (self.__class__.__name__, len(tasks), jobs))
+        global _partitionDumper
+        _partitionDumper = self
+        # connections must not be shared with the workers, nor buffered log messages
+        self.context.pool.closeAll()
+        self.context.flushLog()
+        con = None
+        try:
+            with multiprocessing.get_context('fork').Pool(jobs, _initPartitionWorker) as pool:
+                # (the snapshot's transaction stays open until all the ranges are done)
+                con = db.connect()
+                snapshot = db.exportSnapshot(con)
+                for fname, count, refs in pool.imap(_runPartition, [t + (snapshot,) for t in tasks]):
+                    self.mergePartition(fname, count, refs)
+        finally:
+            _partitionDumper = None
+            if con is not None:
+                con.close()
+            for t in tasks:
+                if os.path.exists(self.partFileName(t[0])):
+                    os.remove(self.partFileName(t[0]))
+
+    def partFileName(self, i):
+        return os.path.join(self.context.dir, '.%s.part%d' % (self.getClassName(), i))
+
+    # In a worker process (see runPartitions), when it starts.
+    def beginPartitionWorker(self):
+        # don't touch the parent's connections
+        self.context.pool = db.ConnectionPool()
+        db.setPool(self.context.pool)
+
+    # In a worker process: runs step on the assay key range [lo, hi), on a connection to
+    # snapshot, writing the items to part file i. Returns the file name, the number of items,
+    # and, with deferred reference checking, the number of references checked and the
+    # dangling ones (see DeferredRefs.merge).
+    def runPartition(self, i, step, lo, hi, snapshot):
+        ctx = self.context
+        ctx.logPrefix = '[%s %d] ' % (self.getClassName(), i)
+        if ctx.deferredRefs is not None:
+            # (the parent checks the references made before the fork)
+            ctx.deferredRefs = DeferredRefs(ctx.idRegistry)
+        fname = self.partFileName(i)
+        con = db.connectToSnapshot(snapshot)
+        try:
+            self.part = open(fname, 'w', encoding=ENCODING)
+            self.partCount = 0
+            getattr(self, step)(lo, hi, con)
+            self.part.close()
+        finally:
+            self.part = None
+            con.close()
+            ctx.flushLog()
+        refs = None
+        if ctx.deferredRefs is not None:
+            dangling = ctx.deferredRefs.check()
+            refs = (ctx.deferredRefs.count, dangling)
+        return fname, self.partCount, refs
+
+    # Writes the items in a part file (see runPartition) to the output, assigning their ids,
+    # and deletes the file.
+    def mergePartition(self, fname, count, refs):
+        n = 0
+        rest = ''
+        with open(fname, 'r', encoding=ENCODING) as fd:
+            while True:
+                chunk = fd.read(PART_READSIZE)
+                if not chunk:
                     break
-                elif strength in ['not specified','ambiguous']:
-                    sawNS = True
-                elif strength == 'absent':
-                    sawAbsent = True
-            #
-            if agg is None:
-                if sawNS:
-                    agg = 'Not Specified'
-                elif sawAbsent:
-                    agg = 'Absent'
-            #
-            if agg is not None:
-                lane2strength[lane] = agg
-            else:
-                self.context.log(("ERROR: aggregateGelBands - Lane: ", lane, " has no gel bands.")) 
-
-        return lane2strength
-
-
-    # Collect all gel band strengths for each gel lane, ignoring 'Not Applicable' (-2)
-    def loadGelBandStrengthAggregate(self):
-        gelbandsInLane = defaultdict(set)
-        q = '''
-            SELECT gb._gellane_key, vt.term as strength
-            FROM gxd_gelband gb, voc_term vt
-            WHERE gb._strength_key = vt._term_key
-            AND vt.term != 'Not Applicable'
-            '''
-
-        for r in self.context.sql(q):
-            gelbandsInLane[r['_gellane_key']].add(r['strength'].lower())
-        
-        return self.aggregateGelBands(gelbandsInLane)
-
+                items = (rest + chunk).split(PART_SEP)
+                rest = items.pop()
+                for s in items:
+                    id = self.context.makeItemId('Expression')
+                    self.writeRendered(id, s.replace(PART_ID, id, 1))
+                n += len(items)
+        os.remove(fname)
+        if rest or n != count:
+            raise RuntimeError('Incomplete part file: %s (%d of %d items)' % (fname, n, count))
+        if refs is not None:
+            self.context.deferredRefs.merge(*refs)
 
     # Write a record: foreach gellane (foreach gellane.structure))
     #   _gelcontrol_key: data lane = 1, control lane > 1 
-    def processGelLane(self):
-        gl2strength = self.loadGelBandStrengthAggregate()
-        ak2figurelabel = self.loadAssayImageFigureLabels()
-
+    # The strength of a lane is computed from its gel bands' strengths (ignoring 'Not Applicable'),
+    # based on Connie's rules: 
+    #   Present, Trace, Weak, Moderate, Strong, Very strong ==> Present, Present trumps Not Specified,
+    #   Not Specified trumps Absent, Not Specified replaces Ambiguous
+    # Lanes with no such gel bands are skipped.
+    # (for the assay keys in [lo, hi), see runPartitions)
+    def processGelLane(self, lo=None, hi=None, connection=None):
         q = self.constructQuery('''
             SELECT
                 gl._gellane_key,
@@ -232,35 +409,48 @@ class ExpressionDumper(AbstractItemDumper):
                 gl.lanelabel as specimenlabel,
                 a.accid AS emapa,
                 a._object_key as _emapa_key,
-                gls._stage_key as stage
-            FROM gxd_gellane gl, gxd_gellanestructure gls, acc_accession a
+                gls._stage_key as stage,
+                gs.strength
+            FROM gxd_gellane gl
+              CROSS JOIN LATERAL (
+                SELECT CASE
+                    WHEN bool_or(lower(vt.term) IN ('present','trace','weak','moderate','strong','very strong')) THEN 'Present'
+                    WHEN bool_or(lower(vt.term) IN ('not specified','ambiguous')) THEN 'Not Specified'
+                    WHEN bool_or(lower(vt.term) = 'absent') THEN 'Absent'
+                  END AS strength
+                FROM gxd_gelband gb, voc_term vt
+                WHERE gb._gellane_key = gl._gellane_key
+                AND gb._strength_key = vt._term_key
+                AND vt.term != 'Not Applicable'
+                ) gs,
+              gxd_gellanestructure gls, acc_accession a
             WHERE gl._gellane_key = gls._gellane_key                                                            
+            AND gs.strength IS NOT NULL
             AND a._object_key = gls._emapa_term_key
             AND a._mgitype_key = 13
             AND a._logicaldb_key = 169
             AND a.preferred = 1
             AND a.private = 0
-            AND gl._gelcontrol_key = %(GELLANE_CONTROL_NO)d
-            ''')
+            AND gl._gelcontrol_key = %(GELLANE_CONTROL_NO)d''')
+        q += self.rangeClause('gl._assay_key', lo, hi,
+            'gl._assay_key, gl._gellane_key, a._object_key, gls._stage_key')
 
-        for r in self.context.sqliter(q):
-            if r['_gellane_key'] in gl2strength:
-                r['strength'] = gl2strength[r['_gellane_key']]
-                r['genotype'] = self.context.makeItemRef('Genotype', r['_genotype_key'])
-
-                isDetected = self.strengthToBoolean(r['strength'])
-                if isDetected is not None:
-                    r['detected'] = isDetected
-
-                ak = r['_assay_key']
-                if r['_assay_key'] in ak2figurelabel:
-                    r['image'] = ak2figurelabel[r['_assay_key']]
-                    
-                r['structure'] = self.context.makeItemRef('EMAPATerm', r['_emapa_key'])
-                r['emaps'] = r['emapa'].replace('EMAPA','EMAPS') + str(r['stage'])                
-                r['celltype'] = ''
-                r['specimenlabel'] = self.quote(r['specimenlabel'])
-                self.writeRecord(r)
+        for r in self.context.sqliter(q, rowtype=db.RECORD, connection=connection):
+            r['genotype'] = self.context.makeItemRef('Genotype', r['_genotype_key'])
+
+            isDetected = self.strengthToBoolean(r['strength'])
+            if isDetected is not None:
+                r['detected'] = isDetected
+
+            ak = r['_assay_key']
+            if r['_assay_key'] in self.ak2figurelabel:
+                r['image'] = self.ak2figurelabel[r['_assay_key']]
+                
+            r['structure'] = self.context.makeItemRef('EMAPATerm', r['_emapa_key'])
+            r['emaps'] = r['emapa'].replace('EMAPA','EMAPS') + str(r['stage'])                
+            r['celltype'] = ''
+            r['specimenlabel'] = self.quote(r['specimenlabel'])
+            self.writeRecord(r)
         return
 
 
@@ -279,9 +469,8 @@ class ExpressionDumper(AbstractItemDumper):
 
 
     # Write a record: specimen X insituResult X insitu.structure
-    def processInSitu(self):
-        isImageResultKeys = self.loadImageResultKeys()
-
+    # (for the assay keys in [lo, hi), see runPartitions)
+    def processInSitu(self, lo=None, hi=None, connection=None):
         q = '''
             SELECT
                 s._assay_key,
@@ -320,17 +509,18 @@ class ExpressionDumper(AbstractItemDumper):
             AND a._mgitype_key = 13
             AND a._logicaldb_key = 169
             AND a.preferred = 1
-            AND a.private = 0
-            '''
+            AND a.private = 0'''
+        q += self.rangeClause('s._assay_key', lo, hi,
+            's._assay_key, s._specimen_key, isr._result_key, irs._emapa_term_key, irs._stage_key, irc._celltype_term_key')
 
-        for r in self.context.sqliter(q):
+        for r in self.context.copyiter(q, rowtype=db.RECORD, connection=connection):
             r['genotype'] = self.context.makeItemRef('Genotype', r['_genotype_key'])
                 
             isDetected = self.strengthToBoolean(r['strength'])
             if isDetected is not None:
                 r['detected'] = isDetected
 
-            if r['_result_key'] not in isImageResultKeys:
+            if r['_result_key'] not in self.isImageResultKeys:
                 r['image'] = ''
                 
             r['structure'] = self.context.makeItemRef('EMAPATerm', r['_emapa_key'])
@@ -398,14 +588,19 @@ class ExpressionDumper(AbstractItemDumper):
     def preDump(self):
         self.writeEMAPATerms()
         self.writeCLTerms()
-        self.assay = {} # defaultdict(dict)
+        self.assays = AssayTable()
 
         self.loadAssay()
         self.loadProbePrep()
         self.loadAntibodyPrep()
 
-        self.processGelLane()
-        self.processInSitu()
+        self.ak2figurelabel = self.loadAssayImageFigureLabels()
+        self.isImageResultKeys = self.loadImageResultKeys()
+        # (filled in by writeRecord)
+        self.record = {}
+        # (set in worker processes, see runPartition)
+        self.part = None
+        self.runPartitions(['processGelLane', 'processInSitu'])
 
         return
 
@@ -3,6 +3,10 @@ from .DataSourceDumper import DataSetDumper
 from .DumperContext import DumperContext
 
 class FeatureDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'BIB_Refs', 'MGI_Note', 'MGI_Relationship',
+        'MRK_Chromosome','MRK_Location_Cache', 'MRK_Marker', 'MRK_MCV_Cache', 'MRK_Notes',
+        'MRK_Reference','MRK_Types']
+
     ITMPLT = '''
     <item class="SOTerm" id="%(id)s">
         <attribute name="identifier" value="%(soid)s" />
@@ -12,7 +16,9 @@ class FeatureDumper(AbstractItemDumper):
         md=MouseFeatureDumper(self.context)
         nd=HumanFeatureDumper(self.context)
         od=OtherSpeciesFeatureDumper(self.context)
-        self.context.soIds = set(["SO:0000340","SO:0005858"]) # need Chromosome and SyntenicRegion as well
+        # need Chromosome and SyntenicRegion as well
+        self.context.addShared('soIds', "SO:0000340")
+        self.context.addShared('soIds', "SO:0005858")
         self.writeCount += md.dump(**self.dumpArgs)
         self.writeCount += nd.dump(**self.dumpArgs)
         self.writeCount += od.dump(**self.dumpArgs)
@@ -89,7 +95,7 @@ class AbstractFeatureDumper(AbstractItemDumper):
             ''')
         for r in self.context.sql(q):
             id = self.context.makeGlobalKey('Reference',r['_refs_key'])
-            if id in self.context.idsWritten:
+            if self.context.isWritten(id):
                 self.mk2refs.setdefault(r['_marker_key'],[]).append('<reference ref_id="%s"/>'%id)
 
     def preloadEntrezIds(self):
@@ -229,7 +235,7 @@ class AbstractFeatureDumper(AbstractItemDumper):
         r['organismid'] = self.context.makeItemRef('Organism', r['_organism_key']) 
         r['chromosomeid'] = self.context.makeItemRef('Chromosome', r['_chromosome_key']) 
         if soId:
-            self.context.soIds.add(soId)
+            self.context.addShared('soIds', soId)
             r['soterm'] = '<reference name="sequenceOntologyTerm" ref_id="%s"/>' % \
                 self.context.makeGlobalKey('SOTerm',int(soId.split(":")[1]))
         else:
@@ -363,7 +369,7 @@ class OtherSpeciesFeatureDumper(AbstractFeatureDumper):
         r['ncbiGeneNumber'] = self.getNcbiGeneNumberAttribute(r)
         r['organismid'] = self.context.makeItemRef('Organism', r['_organism_key']) 
         if soId:
-            self.context.soIds.add(soId)
+            self.context.addShared('soIds', soId)
             r['soterm'] = '<reference name="sequenceOntologyTerm" ref_id="%s"/>' % \
                 self.context.makeGlobalKey('SOTerm',int(soId.split(":")[1]))
         else:
@@ -0,0 +1,238 @@
+#
+# Fingerprints.py
+#
+# Reuses the output of dumpers whose inputs have not changed since the previous run.
+#
+# Each dumper declares the MGI tables it reads (AbstractItemDumper.TABLES). A table's
+# fingerprint is its row count, its latest modification_date, and the sum of its key
+# column (the first _xxx_key column), computed in one scan.
+# Only tables with a modification_date column are trusted: MGI sets it on every insert
+# and update, and a delete changes the count and key sum. In a table without one (e.g.,
+# MGI_dbinfo), an update to a non-key column would go unseen, so its fingerprint also
+# has the MGI dump date (MGI_dbinfo.lastdump_date): it is assumed to change with every
+# MGI dump.
+# The MGI database only changes when a new dump is loaded, so table fingerprints are
+# computed once per MGI dump, and kept (in fingerprints.json) for later runs from the
+# same dump.
+# After a dumper runs, its record is saved in fingerprints.json in the output directory:
+#   - inputs: fingerprints of its tables, a hash of its code, and the dump settings
+#   - upstream: digests of the changes made to the context by the dumpers whose ids
+#     it may have used
+#   - delta: digest of the changes the dumper made to the context (ids allocated and
+#     written, shared state); the changes themselves are saved in .<Dumper>.delta
+#   - files: the manifest entries of its output files
+#   - count: the number of items it reported
+#
+# In a later run (with the same output directory), a dumper is not run if its inputs and
+# upstream are the same as recorded, and its output files are still there. Instead, its
+# saved changes are applied to the context, as if it had run, and its files are kept.
+#
+# Upstream: with stable ids, a dumper's output depends only on the dumpers it depends
+# on (transitively). Otherwise, ids are allocated from counters shared by all dumpers,
+# so it depends on all the dumpers that ran before it.
+#
+# A dumper that declares no tables always runs. A dumper interrupted by a failure
+# (see DumperContext.saveCheckpoint) has no record, and also runs.
+#
+
+import os
+import sys
+import json
+import pickle
+import hashlib
+import inspect
+
+FINGERPRINTS_NAME = 'fingerprints.json'
+# Key, in fingerprints.json, of the table fingerprints (rather than a dumper's record):
+# {'lastdump': MGI dump date, 'tables': table name -> fingerprint}
+TABLES_KEY = '.tables'
+
+class Fingerprints:
+    # finished: names of dumpers already finished in this run (when resuming from a checkpoint).
+    def __init__(self, context, dependencies, clcs, finished=()):
+        self.context = context
+        self.dependencies = dependencies
+        # dumper classes in this run, in run order
+        self.clcs = list(clcs)
+        self.fname = os.path.join(context.dir, FINGERPRINTS_NAME)
+        # dumper name -> record, from the previous run(s)
+        self.records = {}
+        if os.path.exists(self.fname):
+            with open(self.fname) as fd:
+                self.records = json.load(fd)
+        # table name -> fingerprint (computed at most once per MGI dump)
+        self.lastdump = context.mgi_dbinfo['lastdump_date_f']
+        cached = self.records.pop(TABLES_KEY, None)
+        if cached and cached['lastdump'] == self.lastdump:
+            self.tables = cached['tables']
+        else:
+            self.tables = {}
+        # dumper name -> delta digest, for dumpers finished in this run
+        self.digests = {}
+        for n in finished:
+            if n in self.records:
+                self.digests[n] = self.records[n]['delta']
+
+    # Returns the fingerprint of an MGI table.
+    def tableFingerprint(self, table):
+        fp = self.tables.get(table, None)
+        if fp is not None:
+            return fp
+        q = '''
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = '%s'
+            ORDER BY ordinal_position
+            ''' % table.lower()
+        columns = [r['column_name'] for r in self.context.sql(q)]
+        if not columns:
+            raise RuntimeError('Fingerprints: no such table: %s' % table)
+        selects = ['count(*) AS nrows']
+        if 'modification_date' in columns:
+            selects.append('max(modification_date)::text AS modified')
+        keys = [c for c in columns if c.startswith('_') and c.endswith('_key')]
+        if keys:
+            selects.append('sum(%s::bigint)::text AS keysum' % keys[0])
+        q = 'SELECT %s FROM %s' % (', '.join(selects), table)
+        fp = dict(self.context.sql(q)[0])
+        if 'modified' not in fp:
+            self.context.log('Fingerprints: %s has no modification_date; assumed to change with every MGI dump' % table)
+            fp['lastdump'] = self.lastdump
+        self.tables[table] = fp
+        return fp
+
+    # Returns a hash of the source code of a dumper class: the libdump modules of the class
+    # and its base classes, and every libdump module they use, directly or not (e.g.,
+    # DumperContext, with its query parameters, ItemTemplate, NoteUtils, DataSourceDumper
+    # for DataSetDumper).
+    def codeHash(self, cls):
+        names = set(c.__module__ for c in cls.__mro__ if c.__module__.startswith('libdump.'))
+        todo = list(names)
+        while todo:
+            for x in vars(sys.modules[todo.pop()]).values():
+                n = x.__name__ if inspect.ismodule(x) else getattr(x, '__module__', None)
+                if isinstance(n, str) and n.startswith('libdump.') and n not in names:
+                    names.add(n)
+                    todo.append(n)
+        h = hashlib.sha1()
+        for n in sorted(names):
+            with open(inspect.getsourcefile(sys.modules[n]), 'rb') as fd:
+                h.update(fd.read())
+        return h.hexdigest()
+
+    def inputs(self, cls):
+        config = self.context.checkpointConfig([])
+        del config['dumpers']
+        del config['lastdump']
+        return {
+            'tables' : dict((t, self.tableFingerprint(t)) for t in sorted(set(cls.TABLES))),
+            'code'   : self.codeHash(cls),
+            'config' : config,
+            }
+
+    # Returns the dumpers in this run whose changes cls may depend on (see above).
+    def upstreamDumpers(self, cls):
+        if self.context.idRegistry.stable:
+            ups = []
+            def _add(c):
+                for d in self.dependencies[c]:
+                    if d not in ups:
+                        ups.append(d)
+                        _add(d)
+            _add(cls)
+            return [c for c in self.clcs if c in ups]
+        return self.clcs[:self.clcs.index(cls)]
+
+    # Returns dict dumper name -> delta digest for the upstream dumpers of cls,
+    # or None if any of them has not finished yet.
+    def upstream(self, cls):
+        ups = {}
+        for c in self.upstreamDumpers(cls):
+            d = self.digests.get(c.__name__, None)
+            if d is None:
+                return None
+            ups[c.__name__] = d
+        return ups
+
+    def deltaFile(self, cls):
+        return os.path.join(self.context.dir, '.%s.delta' % cls.__name__)
+
+    # Returns a digest of the changes in delta (see DumperContext.takeDelta).
+    def digest(self, delta):
+        h = hashlib.sha1()
+        for n, (puts, w, nextId) in sorted(delta['ids'].items()):
+            h.update(repr((n, puts, nextId)).encode())
+            if w:
+                for k, b in sorted(w.items()):
+                    h.update(repr(k).encode())
+                    h.update(b)
+        for op in delta['state']:
+            h.update(repr(op).encode())
+        return h.hexdigest()
+
+    # Returns True iff the output of cls from the previous run can be reused.
+    # If not, forgets the previous run's record (the dumper will overwrite its output).
+    def canReuse(self, cls):
+        if self._canReuse(cls):
+            return True
+        if self.records.pop(cls.__name__, None) is not None:
+            self.save()
+        return False
+
+    def _canReuse(self, cls):
+        if not cls.TABLES:
+            return False
+        # fingerprint the inputs before the dumper (possibly) runs
+        inputs = self.inputs(cls)
+        rec = self.records.get(cls.__name__, None)
+        if rec is None:
+            return False
+        if not os.path.exists(self.deltaFile(cls)):
+            return False
+        for f, m in rec['files'].items():
+            for sh in m['shards']:
+                fname = os.path.join(self.context.dir, sh['name'])
+                if not os.path.exists(fname) or os.path.getsize(fname) != sh['bytes']:
+                    return False
+        ups = self.upstream(cls)
+        if ups is None or ups != rec['upstream']:
+            return False
+        return inputs == rec['inputs']
+
+    # Reuses the previous output of cls: applies its saved changes to the context.
+    # Returns the number of items it reported.
+    def reuse(self, cls):
+        rec = self.records[cls.__name__]
+        with open(self.deltaFile(cls), 'rb') as fd:
+            delta = pickle.load(fd)
+        self.context.applyDelta(delta)
+        self.digests[cls.__name__] = rec['delta']
+        n = rec['count']
+        self.context.log('Inputs unchanged: reusing output of %s (%d items): %s' % \
+            (cls.__name__, n, ', '.join(sorted(rec['files']))))
+        return n
+
+    # Records a dumper that has just run and reported n items. Delta is from DumperContext.takeDelta.
+    def record(self, cls, n, delta):
+        digest = self.digest(delta)
+        self.digests[cls.__name__] = digest
+        if cls.TABLES:
+            fname = self.deltaFile(cls)
+            with open(fname + '.tmp', 'wb') as fd:
+                pickle.dump(delta, fd, pickle.HIGHEST_PROTOCOL)
+            os.replace(fname + '.tmp', fname)
+        self.records[cls.__name__] = {
+            'inputs'   : self.inputs(cls) if cls.TABLES else None,
+            'upstream' : self.upstream(cls),
+            'delta'    : digest,
+            'files'    : delta['manifest'],
+            'count'    : n,
+            }
+        self.save()
+
+    def save(self):
+        records = dict(self.records)
+        records[TABLES_KEY] = {'lastdump': self.lastdump, 'tables': self.tables}
+        with open(self.fname + '.tmp', 'w') as fd:
+            json.dump(records, fd, indent=2, sort_keys=True)
+        os.replace(self.fname + '.tmp', self.fname)
@@ -1,6 +1,9 @@
 from .AbstractItemDumper import *
 
 class GenotypeDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'ALL_Allele', 'GXD_AlleleGenotype', 'GXD_AllelePair',
+        'GXD_Genotype','MRK_Marker', 'PRB_Strain', 'VOC_Term']
+
     QTMPLT= '''
     SELECT g._genotype_key, g._strain_key, s.strain, g.isconditional, g.note, t.term, a.accid
     FROM GXD_Genotype g, VOC_Term t, PRB_Strain s, ACC_Accession a
@@ -18,6 +18,10 @@ from collections import defaultdict
 from .OboParser import OboParser
 
 class HTIndexDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'BIB_Refs', 'GXD_Genotype', 'GXD_HTExperiment',
+        'GXD_HTExperimentVariable','GXD_HTSample', 'GXD_TheilerStage', 'MGI_Note',
+        'MGI_Organism','MGI_Property', 'VOC_Term']
+
     QTMPLT = '''
         SELECT
             e._experiment_key,
@@ -359,7 +363,7 @@ class HTSampleDumper (AbstractItemDumper) :
         r['notes'] = self.sk2notes.get(r['_sample_key'], '')
         r['experiment'] = self.context.makeItemRef('HTExperiment', ek)
         try:
-            r['organism'] = self.context.makeItemRef('Organism', r['_organism_key'])
+            r['organism'] = self.context.makeItemRef('Organism', r['_organism_key'], defer=False)
         except:
             r['organism'] = ''
         #
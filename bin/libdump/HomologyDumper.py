@@ -15,6 +15,8 @@ from .DataSourceDumper import DataSetDumper
 
 class HomologyDumper(AbstractItemDumper):
 
+    TABLES = ['MRK_Cluster', 'MRK_ClusterMember', 'MRK_Marker']
+
     DATASETNAME = "Mouse/Human Orthologies from MGI"
 
     QTMPLT = '''
@@ -0,0 +1,517 @@
+#
+# IdRegistry.py
+#
+# Compact storage for the item ids allocated by DumperContext.
+#
+# For every item type (integer type key "n"), the registry keeps:
+#   - the next sequence number ("m") to allocate
+#   - the mapping from local (MGI) keys to allocated sequence numbers
+#   - the set of sequence numbers that have actually been written out
+#
+# A full dump allocates tens of millions of ids, so these structures are kept
+# out of Python dicts/sets as much as possible. Key mappings live in a pair of
+# parallel, sorted integer arrays (keys, seqs); keys that arrive out of order
+# are staged in a small dict and periodically merged into the arrays. The
+# "written" state is a bitmap indexed by sequence number.
+#
+# For parallel dumps (see DumperScheduler), worker processes draw sequence numbers
+# in blocks from counters shared between processes (BlockAllocator), so that
+# concurrent workers never allocate the same id. Each worker keeps a journal of the
+# key mappings it adds; the parent applies the journals (and the workers' written
+# bitmaps) to its own registry.
+#
+# With stable=True, ids do not depend on the order in which items are dumped
+# (KeyedTypeIdRegistry):
+#   - an item with an integer MGI key k gets id "n_k". The same MGI object gets the
+#     same id in every run, and no key mapping needs to be stored.
+#   - items without a key are numbered from a block reserved for the dumper that
+#     creates them (see setBlock): block b of every type starts at
+#     KEYLESS_BASE + b * BLOCK_SPAN, above any MGI key.
+#     These ids are NOT stable: within its block, an item is numbered in the order it is
+#     dumped, so one item added or removed (e.g., an assay result) shifts the ids of all
+#     the items after it. Only the ids of keyed items are the same from run to run.
+# Dumpers can then allocate ids independently of each other (in any order, or in
+# separate processes) without coordination.
+#
+# With deferred reference checking (see DumperContext.makeGlobalKey), references are not
+# checked as they are made. Instead, DeferredRefs records the sequence numbers referenced,
+# per type, in integer arrays, and checks them in bulk against the written bitmaps.
+#
+
+import sys
+import heapq
+import collections
+import multiprocessing
+from array import array
+from bisect import bisect_left
+
+# Staged (out of order) keys are merged into the sorted arrays once there are a quarter
+# as many as in the arrays, but at least MIN_MERGE and at most MAX_PENDING: the staging
+# dict holds boxed ints, so it must stay small however many keys the arrays hold.
+MIN_MERGE = 65536
+MAX_PENDING = 1 << 18
+# Number of sequence numbers handed out at a time by a BlockAllocator.
+BLOCK_SIZE = 10000
+# Stable ids: sequence numbers for items without a key start here...
+KEYLESS_BASE = 1 << 32
+# ...with this many reserved for each dumper (block).
+BLOCK_SPAN = 1 << 28
+# Sequence numbers must stay below this (see ItemDelta.ID_SHIFT), so there are
+# MAX_BLOCKS blocks: the first DUMPER_BLOCKS for the dumpers (their positions in
+# the list of all dumpers), the rest for parts of a dumper's output that are
+# dumped separately (e.g., RelationshipDumper's categories).
+SEQ_LIMIT = 1 << 36
+MAX_BLOCKS = (SEQ_LIMIT - KEYLESS_BASE) // BLOCK_SPAN
+DUMPER_BLOCKS = 64
+# Deferred references: once this many references to a type have been recorded, they are
+# checked (and the array emptied) at the next compact(), which bounds the memory used.
+DEFER_BATCH = 1 << 22
+
+# A set of non-negative integers, stored as a bitmap in fixed size chunks.
+# Only chunks containing members are allocated, so sparse sets are cheap.
+class Bitmap:
+    CHUNK_BITS = 16     # 2^16 bits (8KB) per chunk
+    CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+    def __init__(self):
+        # chunk index -> bytearray
+        self.chunks = {}
+
+    def add(self, m):
+        c = self.chunks.get(m >> self.CHUNK_BITS, None)
+        if c is None:
+            c = self.chunks[m >> self.CHUNK_BITS] = bytearray(1 << (self.CHUNK_BITS - 3))
+        i = m & self.CHUNK_MASK
+        c[i >> 3] |= 1 << (i & 7)
+
+    def discard(self, m):
+        c = self.chunks.get(m >> self.CHUNK_BITS, None)
+        if c is not None:
+            i = m & self.CHUNK_MASK
+            c[i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def __contains__(self, m):
+        c = self.chunks.get(m >> self.CHUNK_BITS, None)
+        if c is None:
+            return False
+        i = m & self.CHUNK_MASK
+        return bool(c[i >> 3] & (1 << (i & 7)))
+
+    def __len__(self):
+        return sum(bin(int.from_bytes(c, 'little')).count('1') for c in self.chunks.values())
+
+    # Returns a copy of the chunks, as a dict of bytes.
+    def snapshot(self):
+        return dict((k, bytes(c)) for k, c in self.chunks.items())
+
+    # Adds all members of a snapshot.
+    def update(self, snap):
+        for k, b in snap.items():
+            c = self.chunks.get(k, None)
+            if c is None:
+                self.chunks[k] = bytearray(b)
+            else:
+                x = int.from_bytes(c, 'little') | int.from_bytes(b, 'little')
+                self.chunks[k] = bytearray(x.to_bytes(len(c), 'little'))
+
+    def bytesUsed(self):
+        return sys.getsizeof(self.chunks) + sum(sys.getsizeof(c) for c in self.chunks.values())
+
+# Stands in for a BlockAllocator with stable ids, where a dumper's block cannot be extended.
+class NoMoreBlocks:
+    def __init__(self, block):
+        self.block = block
+
+    def allocate(self, n):
+        if self.block is None:
+            raise RuntimeError('Stable ids: no id block selected for type %s' % n)
+        raise RuntimeError('Stable ids: block %d of type %s is full' % (self.block, n))
+
+class TypeIdRegistry:
+    def __init__(self, typeKey):
+        self.typeKey = typeKey
+        self.nextId = 1
+        # end (exclusive) of the current block of sequence numbers, and the
+        # BlockAllocator to get the next block from. Unlimited by default.
+        self.limit = sys.maxsize
+        self.blocks = None
+        # if not None, list of (localKey, m) mappings added since startJournal()
+        self.journal = None
+        self.baseWritten = None
+        # sorted local keys and their (parallel) sequence numbers
+        self.keys = array('q')
+        self.seqs = array('l')
+        # local keys not yet merged into the arrays: key -> seq
+        self.pending = {}
+        # local keys that are not ints (rare). key -> seq
+        self.other = {}
+        # written sequence numbers
+        self.written = Bitmap()
+
+    def __len__(self):
+        return len(self.keys) + len(self.pending) + len(self.other)
+
+    # Returns the next sequence number, and advances the counter.
+    def allocate(self):
+        m = self.nextId
+        if m >= self.limit:
+            m, self.limit = self.blocks.allocate(self.typeKey)
+        self.nextId = m + 1
+        return m
+
+    # Returns the sequence number for a new item with the given local key.
+    def allocateFor(self, localKey):
+        return self.allocate()
+
+    # Selects the block that keyless ids come from (stable ids only).
+    def setBlock(self, block):
+        pass
+
+    # Returns the sequence number mapped to localKey, or None.
+    def get(self, localKey):
+        if type(localKey) is not int:
+            return self.other.get(localKey, None)
+        m = self.pending.get(localKey, None)
+        if m is None:
+            keys = self.keys
+            i = bisect_left(keys, localKey)
+            if i < len(keys) and keys[i] == localKey:
+                m = self.seqs[i]
+        return m
+
+    # Returns the sequence number for a reference to localKey, or None if it has none.
+    # (The caller checks that it was written.)
+    ref = get
+
+    # Records the mapping localKey -> m. Assumes localKey is not already mapped.
+    def put(self, localKey, m):
+        if self.journal is not None:
+            self.journal.append((localKey, m))
+        if type(localKey) is not int:
+            self.other[localKey] = m
+        elif not self.pending and (not self.keys or localKey > self.keys[-1]):
+            # common case: keys arrive in increasing order. Append directly.
+            self.keys.append(localKey)
+            self.seqs.append(m)
+        else:
+            self.pending[localKey] = m
+            if len(self.pending) >= min(MAX_PENDING, max(MIN_MERGE, len(self.keys) // 4)):
+                self.merge()
+
+    # Merges the staged keys into the sorted arrays.
+    def merge(self):
+        if not self.pending:
+            return
+        staged = sorted(self.pending.items())
+        keys = array('q')
+        seqs = array('l')
+        for k, m in heapq.merge(zip(self.keys, self.seqs), staged):
+            keys.append(k)
+            seqs.append(m)
+        self.keys = keys
+        self.seqs = seqs
+        self.pending = {}
+
+    def markWritten(self, m):
+        self.written.add(m)
+
+    def isWritten(self, m):
+        return m in self.written
+
+    def unmarkWritten(self, m):
+        self.written.discard(m)
+
+    def startJournal(self):
+        self.journal = []
+        self.baseWritten = self.written.snapshot()
+
+    # Returns (mappings added, written snapshot or None if unchanged, nextId) since startJournal().
+    def takeJournal(self):
+        w = self.written.snapshot()
+        delta = (self.journal, None if w == self.baseWritten else w, self.nextId)
+        self.startJournal()
+        return delta
+
+    # For pickling (checkpoints): a BlockAllocator only works in the processes that share it.
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if isinstance(self.blocks, BlockAllocator):
+            state['blocks'] = None
+            state['limit'] = sys.maxsize
+        state['journal'] = state['baseWritten'] = None
+        return state
+
+    # Approximate number of bytes used by this type's structures.
+    def bytesUsed(self):
+        return sys.getsizeof(self.keys) + sys.getsizeof(self.seqs) \
+            + sys.getsizeof(self.pending) + sys.getsizeof(self.other) \
+            + self.written.bytesUsed()
+
+# Stable ids (see above). Integer keys map to themselves, so only the set of
+# allocated keys is stored; other keys are mapped as usual.
+class KeyedTypeIdRegistry(TypeIdRegistry):
+    def __init__(self, typeKey):
+        TypeIdRegistry.__init__(self, typeKey)
+        self.allocated = Bitmap()
+        # block -> next sequence number in that block
+        self.blockNext = {}
+        self.block = None
+        self.nextId = self.limit = 0
+        self.blocks = NoMoreBlocks(None)
+
+    def __len__(self):
+        return len(self.allocated) + len(self.other)
+
+    def allocateFor(self, localKey):
+        if type(localKey) is int and 0 < localKey < KEYLESS_BASE:
+            return localKey
+        return self.allocate()
+
+    def setBlock(self, block):
+        if self.block is not None:
+            self.blockNext[self.block] = self.nextId
+        base = KEYLESS_BASE + block * BLOCK_SPAN
+        self.block = block
+        self.nextId = self.blockNext.get(block, base)
+        self.limit = base + BLOCK_SPAN
+        self.blocks = NoMoreBlocks(block)
+
+    def get(self, localKey):
+        if type(localKey) is int and localKey in self.allocated:
+            return localKey
+        return self.other.get(localKey, None)
+
+    # (An integer key is its own sequence number, so a reference needs no lookup. If the
+    # key was never allocated, it wasn't written either.)
+    def ref(self, localKey):
+        if type(localKey) is int and 0 < localKey < KEYLESS_BASE:
+            return localKey
+        return self.other.get(localKey, None)
+
+    def put(self, localKey, m):
+        if self.journal is not None:
+            self.journal.append((localKey, m))
+        if localKey == m:
+            self.allocated.add(m)
+        else:
+            self.other[localKey] = m
+
+    def merge(self):
+        pass
+
+    def bytesUsed(self):
+        return sys.getsizeof(self.other) + self.allocated.bytesUsed() + self.written.bytesUsed()
+
+class IdRegistry:
+    def __init__(self, stable=False):
+        # type key -> TypeIdRegistry
+        self.types = {}
+        self.stable = stable
+        self.block = None
+        self.blocks = None
+        self.journaling = False
+
+    def getType(self, n):
+        t = self.types.get(n, None)
+        if t is None:
+            if self.stable:
+                t = self.types[n] = KeyedTypeIdRegistry(n)
+                if self.block is not None:
+                    t.setBlock(self.block)
+            else:
+                t = self.types[n] = TypeIdRegistry(n)
+                if self.blocks:
+                    t.blocks = self.blocks
+                    t.limit = 0
+            if self.journaling:
+                t.startJournal()
+        return t
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['blocks'] = None
+        state['journaling'] = False
+        return state
+
+    # From now on, allocate sequence numbers in blocks from allocator (a BlockAllocator).
+    # (Not needed for stable ids, which never collide.)
+    def useBlocks(self, allocator):
+        if self.stable:
+            return
+        self.blocks = allocator
+        for n, t in self.types.items():
+            allocator.reserve(n, t.nextId)
+            t.blocks = allocator
+            t.limit = 0
+
+    # Undoes useBlocks: back to allocating sequence numbers one at a time, after
+    # all those handed out in blocks.
+    def stopBlocks(self):
+        allocator = self.blocks
+        if allocator is None:
+            return
+        self.blocks = None
+        for n, t in self.types.items():
+            t.nextId = max(t.nextId, allocator.next(n))
+            t.blocks = None
+            t.limit = sys.maxsize
+
+    # Stable ids: from now on, keyless ids come from the given block (a small integer
+    # identifying the dumper). No effect otherwise.
+    def setBlock(self, block):
+        if not self.stable:
+            return
+        if not 0 <= block < MAX_BLOCKS:
+            raise RuntimeError('IdRegistry: id block out of range: %s' % block)
+        self.block = block
+        for t in self.types.values():
+            t.setBlock(block)
+
+    # Marks an id string of the form "n_m" as written.
+    def markWritten(self, id):
+        n, m = id.split('_', 1)
+        self.getType(int(n)).markWritten(int(m))
+
+    # Marks an id string "n_m" as not written (e.g., the item was dropped from the output).
+    def unmarkWritten(self, id):
+        n, m = id.split('_', 1)
+        t = self.types.get(int(n), None)
+        if t is not None:
+            t.unmarkWritten(int(m))
+
+    # Returns True iff the id string "n_m" has been written.
+    def isWritten(self, id):
+        n, m = id.split('_', 1)
+        t = self.types.get(int(n), None)
+        return t is not None and t.isWritten(int(m))
+
+    def __contains__(self, id):
+        return self.isWritten(id)
+
+    # Starts recording changes, for takeJournal().
+    def startJournal(self):
+        self.journaling = True
+        for t in self.types.values():
+            t.startJournal()
+
+    # Returns the changes since startJournal (or the last takeJournal), as a dict
+    # type key -> (mappings added, written snapshot or None, nextId). Types without
+    # changes are omitted.
+    def takeJournal(self):
+        delta = {}
+        for n, t in self.types.items():
+            puts, w, nextId = t.takeJournal()
+            if puts or w is not None:
+                delta[n] = (puts, w, nextId)
+        return delta
+
+    # Applies changes from another registry's takeJournal().
+    def applyJournal(self, delta):
+        for n, (puts, w, nextId) in delta.items():
+            t = self.getType(n)
+            for k, m in puts:
+                if t.get(k) is None:
+                    t.put(k, m)
+            if w is not None:
+                t.written.update(w)
+            if not self.stable:
+                t.nextId = max(t.nextId, nextId)
+                if self.blocks:
+                    # (ids from a reused delta: keep workers from allocating them again)
+                    self.blocks.reserve(n, t.nextId)
+
+    # Returns a list of (type key, number of mapped keys, number of ids written, bytes used), one per type.
+    def report(self):
+        rpt = []
+        for n in sorted(self.types):
+            t = self.types[n]
+            rpt.append((n, len(t), len(t.written), t.bytesUsed()))
+        return rpt
+
+# References recorded for deferred checking: per type, the sequence numbers referenced.
+# To record a reference to sequence number m of type n: refs[n].append(m). References are
+# checked in bulk (see check) against the written bitmaps of registry.
+class DeferredRefs:
+    def __init__(self, registry, batch=DEFER_BATCH):
+        self.registry = registry
+        self.batch = batch
+        # type key -> array of sequence numbers referenced, not yet checked
+        self.refs = collections.defaultdict(lambda: array('q'))
+        # type key -> set of sequence numbers referenced but not written
+        self.dangling = {}
+        self.count = 0
+        # item id -> ids of the items written only for it (see DumperContext.ownItems)
+        self.owned = {}
+
+    # Checks the distinct sequence numbers in a against type n's written bitmap.
+    def _check(self, n, a):
+        self.count += len(a)
+        t = self.registry.types.get(n, None)
+        written = t.written if t is not None else Bitmap()
+        missing = [m for m in set(a) if m not in written]
+        if missing:
+            self.dangling.setdefault(n, set()).update(missing)
+
+    # Checks the references to types with at least batch of them recorded, to bound the
+    # memory used. (Called every so often, see AbstractItemDumper.writeItem.)
+    def compact(self):
+        for n, a in list(self.refs.items()):
+            if len(a) >= self.batch:
+                self._check(n, a)
+                del self.refs[n]
+
+    # Checks all references recorded. Returns the dangling ones, as a dict
+    # type key -> set of sequence numbers.
+    def check(self):
+        for n, a in self.refs.items():
+            self._check(n, a)
+        self.refs.clear()
+        return self.dangling
+
+    # Records that the items with ids children were written only for the item with id parent.
+    def own(self, parent, children):
+        self.owned.setdefault(parent, []).extend(children)
+
+    # Adds the results of another DeferredRefs's check (e.g., in a worker process): the
+    # number of references it checked, and the dangling ones.
+    def merge(self, count, dangling):
+        self.count += count
+        for n, ms in dangling.items():
+            self.dangling.setdefault(n, set()).update(ms)
+
+# Hands out blocks of sequence numbers, per type, from counters in shared memory.
+# Must be created before forking the processes that share it.
+class BlockAllocator:
+    def __init__(self, typeKeys, blockSize=BLOCK_SIZE):
+        ctx = multiprocessing.get_context('fork')
+        # type key -> index of its counter
+        self.slots = dict((n, i) for i, n in enumerate(sorted(set(typeKeys))))
+        self.counters = ctx.RawArray('q', [1] * len(self.slots))
+        self.lock = ctx.Lock()
+        self.blockSize = blockSize
+
+    def _slot(self, n):
+        i = self.slots.get(n, None)
+        if i is None:
+            raise RuntimeError('No id block counter for type %s' % n)
+        return i
+
+    # Makes sure that sequence numbers below m are never handed out for type n.
+    def reserve(self, n, m):
+        i = self._slot(n)
+        with self.lock:
+            self.counters[i] = max(self.counters[i], m)
+
+    # Returns the first sequence number of type n not yet handed out.
+    def next(self, n):
+        i = self._slot(n)
+        with self.lock:
+            return self.counters[i]
+
+    # Returns (start, end) of a new block of sequence numbers for type n.
+    def allocate(self, n):
+        i = self._slot(n)
+        with self.lock:
+            m = self.counters[i]
+            self.counters[i] = m + self.blockSize
+        return m, m + self.blockSize
@@ -0,0 +1,218 @@
+#
+# ItemDelta.py
+#
+# Item-level differences between this run and the previous one.
+#
+# For each output file, a hash of every item written to it (keyed by item id) is kept in
+# the output directory, under .itemhashes. Each item written in this run is compared with
+# the previous run's hash for its id:
+#   - added: no item with that id in the previous run
+#   - changed: the item's content (its ItemXML) differs
+#   - deleted: an item of the previous run that was not written in this run
+# The added and changed items are written to delta/<File> (e.g., delta/Allele.xml), a
+# complete ItemXML document, and the ids of the deleted items to delta/<File>.deleted,
+# one per line. delta/summary.json has the counts for each file and in total, and the MGI
+# dump dates (MGI_dbinfo.lastdump_date) of the previous and current runs.
+#
+# Item ids must be the same from run to run, so this requires stable ids (see IdRegistry).
+# Only keyed items have stable ids: when items without a key (e.g., Expression results) are
+# added or removed, the items of the same type dumped after them show as changed (or as
+# added or deleted, at the end of the block).
+# Each output file is written by a single dumper, so the per-file counts are also per-dumper.
+# The previous run's hashes are replaced only at the end of a run (see finish), so a failed
+# (and resumed) run still compares against the last complete run. A file with no previous
+# hashes (e.g., in the first run) gets no delta files: it must be loaded in full.
+# A file whose dumper's output was reused (see Fingerprints) is unchanged.
+#
+# Usage:
+#       d = ItemDelta(dir, lastdump, compression)
+#       f = d.openFile('Allele.xml')
+#       f.write(id, s)
+#       ...
+#       f.close()
+#       d.finish(['Allele.xml', ...])
+#
+
+import os
+import json
+import shutil
+import hashlib
+from array import array
+from bisect import bisect_left
+from .OutputWriter import ItemFile, DEFAULT_BUFSIZE
+
+HASHES_DIR = '.itemhashes'
+DELTA_DIR = 'delta'
+SUMMARY_NAME = 'summary.json'
+# Item ids "n_m" are packed into one integer: n << ID_SHIFT | m
+ID_SHIFT = 36
+ID_MASK = (1 << ID_SHIFT) - 1
+
+def packId(id):
+    n, m = id.split('_')
+    m = int(m)
+    if m > ID_MASK:
+        raise RuntimeError('ItemDelta: item id out of range: %s' % id)
+    return (int(n) << ID_SHIFT) | m
+
+def unpackId(k):
+    return '%d_%d' % (k >> ID_SHIFT, k & ID_MASK)
+
+def itemHash(s):
+    return int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+# Reads a hashes file. Returns (ids, hashes): arrays of packed ids (sorted) and item hashes.
+def readHashes(fname):
+    with open(fname, 'rb') as fd:
+        n = array('q')
+        n.fromfile(fd, 1)
+        ids = array('q')
+        ids.fromfile(fd, n[0])
+        hashes = array('q')
+        hashes.fromfile(fd, n[0])
+    return ids, hashes
+
+def writeHashes(fname, ids, hashes):
+    with open(fname + '.tmp', 'wb') as fd:
+        array('q', [len(ids)]).tofile(fd)
+        ids.tofile(fd)
+        hashes.tofile(fd)
+    os.replace(fname + '.tmp', fname)
+
+class ItemDelta:
+    # resume: keep the delta files of this (failed) run, from dumpers that have finished.
+    def __init__(self, dir, lastdump, compression=None, bufsize=DEFAULT_BUFSIZE, resume=False):
+        self.dir = dir
+        self.hdir = os.path.join(dir, HASHES_DIR)
+        self.ddir = os.path.join(dir, DELTA_DIR)
+        self.lastdump = lastdump
+        self.compression = compression
+        self.bufsize = bufsize
+        for d in (self.hdir, self.ddir):
+            if not os.path.exists(d):
+                os.makedirs(d)
+        if not resume:
+            # left over from an earlier run
+            for f in os.listdir(self.ddir):
+                os.remove(os.path.join(self.ddir, f))
+            for f in os.listdir(self.hdir):
+                if f.endswith('.new') or f.endswith('.new.json'):
+                    os.remove(os.path.join(self.hdir, f))
+        self.meta = {}
+        mname = os.path.join(self.hdir, 'meta.json')
+        if os.path.exists(mname):
+            with open(mname) as fd:
+                self.meta = json.load(fd)
+
+    def hashesFile(self, name):
+        return os.path.join(self.hdir, name + '.hashes')
+
+    def openFile(self, name):
+        return FileDelta(self, name)
+
+    # Called at the end of the run. Writes the summary for the given output files (basenames),
+    # and makes this run's hashes the base for the next run.
+    def finish(self, names):
+        files = {}
+        for name in sorted(names):
+            sname = self.hashesFile(name) + '.new.json'
+            if os.path.exists(sname):
+                with open(sname) as fd:
+                    files[name] = json.load(fd)
+            elif os.path.exists(self.hashesFile(name)):
+                # not written in this run (output reused): unchanged
+                ids, hashes = readHashes(self.hashesFile(name))
+                files[name] = {'base': True, 'items': len(ids), 'added': 0, 'changed': 0, 'deleted': 0, 'unchanged': len(ids)}
+        total = dict((k, sum(f[k] for f in files.values())) for k in ('items', 'added', 'changed', 'deleted', 'unchanged'))
+        summary = {
+            'previous' : self.meta.get('lastdump', None),
+            'current'  : self.lastdump,
+            'files'    : files,
+            'total'    : total,
+            }
+        with open(os.path.join(self.ddir, SUMMARY_NAME), 'w') as fd:
+            json.dump(summary, fd, indent=2, sort_keys=True)
+        for name in files:
+            hname = self.hashesFile(name)
+            if os.path.exists(hname + '.new'):
+                os.replace(hname + '.new', hname)
+                os.remove(hname + '.new.json')
+        self.meta['lastdump'] = self.lastdump
+        with open(os.path.join(self.hdir, 'meta.json'), 'w') as fd:
+            json.dump(self.meta, fd, indent=2, sort_keys=True)
+        return summary
+
+# Compares the items written to one output file with the previous run.
+class FileDelta:
+    def __init__(self, delta, name):
+        self.delta = delta
+        self.name = name
+        hname = delta.hashesFile(name)
+        self.hasBase = os.path.exists(hname)
+        if self.hasBase:
+            self.baseIds, self.baseHashes = readHashes(hname)
+        else:
+            self.baseIds, self.baseHashes = array('q'), array('q')
+        # which of the base items have been written in this run
+        self.seen = bytearray(len(self.baseIds))
+        self.ids = array('q')
+        self.hashes = array('q')
+        self.isSorted = True
+        self.added = 0
+        self.changed = 0
+        self.out = None
+        self.closed = False
+
+    def write(self, id, s):
+        k = packId(id)
+        h = itemHash(s)
+        if self.ids and k < self.ids[-1]:
+            self.isSorted = False
+        self.ids.append(k)
+        self.hashes.append(h)
+        if not self.hasBase:
+            return
+        i = bisect_left(self.baseIds, k)
+        if i < len(self.baseIds) and self.baseIds[i] == k:
+            self.seen[i] = 1
+            if self.baseHashes[i] == h:
+                return
+            self.changed += 1
+        else:
+            self.added += 1
+        if self.out is None:
+            self.out = ItemFile(os.path.join(self.delta.ddir, self.name),
+                bufsize=self.delta.bufsize, compression=self.delta.compression)
+        self.out.write(s)
+
+    # Writes the deleted ids and the new hashes (not yet the base, see ItemDelta.finish).
+    # Returns this file's counts.
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.out:
+            self.out.close()
+        ids, hashes = self.ids, self.hashes
+        if not self.isSorted:
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            ids = array('q', (ids[i] for i in order))
+            hashes = array('q', (hashes[i] for i in order))
+        deleted = [k for k, s in zip(self.baseIds, self.seen) if not s]
+        if self.hasBase and deleted:
+            with open(os.path.join(self.delta.ddir, self.name + '.deleted'), 'w') as fd:
+                for k in deleted:
+                    fd.write(unpackId(k) + '\n')
+        hname = self.delta.hashesFile(self.name)
+        writeHashes(hname + '.new', ids, hashes)
+        if self.hasBase:
+            counts = {'added': self.added, 'changed': self.changed, 'deleted': len(deleted)}
+        else:
+            counts = {'added': len(ids), 'changed': 0, 'deleted': 0}
+        counts['base'] = self.hasBase
+        counts['items'] = len(ids)
+        counts['unchanged'] = len(ids) - counts['added'] - counts['changed']
+        with open(hname + '.new.json', 'w') as fd:
+            json.dump(counts, fd, indent=2, sort_keys=True)
+        self.baseIds = self.baseHashes = self.seen = None
+        return counts
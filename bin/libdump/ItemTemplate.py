@@ -0,0 +1,187 @@
+#
+# ItemTemplate.py
+#
+# Compiled item templates.
+#
+# Dumpers render items by instantiating a %-style template (ITMPLT) with a record.
+# Historically, the rendered item was then post-processed with two regexes, to remove
+# attributes whose value is "Not Applicable" (NA_RE) and attribute/reference lines
+# with empty values (NV_RE). Both regexes rescan every rendered item.
+#
+# An ItemTemplate parses a template once, at first use:
+#   - lines without fields are cleaned up at compile time
+#   - the remaining text is rendered with a single %
+#   - the rendered item is then checked (fast literal searches) for the only things the
+#     regexes can match: the text "applicable" (NA_RE) or an empty value ="" (NV_RE). 
+#     Items without either are done. NA_RE is cheap, so is simply applied to the item. 
+#     NV_RE is expensive (it tries every line), so is applied only to the lines 
+#     that contain an empty value.
+# The output is identical to that of the old render-then-regex approach. (NV_RE can
+# only match across lines if a line ends with an empty value and the next starts 
+# with "/>"; in that case, the whole item is cleaned up the old way.)
+# Each compiled template is also checked against the old approach with sample values.
+#
+# Usage:
+#       t = compileTemplate(tmplt)
+#       s = t.render(r)
+#
+
+import re
+import time
+
+NA_RE = re.compile(r'<attribute\s+name=".*"\s+value="Not Applicable"\s+/>', re.M|re.I)
+NV_RE = re.compile(r'^ *<(attribute|reference).* (value|ref_id)=""\s*/> *$', re.M|re.I)
+
+# Rendered text can only match NA_RE if it contains this (case-insensitive).
+APPLICABLE = 'applicable'
+# Rendered text can only match NV_RE if it contains this.
+EMPTYVALUE = '=""'
+
+FIELD_RE = re.compile(r'%\((\w+)\)([-#0 +]*\d*(?:\.\d+)?)([diouxXeEfFgGcrsa])')
+
+class ItemTemplate:
+    def __init__(self, tmplt, suppressNA=True, suppressNV=True):
+        self.tmplt = tmplt
+        self.suppressNA = suppressNA
+        self.suppressNV = suppressNV
+        self.fmt = self.compile()
+        if not self.verify():
+            # can't guarantee identical output; always render the old way.
+            self.fmt = None
+
+    # Applies the NA/NV cleanup regexes to rendered text.
+    def cleanup(self, s):
+        if self.suppressNA:
+            s = NA_RE.sub('', s)
+        if self.suppressNV:
+            s = NV_RE.sub('', s)
+        return s
+
+    # Renders r the old way: instantiate, then clean up.
+    def renderSlow(self, r):
+        return self.cleanup(self.tmplt % r)
+
+    # Returns the template with its static lines already cleaned up.
+    def compile(self):
+        lines = []
+        for line in self.tmplt.splitlines(True):
+            if '%' not in line:
+                line = self.cleanup(line)
+            lines.append(line)
+        return ''.join(lines)
+
+    # Compares compiled rendering against the old way for some sample records.
+    def verify(self):
+        base = {}
+        for m in FIELD_RE.finditer(self.tmplt):
+            conv = m.group(3)
+            base[m.group(1)] = 1 if conv in 'diouxXc' else 1.0 if conv in 'eEfFgG' else 'x'
+        probes = [base]
+        for n,v in list(base.items()):
+            if type(v) is str:
+                for v in ('', 'Not Applicable', 'not applicable'):
+                    p = dict(base)
+                    p[n] = v
+                    probes.append(p)
+        try:
+            for p in probes:
+                if self.render(p) != self.renderSlow(p):
+                    return False
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def render(self, r):
+        if self.fmt is None:
+            return self.renderSlow(r)
+        s = self.fmt % r
+        if self.suppressNA and APPLICABLE in s.lower():
+            s = NA_RE.sub('', s)
+        if self.suppressNV and EMPTYVALUE in s:
+            s = self.cleanupEmptyValues(s)
+        return s
+
+    # Applies NV_RE to just the lines of s that contain an empty value.
+    def cleanupEmptyValues(self, s):
+        parts = []
+        prev = 0
+        i = s.find(EMPTYVALUE)
+        while i >= 0:
+            a = s.rfind('\n', 0, i) + 1
+            b = s.find('\n', i)
+            if b < 0:
+                b = len(s)
+            elif not s[i+3:b].strip() and s[b:].lstrip().startswith('/>'):
+                # a match could span lines
+                return NV_RE.sub('', s)
+            parts.append(s[prev:a])
+            parts.append(NV_RE.sub('', s[a:b]))
+            prev = b
+            i = s.find(EMPTYVALUE, b)
+        parts.append(s[prev:])
+        return ''.join(parts)
+
+# Cache of compiled templates, keyed by (template, suppressNA, suppressNV)
+_templates = {}
+
+# Returns the compiled ItemTemplate for tmplt.
+def compileTemplate(tmplt, suppressNA=True, suppressNV=True):
+    k = (tmplt, suppressNA, suppressNV)
+    t = _templates.get(k, None)
+    if t is None:
+        t = _templates[k] = ItemTemplate(tmplt, suppressNA, suppressNV)
+    return t
+
+#
+# Benchmark: render sample records with the templates of some of the larger dumpers,
+# the old way and compiled. Run from the bin directory:
+#       % python -m libdump.ItemTemplate
+#
+def __bench__(n=100000):
+    from .FeatureDumper import AbstractFeatureDumper
+    from .AlleleDumper import AlleleDumper
+    from .ExpressionDumper import ExpressionDumper
+
+    ref = '<reference ref_id="10011_1"/>'
+    samples = [
+        ('FeatureDumper', AbstractFeatureDumper.ITMPLT, {
+            'featureClass':'Gene', 'id':'2_1', 'primaryidentifier':'MGI:87853', 'mcvType':'protein coding gene',
+            'soterm':'<reference name="sequenceOntologyTerm" ref_id="10014_704" />', 'symbol':'a',
+            'name':'nonagouti', 'description':'', 'specificityNote':'',
+            'ncbiGeneNumber':'<attribute name="ncbiGeneNumber" value="50518" />', 'partnerRef':'',
+            'organismid':'20_1', 'chromosomeid':'27_3', 'locationRef':'', 'publications':ref*20,
+            'earliestPublication':'', 'dataSets':ref,
+            }),
+        ('AlleleDumper', AlleleDumper.ITMPLT, {
+            'id':'11_1', 'accid':'MGI:1856186', 'symbol':'Kit&lt;W&gt;', 'organism':'20_1', 'dataSets':ref,
+            'name':'kit oncogene; dominant white spotting', 'iswildtype':'false', 'alleletype':'Spontaneous',
+            'alleleAttributes':'', 'inheritancemode':'Not Applicable', 'gltransmission':'Not Applicable',
+            'publications':ref*10, 'publications2':ref*10, 'earliestPublication':'', 'strainid':'10_3',
+            'mutations':ref, 'carriedBy':'', 'isRecombinase':'false', 'attributeString':'',
+            'projectcollection':'', 'description':'', 'molecularNote':'', 'inducedWith':'',
+            'featureRef':'<reference name="feature" ref_id="2_9" />',
+            }),
+        ('ExpressionDumper', ExpressionDumper.ETMPLT, {
+            'id':'10019_1', 'publication':'1_5', 'assayid':'MGI:1', 'assaytype':'RNA in situ', 'feature':'2_1',
+            'sex':'Not Specified', 'age':'embryonic day 14.5', 'strength':'Present', 'genotype':'12_4',
+            'stage':22, 'emaps':'EMAPS:1603222', 'structure':'10020_7', 'celltype':'',
+            'specimennum':1, 'specimenlabel':'1A', 'probe_wv':'<attribute name="probe" value="MGI:2" />',
+            'pattern_wv':'', 'image_wv':'', 'detected_wv':'<attribute name="detected" value="True" />',
+            'note_wv':'', 'annotationdate':'2010-01-01',
+            }),
+        ]
+    for name, tmplt, r in samples:
+        t = compileTemplate(tmplt)
+        assert t.fmt is not None and t.render(r) == t.renderSlow(r)
+        t0 = time.time()
+        for i in range(n):
+            t.renderSlow(r)
+        t1 = time.time()
+        for i in range(n):
+            t.render(r)
+        t2 = time.time()
+        print('%-18s old: %8.2f us/item  compiled: %8.2f us/item  speedup: %.1fx' % \
+            (name, 1e6*(t1-t0)/n, 1e6*(t2-t1)/n, (t1-t0)/(t2-t1)))
+
+if __name__ == "__main__":
+    __bench__()
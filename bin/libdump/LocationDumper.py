@@ -2,6 +2,8 @@ from .AbstractItemDumper import *
 
 
 class LocationDumper(AbstractItemDumper):
+    TABLES = ['MRK_Chromosome', 'MRK_Location_Cache', 'MRK_Marker']
+
     QTMPLT = '''
     SELECT c._marker_key, mc._chromosome_key, c.startcoordinate, c.endcoordinate, c.strand, c.version as assembly
     FROM MRK_Location_Cache c, MRK_Chromosome mc, MRK_Marker m
@@ -0,0 +1,185 @@
+#
+# MemoryMonitor.py
+#
+# Memory accounting for a dump (dumpMgiItemXml.py --memory, --memory-limit, --tracemalloc).
+#
+# After each phase (preDump, mainDump, postDump) of each dumper, and in the parent process
+# after each dumper has finished, logs:
+#   - the process's RSS (and peak RSS)
+#   - the approximate size of each of the context's structures (the id registry, the
+#     shared state, etc.)
+#   - the approximate size of each of the dumper's attributes, e.g., the maps preloaded in
+#     preDump (mk2refs, assay, ek2props, ...)
+#   - optionally, the top N allocation sites (tracemalloc)
+# Only structures of at least MIN_REPORT_BYTES are listed.
+#
+# Sizes are "deep" (an object and everything it refers to, counting shared objects once),
+# but estimated: for a container with more than SAMPLE elements, only the first SAMPLE
+# are measured, and the total extrapolated. The id registry reports its own size.
+#
+# With a soft limit, the RSS is also checked at each query (see DumperContext.sql) and
+# every thousand or so items written (see AbstractItemDumper.writeItem). When it exceeds
+# the limit, the report is logged, and the dump fails with a MemoryLimitError, rather
+# than swapping or being killed.
+#
+# Tracing allocations with tracemalloc slows the dump down considerably.
+#
+# Usage:
+#       context.enableMemoryMonitor(report=True, limitMb=None, tracemallocTop=0)
+#       m = context.memory
+#       outer = m.enter(dumper)
+#       ... run a phase ...
+#       m.leave(outer)
+#       m.afterPhase(dumper, 'preDump')
+#       m.check()
+#
+
+import os
+import sys
+import resource
+import itertools
+import tracemalloc
+from array import array
+from .IdRegistry import IdRegistry
+
+MB = 1024.0 * 1024.0
+# Containers with more elements than this are sized by sampling.
+SAMPLE = 1000
+# Structures smaller than this are not listed in reports.
+MIN_REPORT_BYTES = 64 * 1024
+# Frames per tracemalloc traceback.
+TRACEMALLOC_FRAMES = 1
+
+class MemoryLimitError(RuntimeError):
+    pass
+
+# Returns the current RSS of this process, in bytes.
+def rss():
+    try:
+        with open('/proc/self/statm') as fd:
+            return int(fd.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # (not Linux) peak instead of current
+        return peakRss()
+
+# Returns the peak RSS of this process, in bytes.
+def peakRss():
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # (kilobytes on Linux, bytes on macOS)
+    return r if sys.platform == 'darwin' else r * 1024
+
+# Returns the approximate deep size of x, in bytes. Objects whose ids are in seen are not
+# counted (again).
+def deepSize(x, seen):
+    if id(x) in seen:
+        return 0
+    seen.add(id(x))
+    if isinstance(x, IdRegistry):
+        return sum(r[3] for r in x.report())
+    n = sys.getsizeof(x)
+    if isinstance(x, (str, bytes, bytearray, int, float, bool, array)) or x is None:
+        return n
+    if isinstance(x, dict):
+        elts = x.items()
+    elif isinstance(x, (list, tuple, set, frozenset)):
+        elts = x
+    elif hasattr(x, '__dict__') and not isinstance(x, type):
+        return n + deepSize(x.__dict__, seen)
+    else:
+        return n
+    total = len(x)
+    if total == 0:
+        return n
+    size = 0
+    sampled = 0
+    for e in itertools.islice(elts, SAMPLE):
+        if isinstance(x, dict):
+            size += deepSize(e[0], seen) + deepSize(e[1], seen)
+        else:
+            size += deepSize(e, seen)
+        sampled += 1
+    return n + int(size * total / sampled)
+
+def fmtMb(n):
+    return '%.1f MB' % (n / MB)
+
+class MemoryMonitor:
+    def __init__(self, context, report=True, limitMb=None, tracemallocTop=0):
+        self.context = context
+        self.report = report
+        self.limit = int(limitMb * MB) if limitMb else None
+        self.tracemallocTop = tracemallocTop
+        if tracemallocTop and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        # the dumper whose phase is running (innermost), reported when the limit is exceeded
+        self.dumper = None
+
+    # Called when a dumper phase starts. Returns the dumper that was running (see leave).
+    def enter(self, dumper):
+        outer = self.dumper
+        self.dumper = dumper
+        return outer
+
+    # Called when a dumper phase ends, with what enter returned.
+    def leave(self, outer):
+        self.dumper = outer
+
+    # Returns [(name, size)] of the attributes of obj of at least MIN_REPORT_BYTES, largest first.
+    # Attributes named in skip, and objects in seen, are not counted.
+    def sizes(self, obj, seen, skip=()):
+        sizes = []
+        for n, v in list(vars(obj).items()):
+            if n in skip or v is None or isinstance(v, (str, int, float, bool)):
+                continue
+            s = deepSize(v, seen)
+            if s >= MIN_REPORT_BYTES:
+                sizes.append((n, s))
+        sizes.sort(key=lambda x: -x[1])
+        return sizes
+
+    # Returns the lines of a report: RSS, context structures, the dumper's attributes
+    # (if given), and the top allocation sites.
+    def reportLines(self, dumper=None):
+        ctx = self.context
+        seen = set([id(ctx), id(self), id(ctx.profiler)])
+        r = rss()
+        lines = ['RSS %s (peak %s)' % (fmtMb(r), fmtMb(max(r, peakRss())))]
+        sizes = self.sizes(ctx, seen, ('memory', 'profiler', 'pool', 'fd', 'logfd', 'consolefd', 'outfiles'))
+        lines.append('context: %s' % (', '.join('%s %s' % (n, fmtMb(s)) for n, s in sizes) or '-'))
+        if dumper is not None:
+            sizes = self.sizes(dumper, seen, ('context', 'parentDumper'))
+            lines.append('%s: %s' % (dumper.__class__.__name__, ', '.join('%s %s' % (n, fmtMb(s)) for n, s in sizes) or '-'))
+        if self.tracemallocTop:
+            stats = tracemalloc.take_snapshot().statistics('lineno')
+            for st in stats[:self.tracemallocTop]:
+                lines.append('tracemalloc: %s, %d blocks: %s' % (fmtMb(st.size), st.count, st.traceback))
+        return lines
+
+    def log(self, what, dumper=None):
+        lines = self.reportLines(dumper)
+        self.context.log('Memory %s: %s' % (what, '\n    '.join(lines)))
+
+    # Called after each phase of a dumper. Logs the report, and checks the limit.
+    def afterPhase(self, dumper, phase):
+        if self.report:
+            self.log('after %s.%s' % (dumper.__class__.__name__, phase), dumper)
+        self.check(dumper)
+
+    # Called (in the parent) after a dumper has finished and its results have been merged.
+    def afterDumper(self, name):
+        if self.report:
+            self.log('after %s' % name)
+        self.check()
+
+    # Fails, with a report, if the RSS exceeds the limit.
+    def check(self, dumper=None):
+        if self.limit is None:
+            return
+        r = rss()
+        if r <= self.limit:
+            return
+        dumper = dumper or self.dumper
+        what = 'limit exceeded%s' % (dumper and ' in %s' % dumper.__class__.__name__ or '')
+        self.log(what, dumper)
+        raise MemoryLimitError('Memory limit exceeded: RSS %s > %s. See the memory report in the log.' % \
+            (fmtMb(r), fmtMb(self.limit)))
@@ -1,6 +1,8 @@
 from .AbstractItemDumper import *
 
 class OrganismDumper(AbstractItemDumper):
+    TABLES = ['MGI_Organism']
+
     # This dumper used to query the MGI_Organism, 
     # Now it just dumps records based on config. See DumperContext.py
     QTMPLT = '''
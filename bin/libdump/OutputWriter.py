@@ -0,0 +1,294 @@
+#
+# OutputWriter.py
+#
+# Buffered, optionally compressed, optionally threaded writer for ItemXML output files.
+#
+# Items are collected into batches of (about) bufsize characters, which are encoded
+# and written in one go. Output may be compressed with gzip or zstd (the latter
+# requires the zstandard package); the file name gets a .gz or .zst suffix.
+# If threaded is True, batches are handed to a background thread that does the
+# compression and disk I/O, so the dumper does not wait on either.
+#
+# Usage:
+#       w = OutputWriter('Allele.xml', compression='gzip', threaded=True)
+#       w.write(s)
+#       ...
+#       w.close()
+#
+# Use openInput() to read a file written this way (compressed or not).
+#
+# An ItemFile is an ItemXML document (<items> ... </items>) written through an
+# OutputWriter. It may be split into shards: once the current shard holds maxItems
+# items or maxBytes characters, the next item starts a new shard. Each shard is a
+# complete <items> document, named by inserting the shard number before the suffix:
+#       Expression.xml -> Expression.0001.xml, Expression.0002.xml, ...
+# Once closed, an ItemFile can be rewritten without some of its items (see rewrite).
+# Opening an ItemFile removes every earlier output file of the same name: unsharded or
+# any shard, with any compression suffix (see removeOutputFiles), so a run with different
+# sharding or compression than the previous one leaves no stale files behind.
+#
+
+import os
+import io
+import re
+import gzip
+import queue
+import threading
+
+DEFAULT_BUFSIZE = 4 * 1024 * 1024
+ENCODING = 'utf-8'
+# Maps compression name to file name suffix.
+COMPRESSION_SUFFIXES = {
+    None   : '',
+    'gzip' : '.gz',
+    'zstd' : '.zst',
+    }
+# Max number of batches waiting for the writer thread.
+QUEUE_SIZE = 8
+# Start and end of every ItemXML document.
+ITEMS_HEADER = '<?xml version="1.0"?>\n<items>\n'
+ITEMS_FOOTER = '\n</items>\n'
+# Name of the file (in the output directory) listing the shards of each output file.
+MANIFEST_NAME = 'manifest.json'
+# One item (items don't nest).
+ITEM_RE = re.compile(r'<item\b.*?</item>', re.S)
+ITEM_END = '</item>'
+# Characters read at a time when filtering items.
+READ_SIZE = 1 << 20
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression requires the zstandard package.")
+    return zstandard
+
+# Returns the actual name of the output file for fname, with the given compression.
+def outputFileName(fname, compression=None):
+    if compression not in COMPRESSION_SUFFIXES:
+        raise RuntimeError("Unknown compression: %s" % compression)
+    return fname + COMPRESSION_SUFFIXES[compression]
+
+# Returns the name of shard i (1-based) of fname. E.g., Expression.xml -> Expression.0001.xml
+def shardFileName(fname, i):
+    base, ext = os.path.splitext(fname)
+    return '%s.%04d%s' % (base, i, ext)
+
+# Removes the output files for fname, as written with any sharding or compression
+# (e.g., for Allele.xml: Allele.xml, Allele.0001.xml.gz, Allele.0002.xml.zst, ...).
+# Returns the number of files removed.
+def removeOutputFiles(fname):
+    dname, bname = os.path.split(fname)
+    base, ext = os.path.splitext(bname)
+    suffixes = '|'.join(re.escape(x) for x in COMPRESSION_SUFFIXES.values() if x)
+    pattern = re.compile(r'%s(\.\d{4,})?%s(%s)?$' % (re.escape(base), re.escape(ext), suffixes))
+    try:
+        names = os.listdir(dname or '.')
+    except FileNotFoundError:
+        return 0
+    n = 0
+    for name in names:
+        if pattern.match(name):
+            os.remove(os.path.join(dname, name))
+            n += 1
+    return n
+
+# Opens a (possibly compressed) output file for reading as text.
+# The compression is determined from the file name suffix.
+def openInput(fname):
+    if fname.endswith('.gz'):
+        return gzip.open(fname, 'rt', encoding=ENCODING)
+    elif fname.endswith('.zst'):
+        raw = open(fname, 'rb')
+        return io.TextIOWrapper(_zstd().ZstdDecompressor().stream_reader(raw, closefd=True), encoding=ENCODING)
+    else:
+        return open(fname, 'r', encoding=ENCODING)
+
+# Copies an ItemXML document from fin (text) to fout (an OutputWriter), without the
+# items for which drop(item) is True, where item is the text of one <item> element.
+# Returns the number of items dropped.
+def filterItems(fin, fout, drop):
+    ndropped = [0]
+    def keep(m):
+        if drop(m.group(0)):
+            ndropped[0] += 1
+            return ''
+        return m.group(0)
+    buf = ''
+    while True:
+        block = fin.read(READ_SIZE)
+        if not block:
+            fout.write(ITEM_RE.sub(keep, buf))
+            return ndropped[0]
+        buf += block
+        # (up to the end of the last complete item)
+        i = buf.rfind(ITEM_END)
+        if i >= 0:
+            i += len(ITEM_END)
+            fout.write(ITEM_RE.sub(keep, buf[:i]))
+            buf = buf[i:]
+
+class OutputWriter:
+    def __init__(self, fname, bufsize=DEFAULT_BUFSIZE, compression=None, threaded=False, compresslevel=6):
+        self.name = outputFileName(fname, compression)
+        self.bufsize = bufsize
+        self.compression = compression
+        self.batch = []
+        self.batchSize = 0
+        self.closed = False
+        self.raw = open(self.name, 'wb', buffering=bufsize)
+        if compression == 'gzip':
+            self.sink = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=compresslevel)
+        elif compression == 'zstd':
+            self.sink = _zstd().ZstdCompressor(level=compresslevel).stream_writer(self.raw, closefd=False)
+        else:
+            self.sink = self.raw
+        self.queue = None
+        self.thread = None
+        self.error = None
+        if threaded:
+            self.queue = queue.Queue(QUEUE_SIZE)
+            self.thread = threading.Thread(target=self._run, name='writer:'+self.name, daemon=True)
+            self.thread.start()
+
+    # Background thread: writes batches until it gets None.
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                return
+            if self.error is None:
+                try:
+                    self.sink.write(data)
+                except Exception as e:
+                    self.error = e
+
+    def _checkError(self):
+        if self.error is not None:
+            e, self.error = self.error, None
+            raise e
+
+    # Encodes and writes (or hands off) the current batch.
+    def _flushBatch(self):
+        if not self.batch:
+            return
+        data = ''.join(self.batch).encode(ENCODING)
+        self.batch = []
+        self.batchSize = 0
+        if self.queue is not None:
+            self._checkError()
+            self.queue.put(data)
+        else:
+            self.sink.write(data)
+
+    def write(self, s):
+        self.batch.append(s)
+        self.batchSize += len(s)
+        if self.batchSize >= self.bufsize:
+            self._flushBatch()
+
+    # Writes out the current batch. (With a writer thread, does not wait for it to reach the disk.)
+    def flush(self):
+        self._flushBatch()
+
+    def close(self):
+        if self.closed:
+            return
+        self._flushBatch()
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+        self.closed = True
+        if self.sink is not self.raw:
+            self.sink.close()
+        self.raw.close()
+        self._checkError()
+
+class ItemFile:
+    def __init__(self, fname, maxItems=None, maxBytes=None, bufsize=DEFAULT_BUFSIZE, compression=None, threaded=False):
+        self.fname = fname
+        self.maxItems = maxItems
+        self.maxBytes = maxBytes
+        self.sharded = bool(maxItems or maxBytes)
+        self.bufsize = bufsize
+        self.compression = compression
+        self.threaded = threaded
+        # one entry per shard (just one if not sharded): {'name', 'items', 'chars', 'bytes'}
+        self.shards = []
+        self.shard = None
+        self.fd = None
+        self.closed = False
+        removeOutputFiles(fname)
+        self._openShard()
+
+    @property
+    def name(self):
+        return self.fd.name if self.fd else self.fname
+
+    def _openShard(self):
+        fname = shardFileName(self.fname, len(self.shards)+1) if self.sharded else self.fname
+        self.fd = OutputWriter(fname, self.bufsize, self.compression, self.threaded)
+        self.shard = {'name': os.path.basename(self.fd.name), 'items': 0, 'chars': 0, 'bytes': 0}
+        self.shards.append(self.shard)
+        self.fd.write(ITEMS_HEADER)
+
+    def _closeShard(self):
+        self.fd.write(ITEMS_FOOTER)
+        self.fd.close()
+        self.shard['bytes'] = os.path.getsize(self.fd.name)
+
+    # Returns True iff item s belongs in a new shard.
+    def _full(self, s):
+        sh = self.shard
+        if sh['items'] == 0:
+            return False
+        return (self.maxItems and sh['items'] >= self.maxItems) \
+            or (self.maxBytes and sh['chars'] + len(s) > self.maxBytes)
+
+    # Writes one item.
+    def write(self, s):
+        if self.sharded and self._full(s):
+            self._closeShard()
+            self._openShard()
+        self.fd.write(s)
+        sh = self.shard
+        sh['items'] += 1
+        sh['chars'] += len(s)
+
+    def flush(self):
+        self.fd.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self._closeShard()
+        self.closed = True
+
+    # Rewrites the (closed) file without the items for which drop(item) is True (see
+    # filterItems). Returns the number of items dropped.
+    def rewrite(self, drop):
+        if not self.closed:
+            raise RuntimeError('Cannot rewrite an open file: %s' % self.fname)
+        total = 0
+        for sh in self.shards:
+            fname = os.path.join(os.path.dirname(self.fname), sh['name'])
+            w = OutputWriter(fname + '.tmp', self.bufsize, self.compression)
+            with openInput(fname) as fin:
+                n = filterItems(fin, w, drop)
+            w.close()
+            if n:
+                os.replace(w.name, fname)
+                sh['items'] -= n
+                sh['bytes'] = os.path.getsize(fname)
+                total += n
+            else:
+                os.remove(w.name)
+        return total
+
+    # Returns the manifest entry for this file: totals, plus the list of shards.
+    def manifest(self):
+        return {
+            'items'  : sum(sh['items'] for sh in self.shards),
+            'bytes'  : sum(sh['bytes'] for sh in self.shards),
+            'shards' : [ dict(name=sh['name'], items=sh['items'], bytes=sh['bytes']) for sh in self.shards ],
+            }
@@ -0,0 +1,343 @@
+#
+# Profiler.py
+#
+# Per-dumper profiling (dumpMgiItemXml.py --profile).
+#
+# For each dumper run (each call of AbstractItemDumper.dump), records:
+#   - phases: time, rows fetched and items written in preDump, mainDump and postDump
+#   - queries: for each context.sql, sqliter and copyiter call (summed over calls of the
+#     same query): time to first row, total time, time spent processing the rows
+#     (in the parser or the consuming loop), rows, and bytes (approximate: the length
+#     of the values as text)
+#   - processRecord latency: count, total and maximum time, and a histogram with
+#     power-of-2 microsecond buckets
+#   - helpers: calls and total time of the hot per-row helpers: makeGlobalKey (and so
+#     makeItemId/makeItemRef), quote and template rendering (ItemTemplate.render)
+# Row, item and helper counts include those of nested dumpers (e.g., FeatureDumper runs
+# MouseFeatureDumper, etc.), which also get their own records, under subdumpers.
+#
+# After each top-level dumper, its record is written to profile/<Dumper>.json in the
+# output directory, and a one-line summary per dumper is logged. With cprofile, the
+# dumper also runs under cProfile, and the stats are written to profile/<Dumper>.prof
+# (e.g., python -m pstats profile/AlleleDumper.prof). At the end of the run,
+# writeSummary writes profile/summary.json: all dumpers, slowest first, with their
+# phases and slowest queries.
+#
+# The helpers are timed by wrapping them (see install), which costs a few hundred ns
+# per call, so nothing is wrapped unless profiling is enabled.
+#
+# Usage:
+#       context.enableProfiling(cprofile=False)
+#       ... run dumpers ...
+#       context.profiler.writeSummary()
+#
+
+import os
+import json
+import time
+import cProfile
+
+PROFILE_DIR = 'profile'
+SUMMARY_NAME = 'summary.json'
+# Number of histogram buckets: <1us, 1-2us, 2-4us, ..., >= 2^(N-2) us
+NBUCKETS = 32
+# Queries are identified by their text, with whitespace collapsed, and reported up to this length.
+QUERY_TEXT_LEN = 400
+# Number of slowest queries per dumper in the summary.
+SUMMARY_QUERIES = 5
+
+perf = time.perf_counter
+
+# Calls and seconds of the timed helpers, and the number of items written, in this
+# process (see install). Shared by all Profilers.
+HELPERS = {'makeGlobalKey': [0, 0.0], 'quote': [0, 0.0], 'render': [0, 0.0]}
+ITEMS = [0]
+
+def bucketName(i):
+    if i == 0:
+        return '<1us'
+    return '%d-%dus' % (1 << (i - 1), 1 << i)
+
+# Returns the approximate size (as text) of a row.
+def rowBytes(r):
+    n = 0
+    for v in r.values():
+        if v is None:
+            continue
+        n += len(v) if type(v) is str else 8
+    return n
+
+# Timing counters of one record (dumper run).
+class ProfileRecord:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.phases = {}
+        # normalized query text -> [calls, first row, total, processing, rows, bytes]
+        self.queries = {}
+        self.latency = [0] * NBUCKETS
+        self.nRecords = 0
+        self.recordTime = 0.0
+        self.recordMax = 0.0
+        self.subdumpers = []
+        self.start = None
+        self.mark = None
+        self.total = None
+
+    def report(self):
+        queries = []
+        for q, (calls, first, total, proc, rows, nbytes) in self.queries.items():
+            queries.append({
+                'query'       : q[:QUERY_TEXT_LEN],
+                'calls'       : calls,
+                'first_row_s' : round(first, 4),
+                'total_s'     : round(total, 4),
+                'process_s'   : round(proc, 4),
+                'rows'        : rows,
+                'bytes'       : nbytes,
+                })
+        queries.sort(key=lambda x: -x['total_s'])
+        return {
+            'dumper'     : self.name,
+            'total_s'    : round(self.total, 4),
+            'rows'       : self.mark['rows'],
+            'items'      : self.mark['items'],
+            'phases'     : self.phases,
+            'queries'    : queries,
+            'processRecord' : {
+                'calls'   : self.nRecords,
+                'total_s' : round(self.recordTime, 4),
+                'max_s'   : round(self.recordMax, 6),
+                'histogram' : dict((bucketName(i), n) for i, n in enumerate(self.latency) if n),
+                },
+            'helpers'    : self.mark['helpers'],
+            'subdumpers' : [s.report() for s in self.subdumpers],
+            }
+
+class Profiler:
+    def __init__(self, context, cprofile=False, resume=False):
+        self.context = context
+        self.cprofile = cprofile
+        self.dir = os.path.join(context.dir, PROFILE_DIR)
+        if not os.path.exists(self.dir):
+            os.makedirs(self.dir)
+        elif not resume:
+            # left over from an earlier run
+            for f in os.listdir(self.dir):
+                if f.endswith('.json') or f.endswith('.prof'):
+                    os.remove(os.path.join(self.dir, f))
+        # rows fetched
+        self.rows = 0
+        # records of the dumpers now running, innermost last
+        self.stack = []
+        self.contextRecord = ProfileRecord('context')
+        self.cprof = None
+        self.install()
+
+    # Wraps the hot helpers (at class level) with timers.
+    def install(self):
+        from .DumperContext import DumperContext
+        from .AbstractItemDumper import AbstractItemDumper
+        from .ItemTemplate import ItemTemplate
+        for cls, n in ((DumperContext, 'makeGlobalKey'), (AbstractItemDumper, 'quote'), (ItemTemplate, 'render')):
+            fn = cls.__dict__[n]
+            if getattr(fn, 'profiled', False):
+                continue
+            def timed(*args, _fn=fn, _c=HELPERS[n], **kwargs):
+                t = perf()
+                try:
+                    return _fn(*args, **kwargs)
+                finally:
+                    _c[0] += 1
+                    _c[1] += perf() - t
+            timed.profiled = True
+            setattr(cls, n, timed)
+        # count items written
+        writeOutput = DumperContext.__dict__['writeOutput']
+        if not getattr(writeOutput, 'profiled', False):
+            def countedWriteOutput(ctx, id, s):
+                ITEMS[0] += 1
+                return writeOutput(ctx, id, s)
+            countedWriteOutput.profiled = True
+            DumperContext.writeOutput = countedWriteOutput
+
+    def snapshot(self):
+        return {
+            'rows'    : self.rows,
+            'items'   : ITEMS[0],
+            'helpers' : dict((n, list(c)) for n, c in HELPERS.items()),
+            }
+
+    # Returns the counters (rows, items, helpers) since snapshot s.
+    def since(self, s):
+        return {
+            'rows'    : self.rows - s['rows'],
+            'items'   : ITEMS[0] - s['items'],
+            'helpers' : dict((n, {'calls': c - s['helpers'][n][0], 'seconds': round(t - s['helpers'][n][1], 4)})
+                            for n, (c, t) in HELPERS.items()),
+            }
+
+    ##########################################
+    # Dumpers (see AbstractItemDumper.dump)
+
+    # Called when dumper starts. Times its processRecord calls.
+    def begin(self, dumper):
+        parent = self.stack[-1] if self.stack else None
+        rec = ProfileRecord(dumper.__class__.__name__, parent)
+        if parent:
+            parent.subdumpers.append(rec)
+        elif self.cprofile:
+            self.cprof = cProfile.Profile()
+            self.cprof.enable()
+        self.stack.append(rec)
+        rec.mark = self.snapshot()
+        rec.start = perf()
+        processRecord = dumper.processRecord
+        def timedProcessRecord(*args):
+            t = perf()
+            try:
+                return processRecord(*args)
+            finally:
+                dt = perf() - t
+                rec.nRecords += 1
+                rec.recordTime += dt
+                if dt > rec.recordMax:
+                    rec.recordMax = dt
+                b = int(dt * 1e6).bit_length()
+                rec.latency[b if b < NBUCKETS else NBUCKETS - 1] += 1
+        dumper.processRecord = timedProcessRecord
+
+    # Runs one phase (preDump, mainDump, postDump) of dumper. Returns what fn returns.
+    def phase(self, dumper, name, fn):
+        rec = self.stack[-1]
+        s = self.snapshot()
+        t = perf()
+        try:
+            return fn()
+        finally:
+            c = self.since(s)
+            rec.phases[name] = {'seconds': round(perf() - t, 4), 'rows': c['rows'], 'items': c['items']}
+
+    # Called when dumper finishes (or fails).
+    def end(self, dumper):
+        rec = self.stack.pop()
+        rec.total = perf() - rec.start
+        rec.mark = self.since(rec.mark)
+        del dumper.processRecord
+        self.context.log('Profile %s: %.1f s, %d rows, %d items; %s' % (rec.name, rec.total, rec.mark['rows'], rec.mark['items'],
+            ', '.join('%s %.1f s' % (n, p['seconds']) for n, p in rec.phases.items())))
+        if rec.parent:
+            return
+        if self.cprof:
+            self.cprof.disable()
+            self.cprof.dump_stats(os.path.join(self.dir, rec.name + '.prof'))
+            self.cprof = None
+        fname = os.path.join(self.dir, rec.name + '.json')
+        with open(fname + '.tmp', 'w') as fd:
+            json.dump(rec.report(), fd, indent=2, sort_keys=True)
+        os.replace(fname + '.tmp', fname)
+
+    ##########################################
+    # Queries (see DumperContext.sql, sqliter, copyiter)
+
+    # Returns the counters of query q, in the record of the running dumper (or of
+    # a pseudo-dumper, "context", for queries outside dumpers).
+    def queryCounters(self, q):
+        rec = self.stack[-1] if self.stack else self.contextRecord
+        if type(q) in (list, tuple):
+            q = '; '.join(q)
+        k = ' '.join(str(q).split())
+        c = rec.queries.get(k, None)
+        if c is None:
+            c = rec.queries[k] = [0, 0.0, 0.0, 0.0, 0, 0]
+        return c
+
+    # Profiles a call of db.sql with parser p: run(p) makes the call.
+    def sql(self, q, p, run):
+        c = self.queryCounters(q)
+        t0 = perf()
+        # first row, processing time, rows, bytes
+        state = [None, 0.0, 0, 0]
+        if callable(p):
+            parser = p
+            def p(r, **a):
+                t = perf()
+                if state[0] is None:
+                    state[0] = t - t0
+                state[2] += 1
+                state[3] += rowBytes(r)
+                parser(r, **a)
+                state[1] += perf() - t
+        try:
+            result = run(p)
+        finally:
+            total = perf() - t0
+            c[0] += 1
+            c[2] += total
+        if type(q) not in (list, tuple) and type(result) is list:
+            # rows returned rather than passed to a parser
+            state[0] = total
+            state[2] = len(result)
+            state[3] = sum(rowBytes(r) for r in result)
+        c[1] += state[0] or 0.0
+        c[3] += state[1]
+        c[4] += state[2]
+        c[5] += state[3]
+        self.rows += state[2]
+        return result
+
+    # Profiles iteration over rows (of db.sqliter or db.copyiter).
+    def iterate(self, q, it):
+        c = self.queryCounters(q)
+        c[0] += 1
+        t0 = perf()
+        fetch = 0.0
+        first = True
+        try:
+            while True:
+                t = perf()
+                try:
+                    r = next(it)
+                except StopIteration:
+                    break
+                dt = perf()
+                fetch += dt - t
+                if first:
+                    c[1] += dt - t0
+                    first = False
+                c[4] += 1
+                c[5] += rowBytes(r)
+                self.rows += 1
+                yield r
+        finally:
+            it.close()
+            total = perf() - t0
+            c[2] += total
+            c[3] += total - fetch
+
+    ##########################################
+
+    # Writes profile/summary.json: the dumpers profiled in this run, slowest first.
+    def writeSummary(self):
+        dumpers = []
+        for f in sorted(os.listdir(self.dir)):
+            if not f.endswith('.json') or f == SUMMARY_NAME:
+                continue
+            with open(os.path.join(self.dir, f)) as fd:
+                rec = json.load(fd)
+            dumpers.append({
+                'dumper'  : rec['dumper'],
+                'total_s' : rec['total_s'],
+                'rows'    : rec['rows'],
+                'items'   : rec['items'],
+                'phases'  : rec['phases'],
+                'processRecord_s' : rec['processRecord']['total_s'],
+                'helpers' : rec['helpers'],
+                'queries' : [dict((k, q[k]) for k in ('query', 'total_s', 'first_row_s', 'rows'))
+                                for q in rec['queries'][:SUMMARY_QUERIES]],
+                })
+        dumpers.sort(key=lambda d: -d['total_s'])
+        fname = os.path.join(self.dir, SUMMARY_NAME)
+        with open(fname, 'w') as fd:
+            json.dump({'dumpers': dumpers}, fd, indent=2)
+        self.context.log('Wrote profile: %s' % fname)
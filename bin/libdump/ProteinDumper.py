@@ -2,6 +2,8 @@
 from .AbstractItemDumper import *
 
 class ProteinDumper(AbstractItemDumper):
+    TABLES = ['MRK_Marker', 'SEQ_Marker_Cache']
+
     QTMPLT = '''
         SELECT distinct mc._organism_key, mc.accid, mc._marker_key
         FROM SEQ_Marker_Cache mc
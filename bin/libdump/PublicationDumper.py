@@ -2,6 +2,8 @@ from .AbstractItemDumper import *
 import string
 
 class PublicationDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'BIB_Refs']
+
     QTMPLT = '''
     SELECT 
         r._refs_key, 
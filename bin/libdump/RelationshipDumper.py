@@ -1,15 +1,30 @@
 
 from .AbstractItemDumper import *
 from .DataSourceDumper import DataSetDumper
-import itertools
+from .IdRegistry import BlockAllocator, DeferredRefs, DUMPER_BLOCKS
+from .OutputWriter import removeOutputFiles
+import time
+import multiprocessing
+
+# The dumper whose categories the worker processes dump (set before they are forked).
+# (see RelationshipDumper.dumpCategories)
+_categoryDumper = None
+
+def _dumpCategory(task):
+    return _categoryDumper.dumpCategoryWorker(*task)
 
 class RelationshipDumper(AbstractItemDumper):
+    TABLES = ['ACC_MGIType', 'MGI_Relationship', 'MGI_Relationship_Category',
+        'MGI_Relationship_Property','VOC_Term']
+
     qCategories = '''
     SELECT c._category_key, c.name, st.name as stype, ot.name as otype
     FROM MGI_Relationship_Category c, ACC_MGItype st, ACC_MGIType ot
     WHERE c._mgitype_key_1 = st._mgitype_key
     AND c._mgitype_key_2 = ot._mgitype_key
     '''
+    # The relationships of a category, each with its properties (those with a name), in order,
+    # as parallel arrays of names and values (NULL if none).
     qRelationships = '''
     SELECT 
         r._relationship_key,
@@ -19,24 +34,30 @@ class RelationshipDumper(AbstractItemDumper):
         rr.term as relationship,
         q.term as qualifier,
         e.abbreviation as evidencecode,
-        r._refs_key
-    FROM  MGI_Relationship r, VOC_Term q, VOC_Term e, VOC_Term rr
-    WHERE r._category_key = %d
+        r._refs_key,
+        p.properties,
+        p.propertyvalues
+    FROM  MGI_Relationship r
+      LEFT JOIN (
+        SELECT 
+            p._relationship_key,
+            array_agg(t.term ORDER BY p.sequenceNum) as properties,
+            array_agg(p.value ORDER BY p.sequenceNum) as propertyvalues
+        FROM MGI_Relationship r2, MGI_Relationship_Property p, VOC_Term t
+        WHERE r2._category_key = %(category)d
+        AND r2._relationship_key = p._relationship_key
+        AND p._propertyname_key = t._term_key
+        AND t.term != ''
+        GROUP BY p._relationship_key
+        ) p
+        ON r._relationship_key = p._relationship_key,
+      VOC_Term q, VOC_Term e, VOC_Term rr
+    WHERE r._category_key = %(category)d
     AND r._relationshipterm_key = rr._term_key
     AND r._qualifier_key = q._term_key
     AND r._evidence_key = e._term_key
     ORDER BY r._relationship_key
     '''
-    qProperties = '''
-    SELECT r._relationship_key, t.term as property, p.value
-    FROM MGI_Relationship r
-      LEFT JOIN MGI_Relationship_Property p
-        ON r._relationship_key = p._relationship_key
-      LEFT JOIN VOC_Term t
-        ON p._propertyname_key = t._term_key
-    WHERE r._category_key = %d
-    ORDER BY r._relationship_key, p.sequenceNum
-    '''
     rTmplt = '''
 <item class="%(relclass)s" id="%(id)s">
 <reference name="%(subjectAttrName)s" ref_id="%(subject)s" />
@@ -58,6 +79,8 @@ class RelationshipDumper(AbstractItemDumper):
             cls = 'AND c._category_key in (%s)' % (",".join(map(str,categoryKeys)))
         for c in self.context.sql(self.qCategories + cls):
             self.categories[c['_category_key']] = c
+        # property name -> attribute name (see writeProperties)
+        self.attributeNames = {}
 
     def normalizeName(self, n, capitalizeFirst=True):
         s = n.lower().replace("-"," ").replace("_"," ").split()
@@ -65,22 +88,23 @@ class RelationshipDumper(AbstractItemDumper):
         s2= ''.join([x.capitalize() for x in s[1:]])
         return s1 + s2    
 
-    def iterData(self, _category_key):
-        qRelationships = RelationshipDumper.qRelationships % _category_key
-        qProperties = RelationshipDumper.qProperties % _category_key
-        i1 = self.context.sqliter(qRelationships)
-        i2 = itertools.groupby(self.context.sqliter(qProperties), lambda r:r['_relationship_key'])
-        for (r1,(k2,r2)) in zip(i1, i2):
-            yield r1, [p for p in list(r2) if p['property']]
+    # Yields the relationships of a category, with their properties (see qRelationships),
+    # from a single query.
+    def iterData(self, _category_key, connection=None):
+        return self.context.copyiter(self.qRelationships % {'category': _category_key},
+            rowtype=db.RECORD, connection=connection)
 
-    def writeProperties(self, props, asAttributes):
+    # Properties are given as parallel lists of names and values.
+    # The ids of the property items written (if any) are appended to ids.
+    def writeProperties(self, names, values, asAttributes, ids=None):
         if asAttributes :
-            tmplt = '<attribute name="%(property)s" value="%(value)s" />'
+            tmplt = '<attribute name="%s" value="%s" />'
             attrs = []
-            for p in props:
-                p['property'] = self.normalizeName(p['property'], capitalizeFirst=False)
-                p['value'] = self.quote(p['value'])
-                attrs.append(tmplt % p)
+            for n, v in zip(names, values):
+                a = self.attributeNames.get(n, None)
+                if a is None:
+                    a = self.attributeNames[n] = self.normalizeName(n, capitalizeFirst=False)
+                attrs.append(tmplt % (a, self.quote(v)))
             return "".join(attrs)
         else:
             tmplt = '''<item class="MGIDirectedRelationshipProperty" id="%(id)s">
@@ -89,32 +113,33 @@ class RelationshipDumper(AbstractItemDumper):
             </item>
             '''
             rvals = []
-            for p in props:
-                p['id'] = self.context.makeItemId('DirectedRelationshipProperty')
-                p['value'] = self.quote(p['value'])
+            for n, v in zip(names, values):
+                p = {'id': self.context.makeItemId('DirectedRelationshipProperty'), 'property': n, 'value': self.quote(v)}
                 self.writeItem(p, tmplt)
                 rvals.append('<reference ref_id="%s"/>' % p['id'])
+                if ids is not None:
+                    ids.append(p['id'])
             #
             return '<collection name="properties">%s</collection>\n' % "".join(rvals)
 
-    def dumpCategory(self, _category_key):
+    def dumpCategory(self, _category_key, connection=None):
         nmap = self.context.QUERYPARAMS['ALL_FR_NAME_MAP'][_category_key]
         cname = self.categories[_category_key]['name']
         dsid = DataSetDumper(self.context).dataSet(name="%s relationships from MGI"%cname)
         asAttributes = nmap.get('storePropertiesAsAttributes', False)
-        for rel, props in self.iterData(_category_key):
+        relclass = 'MGI' + self.normalizeName(cname)
+        for rel in self.iterData(_category_key, connection):
             rel['id'] = self.context.makeItemId('DirectedRelationship', rel['_relationship_key'])
             c = self.categories[rel['_category_key']]
-            rel['relclass'] = 'MGI' + self.normalizeName(cname)
+            rel['relclass'] = relclass
             try:
                 rel['subject'] = self.context.makeItemRef(c['stype'], rel['_object_key_1'])
                 rel['subjectAttrName'] = nmap['subjectAttrName']
                 rel['object'] = self.context.makeItemRef(c['otype'], rel['_object_key_2'])
                 rel['objectAttrName'] = nmap['objectAttrName']
                 rel['publication'] = self.context.makeItemRef('Reference', rel['_refs_key'])
-            except DumperContext.DanglingReferenceError:
-                self.context.log("Dangling reference error. Relationship record skipped: " + \
-                    str(rel))
+            except DumperContext.DanglingReferenceError as e:
+                self.context.noteDanglingReference(self, e, rel)
                 continue
             if rel['qualifier'] == "Not Specified":
                 rel['qualifier'] = ''
@@ -122,12 +147,133 @@ class RelationshipDumper(AbstractItemDumper):
                 rel['qualifier'] = '<attribute name="qualifier" value="%s" />\n'%rel['qualifier']
             rel['dataset'] = dsid
 
-            rel['propertystring'] = self.writeProperties(props, asAttributes)
+            pids = []
+            rel['propertystring'] = self.writeProperties(rel['properties'] or (), rel['propertyvalues'] or (), asAttributes, pids)
 
             self.writeItem(rel, self.rTmplt)
+            if pids:
+                # (with deferred checking, the properties go if the relationship is dropped)
+                self.context.ownItems(rel['id'], pids)
             # end for loop
 
+    # Returns the number of worker processes to dump the categories with (see dumpCategories),
+    # or None to dump them one after the other.
+    def categoryJobs(self):
+        jobs = self.context.partitionJobs
+        if jobs and not self.context.checkRefs and not self.context.idRegistry.stable:
+            # (ids the workers allocate for keys not seen before could collide)
+            self.context.log('%s: categories not dumped in parallel, as references are not checked' % \
+                self.__class__.__name__)
+            jobs = None
+        if jobs and jobs > 1 and len(self.categories) > 1:
+            return jobs
+        return None
+
+    # Name of the output file of a category dumped in parallel. E.g., for interacts_with:
+    # RelationshipInteractsWith.xml. (Not Relationship.<key>.xml, which would look like a
+    # shard of Relationship.xml; see OutputWriter.)
+    def categoryFileName(self, _category_key):
+        return '%s%s.xml' % (self.getClassName(), self.normalizeName(self.categories[_category_key]['name']))
+
+    # Dumped in parallel, the categories are written to their own files instead of fname,
+    # which isn't opened. Whichever layout is written, the files of the other one (from an
+    # earlier run) are removed.
+    def dump(self, **kwargs):
+        self.jobs = self.categoryJobs()
+        fname = kwargs.get('fname', None)
+        if fname:
+            if self.jobs:
+                removeOutputFiles(os.path.join(self.context.dir, fname))
+                kwargs['fname'] = None
+            else:
+                for k in self.categories:
+                    removeOutputFiles(os.path.join(self.context.dir, self.categoryFileName(k)))
+        return AbstractItemDumper.dump(self, **kwargs)
+
+    # With context.partitionJobs, the categories are dumped in parallel, each by a worker
+    # process, into its own output file (see categoryFileName), from one snapshot of
+    # the database. Largest categories start first. Keyless ids (properties, data sets) are
+    # allocated per category: with stable ids, from the category's own block (see categoryBlock);
+    # otherwise, in blocks shared by the workers (see BlockAllocator), which they draw from
+    # as they go, so without stable ids, which category gets which of those ids depends on
+    # timing. Each worker's ids, data sets and output files are merged into the context,
+    # in category order (see DumperContext.takeDelta, applyDelta).
+    def dumpCategories(self, jobs):
+        ctx = self.context
+        keys = list(self.categories.keys())
+        sizes = dict((r['_category_key'], r['n']) for r in ctx.sql(
+            'SELECT _category_key, count(*) AS n FROM MGI_Relationship WHERE _category_key IN (%s) GROUP BY _category_key' % \
+            ','.join(map(str, keys))))
+        keys.sort(key=lambda k: -sizes.get(k, 0))
+        ctx.log("%s: dumping categories in parallel (%d jobs): %s" % \
+            (self.__class__.__name__, jobs, ', '.join(self.categories[k]['name'] for k in keys)))
+        # (unless already drawing ids from shared blocks, as a DumperScheduler worker)
+        ownBlocks = ctx.idRegistry.blocks is None
+        if ownBlocks:
+            ctx.idRegistry.useBlocks(BlockAllocator(ctx.TYPE_KEYS.values()))
+        global _categoryDumper
+        _categoryDumper = self
+        # connections must not be shared with the workers, nor buffered log messages
+        ctx.pool.closeAll()
+        ctx.flushLog()
+        con = None
+        try:
+            with multiprocessing.get_context('fork').Pool(min(jobs, len(keys))) as pool:
+                # (the snapshot's transaction stays open until all the categories are done)
+                con = db.connect()
+                snapshot = db.exportSnapshot(con)
+                for result in pool.imap(_dumpCategory, [(k, snapshot) for k in keys]):
+                    ctx.applyDelta(result)
+                    self.writeCount += result['count']
+                    ctx.log('%s: finished category %s: %d items' % \
+                        (self.__class__.__name__, self.categories[result['category']]['name'], result['count']))
+        finally:
+            _categoryDumper = None
+            if ownBlocks:
+                ctx.idRegistry.stopBlocks()
+            if con is not None:
+                con.close()
+
+    # With stable ids, the block of keyless ids for a category: one of the blocks after
+    # the dumpers' (see IdRegistry.DUMPER_BLOCKS), by its position in ALL_FR_CATEGORY_KEYS.
+    def categoryBlock(self, _category_key):
+        keys = self.context.QUERYPARAMS['ALL_FR_CATEGORY_KEYS']
+        if _category_key not in keys:
+            raise RuntimeError('RelationshipDumper: no id block for category: %s' % _category_key)
+        return DUMPER_BLOCKS + keys.index(_category_key)
+
+    # In a worker process (see dumpCategories): dumps a category into its own output file,
+    # on a connection to snapshot. Returns the changes to the context (see DumperContext.takeDelta),
+    # with the category and the number of items written.
+    def dumpCategoryWorker(self, _category_key, snapshot):
+        ctx = self.context
+        name = '%s.%d' % (self.getClassName(), _category_key)
+        ctx.beginWorker(name)
+        ctx.setIdBlock(self.categoryBlock(_category_key))
+        if ctx.deferredRefs is not None:
+            # (the parent checks the references made before the fork)
+            ctx.deferredRefs = DeferredRefs(ctx.idRegistry)
+            ctx.deferFiles = {}
+        self.writeCount = 0
+        con = db.connectToSnapshot(snapshot)
+        try:
+            ctx.openOutput(self.categoryFileName(_category_key))
+            self.dumpCategory(_category_key, con)
+        finally:
+            con.close()
+        ctx.log('', timestamp=False)
+        if ctx.deferredRefs is not None:
+            self.writeCount -= ctx.checkDeferredRefs(self, ctx.deferredRefs)
+        ctx.logDanglingReferences(self)
+        result = ctx.endWorker()
+        result['category'] = _category_key
+        result['count'] = self.writeCount
+        return result
+
     def mainDump(self):
+        if self.jobs:
+            self.dumpCategories(self.jobs)
+            return
         for _category_key in list(self.categories.keys()):
             self.context.log("%s: dumping category: %s" % \
                (self.__class__.__name__, self.categories[_category_key]['name']))
@@ -135,3 +281,54 @@ class RelationshipDumper(AbstractItemDumper):
 
 #
 
+#
+# Benchmark: stream the relationships of a category (default: 1001, interacts_with) the
+# old way (relationships and properties from two sorted COPY streams, merged in Python)
+# and with the single query (qRelationships), checking that both give the same data.
+# Run from the bin directory (with MGI_SNAPSHOT set, to use a snapshot or fixture):
+#       % python -m libdump.RelationshipDumper [category]
+#
+def __bench__(category=1001):
+    import itertools
+    qRelationships = '''
+    SELECT r._relationship_key, r._category_key, r._object_key_1, r._object_key_2,
+        rr.term as relationship, q.term as qualifier, e.abbreviation as evidencecode, r._refs_key
+    FROM  MGI_Relationship r, VOC_Term q, VOC_Term e, VOC_Term rr
+    WHERE r._category_key = %d
+    AND r._relationshipterm_key = rr._term_key
+    AND r._qualifier_key = q._term_key
+    AND r._evidence_key = e._term_key
+    ORDER BY r._relationship_key
+    '''
+    qProperties = '''
+    SELECT r._relationship_key, t.term as property, p.value
+    FROM MGI_Relationship r
+      LEFT JOIN MGI_Relationship_Property p
+        ON r._relationship_key = p._relationship_key
+      LEFT JOIN VOC_Term t
+        ON p._propertyname_key = t._term_key
+    WHERE r._category_key = %d
+    ORDER BY r._relationship_key, p.sequenceNum
+    '''
+    def old():
+        i1 = db.copyiter(qRelationships % category)
+        i2 = itertools.groupby(db.copyiter(qProperties % category), lambda r:r['_relationship_key'])
+        for (r1,(k2,r2)) in zip(i1, i2):
+            props = [p for p in r2 if p['property']]
+            yield r1['_relationship_key'], [p['property'] for p in props], [p['value'] for p in props]
+    def new():
+        for r in db.copyiter(RelationshipDumper.qRelationships % {'category': category}, rowtype=db.RECORD):
+            yield r['_relationship_key'], r['properties'] or [], r['propertyvalues'] or []
+    db.setConnectionFromPropertiesFile()
+    results = []
+    for name, fn in (('two streams', old), ('single query', new)):
+        t = time.time()
+        rows = list(fn())
+        dt = time.time() - t
+        results.append(rows)
+        print('%-13s category %d: %d relationships, %d properties in %.2f s' % \
+            (name, category, len(rows), sum(len(r[1]) for r in rows), dt))
+    print('same data: %s' % (results[0] == results[1]))
+
+if __name__ == "__main__":
+    __bench__(*[int(a) for a in sys.argv[1:]])
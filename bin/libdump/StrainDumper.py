@@ -1,6 +1,9 @@
 from .AbstractItemDumper import *
 
 class StrainDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'MGI_Reference_Assoc', 'PRB_Strain',
+        'PRB_Strain_Reference_View','VOC_Annot', 'VOC_Term']
+
     QTMPLT='''
     SELECT a.accid, s._strain_key, s.strain AS name, t.term AS straintype, s.standard
     FROM
@@ -4,6 +4,8 @@ from .DataSourceDumper import DataSetDumper
 from .DumperContext import DumperContext
 
 class SynonymDumper(AbstractItemDumper):
+    TABLES = ['ACC_Accession', 'MGI_Synonym', 'MRK_Label', 'MRK_Marker']
+
     QTMPLT = ['''
     /* get allele, strain, etc., synonyms from MGI_Synonyms table */
     SELECT s.synonym, s._object_key, s._mgitype_key
@@ -74,4 +76,5 @@ class SynonymDumper(AbstractItemDumper):
                 r['subject'] = self.context.makeItemRef( r['_mgitype_key'], r['_object_key'])
                 return r
         except DumperContext.DanglingReferenceError as e:
+            self.context.noteDanglingReference(self, e, r)
             return None
@@ -70,6 +70,9 @@ SYNTENIC_REGION_SOID = "SO:0005858"
 #
 
 class SyntenyDumper(AbstractItemDumper):
+    TABLES = ['MRK_Chromosome', 'MRK_Cluster', 'MRK_ClusterMember', 'MRK_Location_Cache',
+        'MRK_Marker']
+
     QTMPLT = '''
 SELECT distinct
         m1.symbol AS msymbol,
@@ -1,35 +1,70 @@
 from .DumperContext      import DumperContext
-
-from .AlleleDumper       import AlleleDumper
-from .AnnotationDumper   import AnnotationDumper
-from .CellLineDumper     import CellLineDumper
-from .ChromosomeDumper   import ChromosomeDumper
-from .CrossReferenceDumper import CrossReferenceDumper
-from .DataSourceDumper   import DataSourceDumper
-from .ExpressionDumper   import ExpressionDumper
-from .HTIndexDumper      import HTIndexDumper
-from .FeatureDumper      import FeatureDumper, MouseFeatureDumper, HumanFeatureDumper, OtherSpeciesFeatureDumper
-from .GenotypeDumper     import GenotypeDumper
-from .HomologyDumper     import HomologyDumper
-from .LocationDumper     import LocationDumper
-from .OboParser          import OboParser
-from .OrganismDumper     import OrganismDumper
-from .ProteinDumper      import ProteinDumper
-from .PublicationDumper  import PublicationDumper
-from .RelationshipDumper import RelationshipDumper
-from .StrainDumper       import StrainDumper
-from .SynonymDumper      import SynonymDumper
-from .SyntenyDumper      import SyntenyDumper
-from .AnnotationCommentDumper import AnnotationCommentDumper
+from .DumperScheduler    import DumperScheduler
+from .Fingerprints       import Fingerprints
 from . import NoteUtils
 
+# The dumpers (and OboParser) are imported on first use (see __getattr__), so that a run of
+# a few dumpers (-c Organism) doesn't import them all. Maps each name to its module.
+LAZY = {
+    'AlleleDumper'          : 'AlleleDumper',
+    'AnnotationDumper'      : 'AnnotationDumper',
+    'CellLineDumper'        : 'CellLineDumper',
+    'ChromosomeDumper'      : 'ChromosomeDumper',
+    'CrossReferenceDumper'  : 'CrossReferenceDumper',
+    'DataSourceDumper'      : 'DataSourceDumper',
+    'ExpressionDumper'      : 'ExpressionDumper',
+    'HTIndexDumper'         : 'HTIndexDumper',
+    'FeatureDumper'         : 'FeatureDumper',
+    'MouseFeatureDumper'    : 'FeatureDumper',
+    'HumanFeatureDumper'    : 'FeatureDumper',
+    'OtherSpeciesFeatureDumper' : 'FeatureDumper',
+    'GenotypeDumper'        : 'GenotypeDumper',
+    'HomologyDumper'        : 'HomologyDumper',
+    'LocationDumper'        : 'LocationDumper',
+    'OboParser'             : 'OboParser',
+    'OrganismDumper'        : 'OrganismDumper',
+    'ProteinDumper'         : 'ProteinDumper',
+    'PublicationDumper'     : 'PublicationDumper',
+    'RelationshipDumper'    : 'RelationshipDumper',
+    'StrainDumper'          : 'StrainDumper',
+    'SynonymDumper'         : 'SynonymDumper',
+    'SyntenyDumper'         : 'SyntenyDumper',
+    'AnnotationCommentDumper' : 'AnnotationCommentDumper',
+    }
+
+# (from libdump import * gets only these. It can't get the lazy names: once a dumper's
+# module has been imported, the package attribute of the same name may be the module,
+# not the class. See dumperClass.)
+__all__ = ['DumperContext', 'DumperScheduler', 'Fingerprints', 'NoteUtils', 'installMethods', 'dumperClass']
+
+# Returns the class named name (see LAZY), importing its module. (Use this rather than
+# getattr(libdump, name) once any dumper has run: importing a dumper's module, e.g., from
+# another dumper's, sets the package attribute of the same name to the module.)
+def dumperClass(name):
+    mname = LAZY.get(name, None)
+    if mname is None:
+        raise RuntimeError("No such dumper: %s" % name)
+    import importlib
+    x = getattr(importlib.import_module('.' + mname, __name__), name)
+    globals()[name] = x
+    return x
+
+def __getattr__(name):
+    if name not in LAZY:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    return dumperClass(name)
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY))
+
 def installMethods(module):
     import types
     for srcn, srcx in list(module.__dict__.items()):
         tgtx = globals().get(srcn, None)
+        if srcn in LAZY:
+            tgtx = dumperClass(srcn)
         if type(tgtx) is type and type(srcx) is type:
             for sn, sx in list(srcx.__dict__.items()):
                 if type(sx) is types.FunctionType:
                     setattr(tgtx, sn, sx)
                     print("Installed: %s into %s"%(sn,tgtx))
-
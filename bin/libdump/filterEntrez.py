@@ -58,7 +58,7 @@ def cacheIdsN():
   AND aa2._logicaldb_key = 1
   AND aa2.preferred = 1
   '''
-  for r in db.sql(q):
+  for r in db.copyiter(q):
     n2m[r['ncbiid']] = 'MGI:' + r['mgiid']
   return n2m
 
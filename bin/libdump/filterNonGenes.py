@@ -41,7 +41,8 @@ def cacheGeneIds():
         AND mm.term = 'gene'
         AND aa._logicaldb_key in (1,13,59,60,85,131,132,133,134)
         ''' 
-    db.sql(query, lambda r: geneIds.add(r['accid']))
+    for r in db.copyiter(query):
+        geneIds.add(r['accid'])
     return geneIds
 
 #
@@ -9,6 +9,8 @@ import re
 import sys
 import types
 
+from collections.abc import MutableMapping
+
 import psycopg2
 import psycopg2.extras
 
@@ -18,6 +20,17 @@ DATABASE = None
 USER = None
 PASSWORD = None
 
+#
+# Local snapshots (see snapshotMgi.py). If this environment variable is set, it names the
+# datasource (in the properties file) of a local snapshot of MGI, and setConnectionFromPropertiesFile
+# connects to it instead of the MGI source database. Queries run unchanged against the snapshot.
+SNAPSHOT_ENV = 'MGI_SNAPSHOT'
+# Table describing a snapshot. It is written last, so a snapshot without it is incomplete.
+SNAPSHOT_INFO_TABLE = 'mgi_snapshot'
+# The datasource name of the snapshot in use (or None), and its description (once connected).
+SNAPSHOT = None
+SNAPSHOT_INFO = None
+
 #
 def getConnection():
     return {
@@ -56,41 +69,310 @@ def getConnectionParamsFromPropertiesFile(dname=None, fname="~/.intermine/mousem
 
 #
 def setConnectionFromPropertiesFile(dname=None, fname="~/.intermine/mousemine.properties"):
+    global SNAPSHOT
+    if dname is None and os.environ.get(SNAPSHOT_ENV):
+        dname = SNAPSHOT = os.environ[SNAPSHOT_ENV]
     cparms = getConnectionParamsFromPropertiesFile(dname, fname)
     setConnection(**cparms)
 
 #
 def connect(host=None,database=None, user=None, password=None):
     con = psycopg2.connect( host=host or HOST, database=database or DATABASE, user=user or USER, password=password or PASSWORD )
+    if SNAPSHOT and SNAPSHOT_INFO is None:
+        checkSnapshot(con)
+    return con
+
+# Makes sure con is connected to a complete snapshot, and loads its description.
+def checkSnapshot(con):
+    global SNAPSHOT_INFO
+    cur = con.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        cur.execute('SELECT * FROM %s' % SNAPSHOT_INFO_TABLE)
+        rows = cur.fetchall()
+    except psycopg2.ProgrammingError:
+        rows = []
+    finally:
+        cur.close()
+        con.rollback()
+    if not rows:
+        raise RuntimeError("Datasource %s is not a complete MGI snapshot (see snapshotMgi.py)." % SNAPSHOT)
+    SNAPSHOT_INFO = dict(rows[0])
+
+# Returns the description of the snapshot in use (source, creation time, MGI lastdump_date,
+# tables), or None if connected to the MGI source database.
+def getSnapshotInfo():
+    return SNAPSHOT_INFO
+
+# Errors that indicate a connection is no longer usable.
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+#
+# A simple pool of open connections. Connections are checked out with getConnection()
+# and returned with putConnection(). Plain queries and named (server-side) cursors
+# both draw from the same pool; a connection is only shared sequentially, never
+# by two open cursors at once.
+#
+class ConnectionPool:
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle
+        self.idle = []
+        self.nOpened = 0
+        self.nReused = 0
+        self.nDiscarded = 0
+
+    def getConnection(self):
+        while self.idle:
+            con = self.idle.pop()
+            if not con.closed:
+                self.nReused += 1
+                return con
+        con = connect()
+        self.nOpened += 1
+        return con
+
+    # Returns a connection to the pool. If broken is True (or the connection has been
+    # closed), the connection is discarded instead.
+    def putConnection(self, con, broken=False):
+        if not broken and not con.closed:
+            try:
+                # end any open transaction (e.g. left by a named cursor)
+                if con.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    con.rollback()
+            except CONNECTION_ERRORS:
+                broken = True
+        if broken or con.closed or len(self.idle) >= self.maxIdle:
+            if broken:
+                self.nDiscarded += 1
+            try:
+                con.close()
+            except CONNECTION_ERRORS:
+                pass
+        else:
+            self.idle.append(con)
+
+    def closeAll(self):
+        for con in self.idle:
+            con.close()
+        self.idle = []
+
+    def report(self):
+        return {
+        'opened'    : self.nOpened,
+        'reused'    : self.nReused,
+        'discarded' : self.nDiscarded,
+        'idle'      : len(self.idle),
+        }
+
+# The pool used by sql() and sqliter() when no connection is passed in.
+# If None, every call opens (and closes) its own connection.
+POOL = None
+
+#
+def setPool(pool):
+    global POOL
+    POOL = pool
+
+#
+def getPool():
+    return POOL
+
+# Checks out a connection for a query. Returns (connection, release), where
+# release(broken=False) must be called when the caller is done with the connection.
+def _checkout(connection):
+    if connection is not None:
+        return connection, lambda broken=False: None
+    if POOL is not None:
+        pool = POOL
+        con = pool.getConnection()
+        return con, lambda broken=False: pool.putConnection(con, broken)
+    con = connect()
+    return con, lambda broken=False: con.close()
+
+#
+# Shared snapshots. Queries on several connections (e.g., from worker processes) see the
+# same state of the database if their transactions share a snapshot: exportSnapshot starts
+# a (read only, repeatable read) transaction on con, and returns its snapshot id; each
+# connectToSnapshot(id) opens a new connection whose transaction uses it. The exporting
+# transaction must stay open (con not used for anything else) until the others have started.
+#
+def exportSnapshot(con):
+    cur = con.cursor()
+    cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+    cur.execute('SELECT pg_export_snapshot()')
+    snapshot = cur.fetchone()[0]
+    cur.close()
+    return snapshot
+
+#
+def connectToSnapshot(snapshot):
+    con = connect()
+    cur = con.cursor()
+    cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+    cur.execute('SET TRANSACTION SNAPSHOT %s', (snapshot,))
+    cur.close()
     return con
 
 # Cursor name parameters
 NAMELEN = 10
 ITERSIZE = 1000000
+# When sql() is given a parser callback, rows are streamed through a named (server-side)
+# cursor, fetching this many rows per round trip, rather than loaded all at once.
+STREAM = True
+STREAM_ITERSIZE = 10000
 import random
 import string
 
 #
-def sqliter(query, connection=None):
-    closeCon = False
-    if connection is None:
-        connection = connect()
-        closeCon = True
+# Row types. Queries return rows as dicts (psycopg2.extras.RealDictRow) by default.
+# With rowtype=RECORD, rows are returned as Record objects instead (see below).
+DICT = 'dict'
+RECORD = 'record'
 
-    # generate a server-side (named) cursor
-    cn = 'C_' + ''.join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(NAMELEN))
-    cur = connection.cursor(name=cn, cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.itersize = ITERSIZE
-    cur.execute(query)
-    for r in cur:
-        yield r
-    cur.close()
+# Marks a column that has been deleted from a Record.
+_DELETED = object()
+
+#
+# A lightweight, mutable row. Column values are held in the tuple returned by the
+# cursor; only fields that are set or added after the fact (derived fields) go 
+# into a small overlay dict. Supports the usual dict operations, including use as 
+# the argument of a %-format, so can be used wherever a dict row is expected.
+# Each query gets its own subclass (see recordClass) with the column-name index.
+#
+class Record(MutableMapping):
+    __slots__ = ('_values', '_extra')
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+        self._extra = None
+
+    def __getitem__(self, k):
+        e = self._extra
+        if e is not None and k in e:
+            v = e[k]
+            if v is _DELETED:
+                raise KeyError(k)
+            return v
+        return self._values[self._index[k]]
+
+    def __setitem__(self, k, v):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[k] = v
 
-    if closeCon:
-        connection.close()
+    def __delitem__(self, k):
+        self[k]
+        if k in self._index:
+            self[k] = _DELETED
+        else:
+            del self._extra[k]
+
+    def __contains__(self, k):
+        e = self._extra
+        if e is not None and k in e:
+            return e[k] is not _DELETED
+        return k in self._index
+
+    def get(self, k, default=None):
+        return self[k] if k in self else default
+
+    def __iter__(self):
+        e = self._extra or {}
+        for k in self._index:
+            if e.get(k) is not _DELETED:
+                yield k
+        for k, v in e.items():
+            if k not in self._index and v is not _DELETED:
+                yield k
+
+    def __len__(self):
+        return sum(1 for k in self)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+# Cache of Record subclasses, keyed by tuple of column names.
+_recordClasses = {}
+
+# Returns the Record subclass for the given list of column names.
+def recordClass(names):
+    names = tuple(names)
+    cls = _recordClasses.get(names, None)
+    if cls is None:
+        index = dict((n,i) for i,n in enumerate(names))
+        cls = type('Record', (Record,), {'__slots__' : (), '_index' : index})
+        _recordClasses[names] = cls
+    return cls
+
+# Opens a cursor on con that produces rows suitable for the given rowtype.
+# If name is given, the cursor is a named (server-side) cursor.
+def _cursor(con, rowtype, name=None):
+    if rowtype == RECORD:
+        # plain tuples; wrapped in Records by _rows
+        return con.cursor(name=name) if name else con.cursor()
+    return con.cursor(name=name, cursor_factory=psycopg2.extras.RealDictCursor)
+
+# Iterates over the rows of an executed cursor as the given rowtype.
+def _rows(cur, rowtype):
+    if rowtype != RECORD:
+        return iter(cur)
+    return _records(cur)
+
+def _records(cur):
+    cls = None
+    for t in cur:
+        if cls is None:
+            # Note that named cursors do not have a description until the first fetch.
+            cls = recordClass([d[0] for d in cur.description])
+        yield cls(t)
+
+#
+def cursorName():
+    return 'C_' + ''.join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(NAMELEN))
+
+#
+def sqliter(query, connection=None, itersize=None, rowtype=DICT):
+    # If the query fails on a pooled connection before returning any rows,
+    # the connection is discarded and the query is retried once on a new one.
+    retries = 0 if connection else 1
+    while True:
+        con, release = _checkout(connection)
+        started = False
+        try:
+            # generate a server-side (named) cursor
+            cur = _cursor(con, rowtype, cursorName())
+            cur.itersize = itersize or ITERSIZE
+            cur.execute(query)
+            for r in _rows(cur, rowtype):
+                started = True
+                yield r
+            cur.close()
+        except CONNECTION_ERRORS:
+            release(True)
+            if started or retries == 0:
+                raise
+            retries -= 1
+            continue
+        except:
+            # includes GeneratorExit, if the caller stops iterating early
+            release()
+            raise
+        release()
+        return
 
 #
-def sql(queries, parsers=None, args={}, connection=None):
+# Runs one or more queries. For each query, if the corresponding parser is None, 
+# the result rows are returned as a list. If it is a function, it is called on each 
+# row in turn (with the corresponding args as keyword args).
+# Args:
+#  stream (boolean) If True, rows passed to a parser are streamed from a named 
+#    (server-side) cursor, so memory use does not depend on the size of the result.
+#    Default (None) uses the module setting, STREAM. Ignored for queries without a parser.
+#  itersize (integer) Number of rows fetched per round trip when streaming.
+#    Default (None) uses STREAM_ITERSIZE.
+#  rowtype DICT (default) or RECORD. The type of row objects returned or passed to parsers.
+#
+def sql(queries, parsers=None, args={}, connection=None, stream=None, itersize=None, rowtype=DICT):
     single = False
     if type(queries) not in [list,tuple]:
         queries = [queries]
@@ -103,43 +385,195 @@ def sql(queries, parsers=None, args={}, connection=None):
     if len(queries) != len(parsers):
         raise RuntimeError("Number of queries != number of parsers.")
 
-    closeCon = False
-    if connection is None:
-        connection = connect()
-        closeCon = True
-
-    results = []
-    for i,q in enumerate(queries):
-        cur = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(q)
-        p = parsers[i]
-        a = args[i]
-        if p == 'ignore':
-            results.append(None)
-        elif cur.statusmessage.startswith('SELECT'):
-            if p is None:
-                qr = []
-                for r in cur:
-                    #qr.append( dict(r) )
-                    qr.append( r )
-                results.append(qr)
-            else:
-                for r in cur:
-                    #p( dict(r), **a )
-                    p( r, **a )
-                results.append(None)
-        else:
-            results.append(None)
-        cur.close()
-
-    if closeCon:
-        connection.close()
+    # If a pooled connection fails before the first query has executed, it is
+    # discarded and the queries are retried once on a new connection.
+    retries = 0 if connection else 1
+    while True:
+        con, release = _checkout(connection)
+        results = []
+        started = False
+        try:
+            for i,q in enumerate(queries):
+                p = parsers[i]
+                a = args[i]
+                if callable(p) and (STREAM if stream is None else stream):
+                    cur = _cursor(con, rowtype, cursorName())
+                    cur.itersize = itersize or STREAM_ITERSIZE
+                    cur.execute(q)
+                    started = True
+                    for r in _rows(cur, rowtype):
+                        p( r, **a )
+                    results.append(None)
+                    cur.close()
+                    continue
+                cur = _cursor(con, rowtype)
+                cur.execute(q)
+                started = True
+                if p == 'ignore':
+                    results.append(None)
+                elif cur.statusmessage.startswith('SELECT'):
+                    if p is None:
+                        qr = []
+                        for r in _rows(cur, rowtype):
+                            #qr.append( dict(r) )
+                            qr.append( r )
+                        results.append(qr)
+                    else:
+                        for r in _rows(cur, rowtype):
+                            #p( dict(r), **a )
+                            p( r, **a )
+                        results.append(None)
+                else:
+                    results.append(None)
+                cur.close()
+        except CONNECTION_ERRORS:
+            release(True)
+            if started or retries == 0:
+                raise
+            retries -= 1
+            continue
+        except:
+            release()
+            raise
+        release()
+        break
 
     if single:
         return results[0]
     else:
         return results
 
+#
+# COPY-based bulk extraction.
+#
+# copyiter runs a query as "COPY (query) TO STDOUT" and parses the text-format
+# stream into rows. This avoids the per-row overhead of cursor fetches and psycopg2's
+# type conversion, which matters for the large table scans (e.g. ACC_Accession).
+# The COPY runs in a helper thread that writes into a pipe; rows are parsed from 
+# the other end as they arrive, so memory use does not depend on result size.
+#
+import datetime
+import decimal
+import threading
+
+COPY_NULL = b'\\N'
+COPY_ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|x[0-9a-fA-F]{1,2}|.)')
+COPY_ESCAPES = { b'b':b'\b', b'f':b'\f', b'n':b'\n', b'r':b'\r', b't':b'\t', b'v':b'\v' }
+COPY_BUFSIZE = 1 << 16
+
+def _copyUnescape(m):
+    e = m.group(1)
+    if e in COPY_ESCAPES:
+        return COPY_ESCAPES[e]
+    elif e[:1] == b'x' and len(e) > 1:
+        return bytes([int(e[1:], 16)])
+    elif e[:1].isdigit():
+        return bytes([int(e, 8) & 0xff])
+    return e
+
+def _bool(s):
+    return s == 't'
+
+ARRAY_ELEMENT_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,]+)')
+ARRAY_UNESCAPE_RE = re.compile(r'\\(.)')
+
+# Decodes a one-dimensional text array, e.g. {a,"b c",NULL}, to a list of str (or None).
+def _textArray(s):
+    vals = []
+    for m in ARRAY_ELEMENT_RE.finditer(s, 1, len(s) - 1):
+        quoted, plain = m.groups()
+        if quoted is not None:
+            vals.append(ARRAY_UNESCAPE_RE.sub(r'\1', quoted) if '\\' in quoted else quoted)
+        else:
+            vals.append(None if plain == 'NULL' else plain)
+    return vals
+
+# Default column decoders, by postgres type oid. Any type not listed decodes as str.
+COPY_DECODERS = {
+    16   : _bool,                                   # bool
+    20   : int,                                     # int8
+    21   : int,                                     # int2
+    23   : int,                                     # int4
+    26   : int,                                     # oid
+    700  : float,                                   # float4
+    701  : float,                                   # float8
+    1700 : decimal.Decimal,                         # numeric
+    1082 : datetime.date.fromisoformat,             # date
+    1114 : datetime.datetime.fromisoformat,         # timestamp
+    1009 : _textArray,                              # text[]
+    1015 : _textArray,                              # varchar[]
+    }
+
+# Returns the column names and type oids of a query's result, without running it.
+def queryColumns(query, connection):
+    cur = connection.cursor()
+    cur.execute('SELECT * FROM (%s) _q LIMIT 0' % query)
+    cols = [(d[0], d[1]) for d in cur.description]
+    cur.close()
+    return cols
+
+#
+# Iterates over the rows of query, using COPY.
+# Args:
+#  query (string) A SELECT query (no trailing semicolon).
+#  decoders (dict) Optional. Maps column name to a function that converts the column's 
+#    text value to a python value. Columns not listed are decoded based on their
+#    database type (see COPY_DECODERS). NULLs are always returned as None.
+#  rowtype DICT (default) or RECORD.
+#
+def copyiter(query, connection=None, decoders=None, rowtype=DICT):
+    con, release = _checkout(connection)
+    broken = True
+    try:
+        cols = queryColumns(query, con)
+        names = [c[0] for c in cols]
+        decoders = decoders or {}
+        fns = [decoders.get(n, COPY_DECODERS.get(oid, str)) for n,oid in cols]
+        if rowtype == RECORD:
+            mkrow = recordClass(names)
+        else:
+            mkrow = lambda vals: dict(zip(names, vals))
+
+        rfd, wfd = os.pipe()
+        reader = os.fdopen(rfd, 'rb', COPY_BUFSIZE)
+        writer = os.fdopen(wfd, 'wb', COPY_BUFSIZE)
+        errors = []
+        def run():
+            try:
+                cur = con.cursor()
+                cur.copy_expert('COPY (%s) TO STDOUT' % query, writer, COPY_BUFSIZE)
+                cur.close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                try:
+                    writer.close()
+                except OSError:
+                    pass
+        t = threading.Thread(target=run, daemon=True)
+        t.start()
+        try:
+            for line in reader:
+                vals = line[:-1].split(b'\t')
+                row = []
+                for f, v in zip(fns, vals):
+                    if v == COPY_NULL:
+                        row.append(None)
+                    else:
+                        if b'\\' in v:
+                            v = COPY_ESCAPE_RE.sub(_copyUnescape, v)
+                        row.append(f(v.decode('utf-8')))
+                yield mkrow(tuple(row))
+        finally:
+            # if the caller stops early, closing the reader makes the COPY fail.
+            reader.close()
+            t.join()
+        if errors:
+            raise errors[0]
+        broken = False
+    finally:
+        release(broken)
+
 #
 def __test__():
     def p(r):
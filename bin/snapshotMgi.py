@@ -0,0 +1,193 @@
+#
+# snapshotMgi.py
+#
+# Copies the MGI tables used by the dumpers, and by the other scripts that query MGI
+# (filterNonGenes.py, filterEntrez.py, dumpEMAPAobo.py, getEnsemblMgiMapping.py), into
+# a local Postgres database. Those scripts can then run against the snapshot instead of
+# the shared MGI database: set the environment variable MGI_SNAPSHOT to the snapshot's
+# datasource name (see mgidbconnect).
+#
+# Usage:
+#       % python snapshotMgi.py -t mgi-snapshot [-s SOURCE] [--table NAME ...]
+#       % MGI_SNAPSHOT=mgi-snapshot python dumpMgiItemXml.py ...
+#
+# Source and target are datasources in the properties file (~/.intermine/mousemine.properties),
+# e.g., db.mgi-snapshot.datasource.serverName=localhost, etc. The source defaults to the MGI
+# source database (db.mgi-source.datasource.sourceName).
+#
+# Each table is copied whole (all columns, all rows), streamed from COPY TO on the source
+# straight into COPY FROM on the target, and its indexes are recreated. Views (e.g.,
+# PRB_Strain_Reference_View) become tables. All tables are read in one repeatable-read
+# transaction, so the snapshot is consistent with the copy of MGI_dbinfo it includes.
+# When all tables have been copied, the mgi_snapshot table is written, with the source,
+# the time, the MGI lastdump_date, and the list of tables.
+#
+
+import sys
+import os
+import time
+import getopt
+import threading
+import libdump
+from libdump import mgidbconnect as db
+from libdump.AbstractItemDumper import AbstractItemDumper
+
+# Tables read outside the dumpers (see AbstractItemDumper.TABLES): by DumperContext and
+# the scripts listed above.
+OTHER_TABLES = [
+    'ACC_Accession', 'ACC_MGIType', 'BIB_Refs', 'MGI_dbinfo', 'MGI_Note',
+    'MRK_MCV_Cache', 'VOC_Term', 'VOC_Term_EMAPA', 'MGI_Synonym', 'MGI_SynonymType',
+    'MGI_Relationship', 'DAG_DAG', 'DAG_Edge', 'DAG_Label', 'DAG_Node',
+    ]
+
+BUFSIZE = 1 << 16
+
+def log(s):
+    sys.stderr.write('%s :: %s\n' % (time.asctime(), s))
+    sys.stderr.flush()
+
+# Returns the names of all tables to be copied, sorted.
+def snapshotTables(extra=()):
+    tables = set(OTHER_TABLES) | set(extra)
+    for n in libdump.LAZY:
+        x = libdump.dumperClass(n)
+        if isinstance(x, type) and issubclass(x, AbstractItemDumper):
+            tables.update(x.TABLES)
+    # (case-insensitive, like postgres)
+    byName = {}
+    for t in sorted(tables):
+        byName.setdefault(t.lower(), t)
+    return sorted(byName.values(), key=str.lower)
+
+class Snapshot:
+    def __init__(self, source, target):
+        # (don't copy a snapshot into itself)
+        if os.environ.get(db.SNAPSHOT_ENV):
+            raise RuntimeError('Unset %s to make a snapshot.' % db.SNAPSHOT_ENV)
+        self.sparams = db.getConnectionParamsFromPropertiesFile(source)
+        self.tparams = db.getConnectionParamsFromPropertiesFile(target)
+        self.src = db.connect(**self.sparams)
+        self.src.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        self.dst = db.connect(**self.tparams)
+
+    # Returns [(column name, type)] of a table or view in the source.
+    def columns(self, table):
+        cur = self.src.cursor()
+        cur.execute('''
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            WHERE a.attrelid = %s::regclass
+            AND a.attnum > 0
+            AND NOT a.attisdropped
+            ORDER BY a.attnum
+            ''', (table.lower(),))
+        cols = cur.fetchall()
+        cur.close()
+        if not cols:
+            raise RuntimeError('No such table: %s' % table)
+        return cols
+
+    # Returns the definitions of the indexes of a table in the source, unqualified.
+    def indexes(self, table):
+        cur = self.src.cursor()
+        cur.execute('''
+            SELECT i.schemaname, i.tablename, i.indexdef
+            FROM pg_indexes i, pg_class c, pg_namespace n
+            WHERE c.oid = %s::regclass
+            AND c.relnamespace = n.oid
+            AND i.schemaname = n.nspname
+            AND i.tablename = c.relname
+            ''', (table.lower(),))
+        defs = [d.replace(' ON %s.%s ' % (s, t), ' ON %s ' % t) for s, t, d in cur.fetchall()]
+        cur.close()
+        return defs
+
+    # Copies one table. Returns the number of rows.
+    def copyTable(self, table):
+        cols = self.columns(table)
+        names = ', '.join('"%s"' % n for n, t in cols)
+        dcur = self.dst.cursor()
+        dcur.execute('DROP TABLE IF EXISTS %s CASCADE' % table)
+        dcur.execute('CREATE TABLE %s (%s)' % (table, ', '.join('"%s" %s' % c for c in cols)))
+        rfd, wfd = os.pipe()
+        reader = os.fdopen(rfd, 'rb', BUFSIZE)
+        writer = os.fdopen(wfd, 'wb', BUFSIZE)
+        errors = []
+        def run():
+            try:
+                scur = self.src.cursor()
+                scur.copy_expert('COPY (SELECT %s FROM %s) TO STDOUT' % (names, table), writer, BUFSIZE)
+                scur.close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                try:
+                    writer.close()
+                except OSError:
+                    pass
+        t = threading.Thread(target=run, daemon=True)
+        t.start()
+        try:
+            dcur.copy_expert('COPY %s (%s) FROM STDIN' % (table, names), reader, BUFSIZE)
+            n = dcur.rowcount
+        finally:
+            reader.close()
+            t.join()
+        if errors:
+            raise errors[0]
+        for d in self.indexes(table):
+            dcur.execute(d)
+        dcur.execute('ANALYZE %s' % table)
+        dcur.close()
+        self.dst.commit()
+        return n
+
+    def run(self, tables):
+        dcur = self.dst.cursor()
+        dcur.execute('DROP TABLE IF EXISTS %s' % db.SNAPSHOT_INFO_TABLE)
+        self.dst.commit()
+        log('Snapshot of %s (%s) into %s (%s): %d tables' % \
+            (self.sparams['database'], self.sparams['host'], self.tparams['database'], self.tparams['host'], len(tables)))
+        total = 0
+        for table in tables:
+            t0 = time.time()
+            n = self.copyTable(table)
+            total += n
+            log('%s: %d rows, %.1f s' % (table, n, time.time() - t0))
+        scur = self.src.cursor()
+        scur.execute('SELECT lastdump_date FROM MGI_dbinfo')
+        lastdump = scur.fetchone()[0]
+        scur.close()
+        self.src.rollback()
+        dcur.execute('''
+            CREATE TABLE %s (
+                source text,
+                created timestamp,
+                lastdump_date timestamp,
+                tables text)
+            ''' % db.SNAPSHOT_INFO_TABLE)
+        dcur.execute('INSERT INTO %s VALUES (%%s, now(), %%s, %%s)' % db.SNAPSHOT_INFO_TABLE,
+            ('%s/%s' % (self.sparams['host'], self.sparams['database']), lastdump, ','.join(tables)))
+        dcur.close()
+        self.dst.commit()
+        self.src.close()
+        self.dst.close()
+        log('Snapshot complete: %d rows. MGI dump date: %s' % (total, lastdump))
+
+def main(argv):
+    opts, args = getopt.getopt(argv, 's:t:', ['source=', 'target=', 'table='])
+    source = None
+    target = None
+    extra = []
+    for o, v in opts:
+        if o in ('-s', '--source'):
+            source = v
+        elif o in ('-t', '--target'):
+            target = v
+        elif o == '--table':
+            extra.append(v)
+    if target is None:
+        raise RuntimeError('No target datasource (-t).')
+    Snapshot(source, target).run(snapshotTables(extra))
+
+main(sys.argv[1:])